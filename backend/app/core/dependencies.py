@@ -4,15 +4,20 @@ app/core/dependencies.py - Dependency Injection for Services
 ===================================================================
 Compatible with your .env configuration
 """
-from functools import lru_cache
-from typing import Dict, Optional, List
+from functools import lru_cache, wraps
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+from typing import Dict, Optional, List, Union
 import os
+import json
+import numpy as np
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
 import logging
 
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_cache import EmbeddingCache
+
 # Load environment variables
 load_dotenv()
 
@@ -134,7 +139,7 @@ class LLMService:
 
 class EmbeddingService:
     """
-    Embedding Service using sentence-transformers
+    Embedding Service using sentence-transformers (or ONNX Runtime)
     Configured from your .env file
     """
     
@@ -144,11 +149,166 @@ class EmbeddingService:
             "sentence-transformers/all-MiniLM-L6-v2"
         )
         
-        logger.info(f"Loading embedding model: {self.model_name}")
-        self.model = SentenceTransformer(self.model_name)
+        # All inference runs on this bounded pool, never on the event loop
+        self.num_workers = int(os.getenv("EMBEDDING_WORKERS", "1"))
+        self.executor = ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix="embedding")
+        # Texts per pool task in aembed_texts, so queries interleave with large uploads
+        self.executor_batch_size = int(os.getenv("EMBEDDING_EXECUTOR_BATCH_SIZE", "64"))
+        # Length bucketing: texts sorted by token count, batches capped by padded tokens
+        self.length_bucketing = os.getenv("EMBEDDING_LENGTH_BUCKETING", "true").lower() == "true"
+        self.max_bucket_size = int(os.getenv("EMBEDDING_MAX_BUCKET_SIZE", "256"))
+        torch_threads = int(os.getenv("EMBEDDING_TORCH_THREADS", "0"))
+        if torch_threads > 0:
+            import torch
+            torch.set_num_threads(torch_threads)
+            logger.info(f"Embedding inference limited to {torch_threads} torch threads")
+        
+        # "torch" (sentence-transformers) or "onnx" (ONNX Runtime, exported model directory)
+        self.backend = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+        
+        logger.info(f"Loading embedding model: {self.model_name} ({self.backend} backend)")
+        if self.backend == "onnx":
+            from app.services.onnx_embedder import OnnxEmbedder
+            self.model = OnnxEmbedder()
+            if self.model.source_model != self.model_name:
+                logger.warning(
+                    f"ONNX model in {self.model.directory} was exported from "
+                    f"{self.model.source_model}, not {self.model_name}"
+                )
+            # int8 vectors differ slightly, so they get their own cache entries
+            cache_name = f"{self.model_name}@onnx{'-int8' if self.model.quantized else ''}"
+        elif self.backend == "torch":
+            # Imported here: sentence-transformers (and torch) take seconds to import
+            from sentence_transformers import SentenceTransformer
+            self.model = SentenceTransformer(self.model_name)
+            cache_name = self.model_name
+        else:
+            raise ValueError(f"Unknown EMBEDDING_BACKEND '{self.backend}' (use 'torch' or 'onnx')")
         logger.info("Embedding model loaded successfully")
+        # ONNX Runtime runs fastest on small batches; torch on large ones
+        self.batch_tokens = int(os.getenv("EMBEDDING_BATCH_TOKENS", "512" if self.backend == "onnx" else "8192"))
+        
+        # Content-addressed cache: re-uploads and shared boilerplate skip the model
+        self.cache = (
+            EmbeddingCache(cache_name)
+            if os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true" else None
+        )
+        # Concurrent single-text requests share one forward pass
+        self.batcher = (
+            EmbeddingBatcher(self._encode_on_pool)
+            if os.getenv("EMBEDDING_MICROBATCH_ENABLED", "true").lower() == "true" else None
+        )
+    
+    def _model_encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        if self.backend == "onnx":
+            return self.model.encode(texts, batch_size=batch_size)
+        return np.asarray(
+            self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False),
+            dtype=np.float32
+        )
+    
+    def _tokenize(self, texts: List[str]):
+        """Unpadded token ids of each text, prepared as SentenceTransformer.tokenize does"""
+        if self.backend == "onnx":
+            return self.model.tokenize(texts)
+        texts = [text.strip() for text in texts]
+        if getattr(self.model[0], "do_lower_case", False):
+            texts = [text.lower() for text in texts]
+        return self.model.tokenizer(
+            texts, add_special_tokens=True, truncation="longest_first", max_length=self.model.max_seq_length
+        )
+    
+    def _length_buckets(self, lengths: np.ndarray) -> List[np.ndarray]:
+        """
+        Indices of texts grouped into batches of similar token length
+        
+        Texts are sorted by token count; a bucket closes when padding it to
+        its longest text would exceed EMBEDDING_BATCH_TOKENS tokens, or at
+        EMBEDDING_MAX_BUCKET_SIZE texts. Short texts thus share large
+        batches and long ones small batches, with little padding in either.
+        """
+        order = np.argsort(lengths, kind="stable")
+        sorted_lengths = lengths[order]
+        buckets, start = [], 0
+        for i in range(1, len(order)):
+            size = i - start + 1
+            if size > self.max_bucket_size or size * sorted_lengths[i] > self.batch_tokens:
+                buckets.append(order[start:i])
+                start = i
+        buckets.append(order[start:])
+        return buckets
+    
+    def _forward(self, encoded, rows: List[int]) -> np.ndarray:
+        """One forward pass over already tokenized texts, padded to the longest of them"""
+        if self.backend == "onnx":
+            return self.model.forward(encoded, rows)
+        import torch
+        
+        features = self.model.tokenizer.pad(
+            {key: [values[i] for i in rows] for key, values in encoded.items()},
+            return_tensors="pt"
+        )
+        features = {key: value.to(self.model.device) for key, value in features.items()}
+        with torch.inference_mode():
+            embeddings = self.model(features)["sentence_embedding"]
+        return embeddings.float().cpu().numpy()
     
-    def embed_text(self, text: str) -> List[float]:
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """
+        float32 embeddings straight from the model
+        
+        With EMBEDDING_LENGTH_BUCKETING, texts are tokenized once, grouped
+        into token-length buckets, run one forward pass per bucket and
+        scattered back into input order.
+        """
+        if not self.length_bucketing or len(texts) <= 1:
+            return self._model_encode(texts)
+        
+        encoded = self._tokenize(texts)
+        lengths = np.fromiter(map(len, encoded["input_ids"]), dtype=np.int64, count=len(texts))
+        embeddings: Optional[np.ndarray] = None
+        for bucket in self._length_buckets(lengths):
+            vectors = self._forward(encoded, bucket.tolist())
+            if embeddings is None:
+                embeddings = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            embeddings[bucket] = vectors
+        return embeddings
+    
+    def _encode_cached(self, texts: List[str]) -> np.ndarray:
+        """
+        float32 embeddings of texts, encoding only cache misses
+        
+        Misses are de-duplicated (identical normalized texts are encoded
+        once) and stored in the cache.
+        """
+        if self.cache is None:
+            return self._encode(texts)
+        
+        keys = [self.cache.key(text) for text in texts]
+        cached = self.cache.get_many(keys)
+        
+        # Unique missing keys -> index of the first text carrying them
+        missing: Dict[bytes, int] = {}
+        for i, vector in enumerate(cached):
+            if vector is None and keys[i] not in missing:
+                missing[keys[i]] = i
+        
+        encoded: Dict[bytes, np.ndarray] = {}
+        if missing:
+            vectors = self._encode([texts[i] for i in missing.values()])
+            self.cache.put_many(list(missing), vectors)
+            encoded = dict(zip(missing, vectors))
+        
+        return np.stack([
+            vector if vector is not None else encoded[key]
+            for key, vector in zip(keys, cached)
+        ])
+    
+    def _encode_on_pool(self, texts: List[str]) -> np.ndarray:
+        """Run _encode_cached on the executor and wait for it (never call from a pool thread)"""
+        return self.executor.submit(self._encode_cached, texts).result()
+    
+    def embed_text(self, text: str) -> np.ndarray:
         """
         Generate embedding for single text
         
@@ -156,16 +316,36 @@ class EmbeddingService:
             text: Text to embed
         
         Returns:
-            Embedding vector as list of floats
+            float32 embedding vector (1-D numpy array)
         """
         try:
-            embedding = self.model.encode(text, convert_to_numpy=True)
-            return embedding.tolist()
+            if self.batcher is not None:
+                return self.batcher.embed(text)
+            return self._encode_on_pool([text])[0]
         except Exception as e:
             logger.error(f"Embedding generation failed: {str(e)}")
             raise Exception(f"Embedding generation failed: {str(e)}")
     
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+    async def aembed_text(self, text: str) -> np.ndarray:
+        """
+        Generate embedding for single text without blocking the event loop
+        
+        Args:
+            text: Text to embed
+        
+        Returns:
+            float32 embedding vector (1-D numpy array)
+        """
+        try:
+            if self.batcher is not None:
+                return await self.batcher.aembed(text)
+            vectors = await asyncio.wrap_future(self.executor.submit(self._encode_cached, [text]))
+            return vectors[0]
+        except Exception as e:
+            logger.error(f"Embedding generation failed: {str(e)}")
+            raise Exception(f"Embedding generation failed: {str(e)}")
+    
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
         """
         Generate embeddings for multiple texts
         
@@ -173,21 +353,86 @@ class EmbeddingService:
             texts: List of texts to embed
         
         Returns:
-            List of embedding vectors
+            float32 array of shape (len(texts), dimension)
         """
         try:
-            embeddings = self.model.encode(texts, convert_to_numpy=True)
-            return embeddings.tolist()
+            if not texts:
+                return np.empty((0, self.dimension), dtype=np.float32)
+            return self._encode_on_pool(texts)
         except Exception as e:
             logger.error(f"Batch embedding generation failed: {str(e)}")
             raise Exception(f"Batch embedding generation failed: {str(e)}")
     
+    async def aembed_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for multiple texts without blocking the event loop
+        
+        Texts are sent to the pool EMBEDDING_EXECUTOR_BATCH_SIZE at a time,
+        one slice after another, so query embeddings queued meanwhile run
+        between slices instead of waiting for the whole upload. With length
+        bucketing the slices are taken in character-length order (a cheap
+        proxy for token count), so each one needs little padding.
+        
+        Args:
+            texts: List of texts to embed
+        
+        Returns:
+            float32 array of shape (len(texts), dimension)
+        """
+        try:
+            if not texts:
+                return np.empty((0, self.dimension), dtype=np.float32)
+            if self.length_bucketing:
+                order = np.argsort([len(text) for text in texts], kind="stable")
+            else:
+                order = np.arange(len(texts))
+            
+            embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+            for start in range(0, len(texts), self.executor_batch_size):
+                rows = order[start:start + self.executor_batch_size]
+                embeddings[rows] = await asyncio.wrap_future(
+                    self.executor.submit(self._encode_cached, [texts[i] for i in rows])
+                )
+            return embeddings
+        except Exception as e:
+            logger.error(f"Batch embedding generation failed: {str(e)}")
+            raise Exception(f"Batch embedding generation failed: {str(e)}")
+    
+    def cache_stats(self) -> dict:
+        """Embedding cache sizes and hit/miss counters"""
+        if self.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.stats()}
+    
     @property
     def dimension(self) -> int:
         """Get embedding dimension"""
+        if self.backend == "onnx":
+            return self.model.dimension
         return self.model.get_sentence_embedding_dimension()
 
 
+class ActiveEmbeddingService:
+    """
+    The embedding service of the active collection, swappable in place
+
+    Holders of get_embedding_service() (the coordinator, the orchestrator)
+    keep their reference; a re-embedding switch replaces the service behind
+    it (see app/services/embedding_registry.py).
+    """
+    
+    def __init__(self, service):
+        self.service = service
+    
+    def swap(self, service):
+        """Serve with `service` from now on; returns the previous one"""
+        previous, self.service = self.service, service
+        return previous
+    
+    def __getattr__(self, name):
+        return getattr(self.service, name)
+
+
 # ============================================
 # Vector Store (ChromaDB)
 # ============================================
@@ -207,14 +452,26 @@ class VectorStore:
             "CHROMA_PERSIST_DIR", 
             "./data/vectors"
         )
-        self.collection_name = collection_name or os.getenv(
-            "COLLECTION_NAME", 
-            "advanced_rag"
-        )
+        # Without an explicit name, the registry's active collection (tagged with its model)
+        self.registry = None
+        if collection_name is None:
+            from app.services.embedding_registry import ModelRegistry, get_model_registry
+            self.registry = get_model_registry()
+            if os.path.abspath(self.registry.directory) != os.path.abspath(self.persist_directory):
+                self.registry = ModelRegistry(self.persist_directory)
+            collection_name = self.registry.active()[0]
+        self.collection_name = collection_name
+        
+        # Rows per collection.add call (embeddings become Python lists there)
+        self.add_batch_size = int(os.getenv("CHROMA_ADD_BATCH_SIZE", "512"))
         
         # Ensure directory exists
         os.makedirs(self.persist_directory, exist_ok=True)
         
+        # Imported here so importing this module stays cheap
+        import chromadb
+        from chromadb.config import Settings
+        
         # Initialize ChromaDB client
         self.client = chromadb.PersistentClient(
             path=self.persist_directory,
@@ -227,29 +484,59 @@ class VectorStore:
         # Get or create collection
         self.collection = self.client.get_or_create_collection(
             name=self.collection_name,
-            metadata={"hnsw:space": "cosine"}
+            metadata=self._collection_metadata(self.collection_name)
         )
         
         logger.info(f"VectorStore initialized with collection: {self.collection_name}")
         logger.info(f"Current documents count: {self.collection.count()}")
     
+    def _collection_metadata(self, name: str) -> dict:
+        """Collection metadata, tagged with the model that builds it when the registry knows it"""
+        entry = self.registry.entry(name) if self.registry is not None else None
+        if entry is None:
+            return {"hnsw:space": "cosine"}
+        from app.services.embedding_registry import ModelRegistry
+        return ModelRegistry.collection_metadata(entry)
+    
+    def use_collection(self, name: str):
+        """Search and write `name` from now on (a re-embedding switch)"""
+        self.collection = self.client.get_or_create_collection(
+            name=name,
+            metadata=self._collection_metadata(name)
+        )
+        self.collection_name = name
+        logger.info(f"VectorStore switched to collection: {name} ({self.collection.count()} documents)")
+    
     def add_documents(
         self,
         documents: List[str],
-        embeddings: List[List[float]],
+        embeddings: Union[np.ndarray, List[List[float]]],
         metadata: List[dict] = None,
-        ids: List[str] = None
+        ids: List[str] = None,
+        collection=None
     ):
         """
         Add documents to vector store
         
+        Chroma's client API only accepts Python lists, so the float32 array
+        is converted here, CHROMA_ADD_BATCH_SIZE rows per add call, and
+        only one batch of float objects exists at a time.
+        
         Args:
             documents: List of document texts
-            embeddings: List of embedding vectors
+            embeddings: One embedding per document (2-D float32 array or list of lists)
             metadata: List of metadata dicts (optional)
             ids: List of document IDs (optional, will generate if not provided)
+            collection: Chroma collection to add to (default: the active one)
         """
         try:
+            collection = collection or self.collection
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            if embeddings.ndim != 2 or len(embeddings) != len(documents):
+                raise ValueError(
+                    f"Expected {len(documents)} embeddings, got array of shape {embeddings.shape}"
+                )
+            
             if metadata is None:
                 metadata = [{}] * len(documents)
             
@@ -257,12 +544,15 @@ class VectorStore:
                 import uuid
                 ids = [str(uuid.uuid4()) for _ in range(len(documents))]
             
-            self.collection.add(
-                documents=documents,
-                embeddings=embeddings,
-                metadatas=metadata,
-                ids=ids
-            )
+            batch_size = min(self.add_batch_size, self.client.get_max_batch_size())
+            for start in range(0, len(documents), batch_size):
+                end = start + batch_size
+                collection.add(
+                    documents=documents[start:end],
+                    embeddings=embeddings[start:end].tolist(),
+                    metadatas=metadata[start:end],
+                    ids=ids[start:end]
+                )
             
             logger.info(f"Added {len(documents)} documents to vector store")
             
@@ -270,9 +560,88 @@ class VectorStore:
             logger.error(f"Failed to add documents: {str(e)}")
             raise Exception(f"Failed to add documents: {str(e)}")
     
+    @staticmethod
+    def _where(filter: Optional[Dict]) -> Optional[Dict]:
+        """Chroma where clause for a metadata filter (several keys need $and)"""
+        if not filter:
+            return None
+        if len(filter) == 1:
+            return dict(filter)
+        return {"$and": [{key: value} for key, value in filter.items()]}
+    
+    def search_many(
+        self,
+        query_embeddings: Union[np.ndarray, List[List[float]]],
+        top_k: int = None,
+        filters: Union[Dict, List[Optional[Dict]], None] = None
+    ) -> Dict[str, list]:
+        """
+        Search for N query embeddings with one Chroma query per distinct filter
+        
+        Args:
+            query_embeddings: N query vectors (2-D float32 array or list of lists)
+            top_k: Number of results per query
+            filters: One metadata filter for every query, or a list with
+                one (optional) filter per query
+        
+        Returns:
+            Column arrays, each with one entry per query, in input order:
+            ids, documents and metadatas (lists), and distances and scores
+            (float32 numpy arrays, score = 1 - cosine distance)
+        """
+        try:
+            top_k = top_k or int(os.getenv("TOP_K_RESULTS", "5"))
+            query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+            if query_embeddings.ndim != 2:
+                raise ValueError(f"Expected a 2-D array of query embeddings, got shape {query_embeddings.shape}")
+            num_queries = len(query_embeddings)
+            
+            columns = {
+                "ids": [None] * num_queries,
+                "documents": [None] * num_queries,
+                "metadatas": [None] * num_queries,
+                "distances": [None] * num_queries,
+                "scores": [None] * num_queries
+            }
+            if num_queries == 0:
+                return columns
+            
+            # Queries sharing a filter go to Chroma together
+            if filters is None or isinstance(filters, dict):
+                groups = {None: (filters, list(range(num_queries)))}
+            else:
+                if len(filters) != num_queries:
+                    raise ValueError(f"Expected {num_queries} filters, got {len(filters)}")
+                groups = {}
+                for position, filter in enumerate(filters):
+                    key = json.dumps(filter, sort_keys=True, default=str) if filter else None
+                    groups.setdefault(key, (filter, []))[1].append(position)
+            
+            for filter, positions in groups.values():
+                results = self.collection.query(
+                    query_embeddings=query_embeddings[positions].tolist(),
+                    n_results=top_k,
+                    where=self._where(filter),
+                    include=["documents", "metadatas", "distances"]
+                )
+                for i, position in enumerate(positions):
+                    distances = np.asarray(results["distances"][i], dtype=np.float32)
+                    columns["ids"][position] = results["ids"][i]
+                    columns["documents"][position] = results["documents"][i]
+                    columns["metadatas"][position] = [meta or {} for meta in results["metadatas"][i]]
+                    columns["distances"][position] = distances
+                    columns["scores"][position] = 1.0 - distances
+            
+            logger.info(f"search_many ran {num_queries} queries in {len(groups)} Chroma calls")
+            return columns
+            
+        except Exception as e:
+            logger.error(f"Batched search failed: {str(e)}")
+            raise Exception(f"Batched search failed: {str(e)}")
+    
     def search(
         self,
-        query_embedding: List[float],
+        query_embedding: Union[np.ndarray, List[float]],
         top_k: int = None
     ) -> List[dict]:
         """
@@ -286,24 +655,14 @@ class VectorStore:
             List of results with documents, metadata, and distances
         """
         try:
-            top_k = top_k or int(os.getenv("TOP_K_RESULTS", "5"))
-            
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k
-            )
-            
-            # Format results
-            formatted_results = []
-            for i in range(len(results["documents"][0])):
-                formatted_results.append({
-                    "document": results["documents"][0][i],
-                    "metadata": results["metadatas"][0][i],
-                    "distance": results["distances"][0][i],
-                    "id": results["ids"][0][i]
-                })
-            
-            return formatted_results
+            columns = self.search_many([query_embedding], top_k)
+            return [
+                {"document": document, "metadata": metadata, "distance": float(distance), "id": id}
+                for id, document, metadata, distance in zip(
+                    columns["ids"][0], columns["documents"][0],
+                    columns["metadatas"][0], columns["distances"][0].tolist()
+                )
+            ]
             
         except Exception as e:
             logger.error(f"Search failed: {str(e)}")
@@ -313,7 +672,7 @@ class VectorStore:
     
     def search_by_embedding(
         self,
-        query_embedding: List[float],
+        query_embedding: Union[np.ndarray, List[float]],
         top_k: int = 5,
         filter: Optional[Dict] = None
     ) -> List[Dict]:
@@ -322,33 +681,22 @@ class VectorStore:
         This method is required by the orchestrator
         """
         try:
-            top_k = top_k or int(os.getenv("TOP_K_RESULTS", "5"))
-            
-            # Build where clause for filtering
-            where_clause = None
-            if filter:
-                where_clause = {}
-                for key, value in filter.items():
-                    where_clause[key] = value
-            
-            # Perform the search
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k,
-                where=where_clause
-            )
+            columns = self.search_many([query_embedding], top_k, filter)
             
             # Format results to match the expected format in orchestrator
-            formatted_results = []
-            if results["documents"] and len(results["documents"]) > 0:
-                for i in range(len(results["documents"][0])):
-                    formatted_results.append({
-                        "document": results["documents"][0][i],
-                        "content": results["documents"][0][i],  # Duplicate for compatibility
-                        "metadata": results["metadatas"][0][i] if results["metadatas"] and i < len(results["metadatas"][0]) else {},
-                        "score": 1.0 - results["distances"][0][i] if results["distances"] and i < len(results["distances"][0]) else 0.5,
-                        "distance": results["distances"][0][i] if results["distances"] and i < len(results["distances"][0]) else 0.5
-                    })
+            formatted_results = [
+                {
+                    "document": document,
+                    "content": document,  # Duplicate for compatibility
+                    "metadata": metadata,
+                    "score": score,
+                    "distance": distance
+                }
+                for document, metadata, score, distance in zip(
+                    columns["documents"][0], columns["metadatas"][0],
+                    columns["scores"][0].tolist(), columns["distances"][0].tolist()
+                )
+            ]
             
             logger.info(f"search_by_embedding found {len(formatted_results)} results")
             return formatted_results
@@ -400,7 +748,7 @@ class VectorStore:
             self.client.delete_collection(name=self.collection_name)
             self.collection = self.client.get_or_create_collection(
                 name=self.collection_name,
-                metadata={"hnsw:space": "cosine"}
+                metadata=self._collection_metadata(self.collection_name)
             )
             logger.info(f"Reset collection: {self.collection_name}")
         except Exception as e:
@@ -416,7 +764,8 @@ class VectorStore:
         return {
             "name": self.collection_name,
             "count": self.collection.count(),
-            "persist_directory": self.persist_directory
+            "persist_directory": self.persist_directory,
+            "embedding_model": self.collection.metadata.get("embedding_model") if self.collection.metadata else None
         }
 
 # ============================================
@@ -496,7 +845,29 @@ class GraphStore:
 # Dependency Factory Functions
 # ============================================
 
-@lru_cache()
+def _singleton(factory):
+    """
+    lru_cache for zero-argument factories, with construction serialized
+    
+    Warm-up threads and request handlers may ask for the same service at
+    once; the first caller builds it and the others wait for that instance
+    instead of loading a second model.
+    """
+    cached = lru_cache()(factory)
+    lock = threading.Lock()
+    
+    @wraps(factory)
+    def get():
+        if cached.cache_info().currsize:
+            return cached()
+        with lock:
+            return cached()
+    
+    get.cache_clear = cached.cache_clear
+    return get
+
+
+@_singleton
 def get_llm_service() -> LLMService:
     """
     Get singleton LLM service instance
@@ -505,16 +876,25 @@ def get_llm_service() -> LLMService:
     return LLMService()
 
 
-@lru_cache()
-def get_embedding_service() -> EmbeddingService:
+@_singleton
+def get_embedding_service() -> ActiveEmbeddingService:
     """
     Get singleton embedding service instance
-    Uses sentence-transformers with configuration from .env
+    Uses sentence-transformers with the model that built the active
+    collection (see app/services/embedding_registry.py), or the shared
+    embedding server when EMBEDDING_SERVER_SOCKET is set
     """
-    return EmbeddingService()
+    from app.services.embedding_registry import check_active_model, get_model_registry
+    if os.getenv("EMBEDDING_SERVER_SOCKET"):
+        from app.services.embedding_client import RemoteEmbeddingService
+        service = RemoteEmbeddingService()
+    else:
+        service = EmbeddingService(get_model_registry().active()[1]["model"])
+    check_active_model(service)
+    return ActiveEmbeddingService(service)
 
 
-@lru_cache()
+@_singleton
 def get_vectorstore() -> VectorStore:
     """
     Get singleton vector store instance
@@ -632,14 +1012,17 @@ class RAGOrchestrator:
 
 # Global orchestrator instance
 _orchestrator = None
+_orchestrator_lock = threading.Lock()
 
 
 def initialize_orchestrator():
     """Initialize the global orchestrator"""
     global _orchestrator
     if _orchestrator is None:
-        _orchestrator = RAGOrchestrator()
-        logger.info("Global orchestrator initialized")
+        with _orchestrator_lock:
+            if _orchestrator is None:
+                _orchestrator = RAGOrchestrator()
+                logger.info("Global orchestrator initialized")
 
 
 def get_orchestrator() -> RAGOrchestrator:
@@ -715,33 +1098,25 @@ logger = logging.getLogger(__name__)
 # ============================================
 
 def extract_text_from_pdf_bytes(pdf_bytes):
-    """Extract text from PDF bytes with enhanced error handling"""
+    """
+    Extract text from PDF bytes with enhanced error handling
+    
+    Also accepts a file path (preferred: pool workers read the file
+    themselves) or binary file object. Pages are extracted in parallel by
+    app.utils.pdf_reader.extract_pdf; use that directly for page offsets.
+    """
     try:
-        from PyPDF2 import PdfReader
-        
-        reader = PdfReader(io.BytesIO(pdf_bytes))
-        text = ""
-        
-        logger.info(f"[PDF] Processing PDF with {len(reader.pages)} pages")
+        from app.utils.pdf_reader import extract_pdf
         
-        for page_num, page in enumerate(reader.pages):
-            try:
-                page_text = page.extract_text() or ""
-                if page_text.strip():
-                    text += f"Page {page_num + 1}:\n{page_text}\n\n"
-                    logger.debug(f"[PDF] Extracted {len(page_text)} chars from page {page_num + 1}")
-                else:
-                    logger.warning(f"[PDF] No text extracted from page {page_num + 1}")
-            except Exception as e:
-                logger.warning(f"[PDF] Failed to extract text from page {page_num + 1}: {str(e)}")
-                continue
+        result = extract_pdf(pdf_bytes)
+        logger.info(f"[PDF] Processed PDF with {result.page_count} pages ({len(result.skipped)} skipped)")
         
-        if not text.strip():
+        if not result.text.strip():
             logger.warning("[PDF] No text content extracted from any page")
             return ""
             
-        logger.info(f"[PDF] Successfully extracted {len(text)} total characters")
-        return text
+        logger.info(f"[PDF] Successfully extracted {len(result.text)} total characters")
+        return result.text
         
     except ImportError:
         logger.error("[PDF] PyPDF2 not installed. Install with: pip install PyPDF2")
@@ -754,8 +1129,13 @@ def extract_text_from_pdf_bytes(pdf_bytes):
 # DOCX Extraction
 # ============================================
 
-def extract_text_from_docx_bytes(file_bytes: bytes) -> str:
-    """Extract text from DOCX bytes with enhanced error handling"""
+def extract_text_from_docx_bytes(file_bytes) -> str:
+    """
+    Extract text from DOCX bytes with enhanced error handling
+    
+    Also accepts a file path or binary file object (the zip members are
+    read from it one at a time).
+    """
     try:
         import docx
     except ImportError:
@@ -763,7 +1143,7 @@ def extract_text_from_docx_bytes(file_bytes: bytes) -> str:
         raise RuntimeError("python-docx is required for DOCX extraction. Install with: pip install python-docx")
     
     try:
-        doc = docx.Document(io.BytesIO(file_bytes))
+        doc = docx.Document(io.BytesIO(file_bytes) if isinstance(file_bytes, (bytes, bytearray)) else file_bytes)
         text = ""
         
         # Extract from paragraphs
@@ -809,13 +1189,18 @@ def extract_text_from_docx_bytes(file_bytes: bytes) -> str:
 # TXT Extraction
 # ============================================
 
-def extract_text_from_txt_bytes(file_bytes: bytes) -> str:
-    """Extract text from TXT bytes with enhanced encoding detection"""
+def extract_text_from_txt_bytes(file_bytes) -> str:
+    """
+    Extract text from TXT bytes with enhanced encoding detection
+    
+    Any buffer works, e.g. an mmap of the file: it is decoded in place
+    without first being copied into a bytes object.
+    """
     encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1', 'utf-16', 'utf-16-le', 'utf-16-be']
     
     for encoding in encodings:
         try:
-            text = file_bytes.decode(encoding)
+            text = str(file_bytes, encoding)
             # Validate that we got meaningful text (not just binary data)
             if text.strip() and any(char.isalnum() for char in text):
                 logger.info(f"[TXT] Successfully decoded with {encoding}, extracted {len(text)} characters")
@@ -828,7 +1213,7 @@ def extract_text_from_txt_bytes(file_bytes: bytes) -> str:
     
     # Fallback: try with common encoding and ignore errors
     try:
-        text = file_bytes.decode('utf-8', errors='ignore')
+        text = str(file_bytes, 'utf-8', 'ignore')
         if text.strip():
             logger.warning(f"[TXT] Using utf-8 with error ignore, extracted {len(text)} characters")
             return text
@@ -837,7 +1222,7 @@ def extract_text_from_txt_bytes(file_bytes: bytes) -> str:
     
     # Last resort: try to decode as ASCII
     try:
-        text = file_bytes.decode('ascii', errors='ignore')
+        text = str(file_bytes, 'ascii', 'ignore')
         if text.strip():
             logger.warning(f"[TXT] Using ASCII with error ignore, extracted {len(text)} characters")
             return text
@@ -853,55 +1238,27 @@ def extract_text_from_txt_bytes(file_bytes: bytes) -> str:
 
 def chunk_text(text: str, chunk_size: int = 800, chunk_overlap: int = 100) -> List[Dict]:
     """Chunk text with overlap and return list of chunk dictionaries"""
+    from app.services.chunking import iter_chunks
+
     if not text or len(text.strip()) == 0:
         logger.warning("[CHUNKING] Empty text provided for chunking")
         return []
     
-    # Clean the text
-    clean_text = text.strip()
-    words = clean_text.split()
-    
-    if len(words) <= chunk_size:
-        logger.info(f"[CHUNKING] Text is small ({len(words)} words), returning single chunk")
-        return [{
-            "content": clean_text,
-            "word_count": len(words),
-            "char_count": len(clean_text)
-        }]
-    
-    chunks = []
-    start = 0
-    
-    while start < len(words):
-        end = start + chunk_size
-        chunk_words = words[start:end]
-        chunk_text = " ".join(chunk_words)
-        
-        chunks.append({
-            "content": chunk_text,
-            "word_count": len(chunk_words),
-            "char_count": len(chunk_text),
-            "start_word": start,
-            "end_word": min(end, len(words))
-        })
-        
-        if end >= len(words):
-            break
-            
-        # Move start position with overlap
-        start = end - chunk_overlap
-        if start < 0:
-            start = 0
-        # Prevent infinite loop
-        if start >= len(words):
-            break
+    # Word windows with their word positions, in one pass (app/services/chunking.py)
+    chunks = [{
+        "content": chunk.text,
+        "word_count": chunk.unit_end - chunk.unit_start,
+        "char_count": len(chunk.text),
+        "start_word": chunk.unit_start,
+        "end_word": chunk.unit_end
+    } for chunk in iter_chunks(text, chunk_size, chunk_overlap, unit="words")]
     
     # Calculate statistics
     if chunks:
         word_counts = [chunk['word_count'] for chunk in chunks]
         char_counts = [chunk['char_count'] for chunk in chunks]
         
-        logger.info(f"[CHUNKING] Created {len(chunks)} chunks from {len(words)} words")
+        logger.info(f"[CHUNKING] Created {len(chunks)} chunks from {chunks[-1]['end_word']} words")
         logger.info(f"[CHUNKING] Chunk stats - Words: min={min(word_counts)}, max={max(word_counts)}, avg={sum(word_counts)/len(word_counts):.1f}")
         logger.info(f"[CHUNKING] Chunk stats - Chars: min={min(char_counts)}, max={max(char_counts)}, avg={sum(char_counts)/len(char_counts):.1f}")
     
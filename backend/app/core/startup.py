@@ -0,0 +1,242 @@
+"""
+===================================================================
+app/core/startup.py - Concurrent warm-up and readiness
+===================================================================
+The lifespan used to build the database tables, orchestrator, LLM
+client, embedding model and Chroma client one after another before the
+server answered anything. Now each of those is a component warmed up in
+its own worker thread after the server starts listening:
+
+    liveness   /ping answers as soon as the process is up
+    readiness  /ready answers 200 once every STARTUP_REQUIRED component
+               is warm (503 with per-component status until then)
+
+A component starts as soon as the components it runs after have finished
+(successfully or not); independent ones load at the same time. Set
+STARTUP_BACKGROUND_WARMUP=false to finish warm-up before serving.
+"""
+import asyncio
+import logging
+import os
+import time
+import traceback
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+@dataclass
+class Component:
+    """One service to warm up"""
+    name: str
+    load: Callable[[], Optional[str]]
+    after: Tuple[str, ...] = ()
+    status: str = PENDING
+    detail: Optional[str] = None
+    error: Optional[str] = None
+    seconds: Optional[float] = None
+    _done: Optional[asyncio.Event] = field(default=None, repr=False)
+
+
+class Warmup:
+    """Runs components concurrently in threads and tracks readiness"""
+
+    def __init__(self, components: List[Component], required: List[str] = None):
+        """
+        Args:
+            components: Services to warm up
+            required: Components that must be ready for /ready to pass.
+                Defaults to STARTUP_REQUIRED (comma separated).
+        """
+        self.components: Dict[str, Component] = {component.name: component for component in components}
+        if required is None:
+            required = os.getenv(
+                "STARTUP_REQUIRED", "database,embedding_service,vector_store,orchestrator"
+            ).split(",")
+        self.required = [name.strip() for name in required if name.strip() in self.components]
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+        for component in components:
+            unknown = [name for name in component.after if name not in self.components]
+            if unknown:
+                raise ValueError(f"Component '{component.name}' runs after unknown components {unknown}")
+
+    async def _run_component(self, component: Component) -> None:
+        for name in component.after:
+            await self.components[name]._done.wait()
+
+        component.status = LOADING
+        start = time.perf_counter()
+        try:
+            component.detail = await asyncio.to_thread(component.load)
+            component.status = READY
+            logger.info(f"[STARTUP] {component.name} ready in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            component.status = FAILED
+            component.error = str(e)
+            logger.error(f"[STARTUP] {component.name} failed: {str(e)}")
+            logger.error(traceback.format_exc())
+        finally:
+            component.seconds = round(time.perf_counter() - start, 3)
+            component._done.set()
+
+    async def run(self) -> None:
+        """Warm up every component, each as soon as its prerequisites are done"""
+        self.started_at = time.perf_counter()
+        for component in self.components.values():
+            component._done = asyncio.Event()
+        await asyncio.gather(*(self._run_component(component) for component in self.components.values()))
+        self.finished_at = time.perf_counter()
+
+        failed = [name for name, component in self.components.items() if component.status == FAILED]
+        logger.info(
+            f"[STARTUP] Warm-up finished in {self.finished_at - self.started_at:.2f}s"
+            + (f", failed: {', '.join(failed)}" if failed else "")
+        )
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def ready(self) -> bool:
+        """Every required component is warm"""
+        return all(self.components[name].status == READY for name in self.required)
+
+    def components_ready(self, names) -> bool:
+        """Every one of the named components is warm"""
+        return all(self.components[name].status == READY for name in names if name in self.components)
+
+    def status(self) -> Dict:
+        """Readiness plus per-component status and load time"""
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = round((self.finished_at or time.perf_counter()) - self.started_at, 3)
+        return {
+            "ready": self.ready,
+            "finished": self.finished,
+            "elapsed_seconds": elapsed,
+            "required": self.required,
+            "components": {
+                name: {
+                    "status": component.status,
+                    "seconds": component.seconds,
+                    **({"detail": component.detail} if component.detail else {}),
+                    **({"error": component.error} if component.error else {})
+                }
+                for name, component in self.components.items()
+            }
+        }
+
+
+# ============================================
+# Components
+# ============================================
+
+def _init_database() -> str:
+    # Import ORM models so their tables are registered on Base
+    from app.models.user import User
+    from app.models.role import Role
+    from app.models.permission import Permission
+    from app.models.image_category import ImageCategory
+    from app.models.image import Image
+    from app.database import engine as hrm_engine, Base
+    from app.core.config import init_db
+
+    Base.metadata.create_all(bind=hrm_engine)
+    init_db()
+    return "HRM and RAG tables created"
+
+
+def _load_llm_service() -> str:
+    from app.core.dependencies import get_llm_service
+    return get_llm_service().model
+
+
+def _load_embedding_service() -> str:
+    from app.core.dependencies import get_embedding_service
+    service = get_embedding_service()
+    # First forward pass pays for lazy weight/kernel initialisation
+    service.embed_text("warm up")
+    return f"{service.model_name} ({service.backend})"
+
+
+def _load_vector_store() -> str:
+    from app.core.dependencies import get_vectorstore
+    return f"{get_vectorstore().get_count()} documents"
+
+
+def _load_memory_vector_store() -> str:
+    from app.services.vectorstore import get_vector_store
+    return f"{get_vector_store().get_count()} documents"
+
+
+def _load_lexical_index() -> str:
+    from app.core.config import SessionLocal
+    from app.services.lexical_index import sync_lexical_index
+    db = SessionLocal()
+    try:
+        return f"{len(sync_lexical_index(db))} chunks"
+    finally:
+        db.close()
+
+
+def _load_near_duplicate_index() -> str:
+    from app.core.config import SessionLocal
+    from app.services.near_duplicates import sync_near_duplicate_index
+    db = SessionLocal()
+    try:
+        stats = sync_near_duplicate_index(db).stats()
+        return f"{stats['canonical_chunks']} canonical, {stats['duplicate_chunks']} duplicate chunks"
+    finally:
+        db.close()
+
+
+def _load_reranker() -> str:
+    from app.services.reranker import get_reranker
+    reranker = get_reranker()
+    if reranker is None:
+        return "disabled"
+    reranker.model  # loads the cross-encoder
+    return reranker.model_name
+
+
+def _load_orchestrator() -> str:
+    from app.core.dependencies import initialize_orchestrator
+    from app.services.orchestrator import get_rag_orchestrator
+    initialize_orchestrator()
+    get_rag_orchestrator()
+    return "agentic orchestrator built"
+
+
+def default_components() -> List[Component]:
+    """The services the API needs, with their ordering constraints"""
+    return [
+        Component("database", _init_database),
+        Component("llm_service", _load_llm_service),
+        Component("embedding_service", _load_embedding_service),
+        Component("vector_store", _load_vector_store),
+        Component("memory_vector_store", _load_memory_vector_store),
+        Component("lexical_index", _load_lexical_index, after=("database",)),
+        Component("near_duplicate_index", _load_near_duplicate_index, after=("database",)),
+        Component("reranker", _load_reranker),
+        Component("orchestrator", _load_orchestrator, after=("llm_service", "embedding_service", "vector_store"))
+    ]
+
+
+_warmup: Optional[Warmup] = None
+
+
+def get_warmup() -> Warmup:
+    """Get the application's warm-up tracker"""
+    global _warmup
+    if _warmup is None:
+        _warmup = Warmup(default_components())
+    return _warmup
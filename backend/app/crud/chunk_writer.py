@@ -0,0 +1,114 @@
+"""
+app/crud/chunk_writer.py - Bulk writes of document chunks
+
+Ingestion writes thousands of chunk rows per document. Going through
+the ORM (one DocumentChunk object per row, identity map, unit-of-work
+flush) costs more than the database does, so rows are written as plain
+tuples in batches of CHUNK_WRITE_BATCH_SIZE:
+
+    copy     PostgreSQL through psycopg2: COPY document_chunks FROM STDIN
+    insert   any database: Core insert() executemany (multi-row VALUES
+             batches on PostgreSQL)
+
+CHUNK_WRITE_METHOD picks one (default "auto": copy when available).
+Rows go through the session's connection, so they are part of its
+transaction and committed (or rolled back) with it.
+"""
+import csv
+import io
+import json
+import logging
+import os
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, List
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.rag_model import DocumentChunk
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("id", "document_id", "content", "chunk_index", "meta_data", "created_at")
+
+# meta_data keys carried into the vector store / lexical index metadata
+VECTOR_METADATA_KEYS = ("source", "content_type", "page_start", "page_end")
+
+
+def vector_metadata(chunk_id: str, document_id: str, chunk_index: int, content: str, meta_data: Dict) -> Dict:
+    """Chroma / BM25 metadata of a chunk row (Chroma rejects None values, so they are left out)"""
+    metadata = {
+        "chunk_id": chunk_id,
+        "chunk_index": chunk_index,
+        "document_id": document_id,
+        "chunk_size": len(content)
+    }
+    for key in VECTOR_METADATA_KEYS:
+        metadata[key] = (meta_data or {}).get(key)
+    return {key: value for key, value in metadata.items() if value is not None}
+
+
+def write_method(db: Session) -> str:
+    """copy or insert for this session's database"""
+    method = os.getenv("CHUNK_WRITE_METHOD", "auto").lower()
+    if method in ("copy", "insert"):
+        return method
+    bind = db.get_bind()
+    return "copy" if bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg2" else "insert"
+
+
+def _copy(db: Session, rows: List[Dict]) -> None:
+    buffer = io.StringIO()
+    # QUOTE_ALL: every value is non-null, and quoted empty fields are empty strings to COPY
+    writer = csv.writer(buffer, quoting=csv.QUOTE_ALL, lineterminator="\n")
+    for row in rows:
+        writer.writerow((
+            row["id"], row["document_id"], row["content"], row["chunk_index"],
+            json.dumps(row["meta_data"]), row["created_at"].isoformat()
+        ))
+    buffer.seek(0)
+    # The DBAPI connection of the session's current transaction
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {DocumentChunk.__tablename__} ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+    finally:
+        cursor.close()
+
+
+def write_chunks(db: Session, rows: Iterable[Dict], batch_size: int = None, method: str = None) -> int:
+    """
+    Insert chunk rows without the ORM
+
+    Args:
+        db: Session whose transaction the rows join; the caller commits
+        rows: Dicts with id, document_id, content, chunk_index and meta_data
+            (created_at is set to one timestamp for the whole call if missing)
+        batch_size: Rows per statement / COPY. Defaults to CHUNK_WRITE_BATCH_SIZE.
+        method: "copy" or "insert"; defaults to write_method(db)
+
+    Returns:
+        Number of rows written
+    """
+    batch_size = batch_size or int(os.getenv("CHUNK_WRITE_BATCH_SIZE", "5000"))
+    method = method or write_method(db)
+    created_at = datetime.utcnow()
+    statement = insert(DocumentChunk.__table__)
+    written = 0
+    rows = iter(rows)
+    while True:
+        batch = [dict(row) for row in islice(rows, batch_size)]
+        if not batch:
+            break
+        for row in batch:
+            row.setdefault("created_at", created_at)
+            row.setdefault("meta_data", {})
+        if method == "copy":
+            _copy(db, batch)
+        else:
+            db.execute(statement, batch)
+        written += len(batch)
+    logger.debug(f"[CHUNKS] Wrote {written} chunk rows ({method})")
+    return written
@@ -2,6 +2,7 @@ from sqlalchemy.orm import Session
 from fastapi import UploadFile, HTTPException
 from app.models.image import Image
 from app.schemas import ImageCreate, ImageUpdate
+from app.services.upload_spool import UploadTooLarge, spool_file
 import shutil
 import os
 from datetime import datetime
@@ -60,16 +61,21 @@ def save_image_file(file: UploadFile):
         filename = f"{timestamp}.{file_ext}" if file_ext else timestamp
         file_path = upload_dir / filename
         
-        # Save the file
-        with open(file_path, "wb") as buffer:
-            buffer.write(file.file.read())
+        # Copied in chunks with the size checked on the way, never read whole
+        file.file.seek(0)
+        try:
+            spooled = spool_file(file.file, str(file_path), MAX_IMAGE_SIZE)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
         
         return {
-            "image_path": str(file_path),
+            "image_path": spooled.path,
             "original_filename": file.filename,
-            "file_size": os.path.getsize(file_path),
+            "file_size": spooled.size,
             "mime_type": file.content_type
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, 
@@ -8,6 +8,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import logging.config
 from pathlib import Path
 from datetime import datetime
@@ -78,61 +79,61 @@ async def lifespan(app: FastAPI):
         logger.info(f"Directory created: {directory}/")
     
     # =================================================================
-    # DATABASE INITIALIZATION (HRM + RAG)
+    # WARM-UP (database, models, vector stores, indexes)
     # =================================================================
-    try:
-        # Import ORM models for HRM system
-        from app.models.user import User
-        from app.models.role import Role
-        from app.models.permission import Permission
-        from app.models.image_category import ImageCategory
-        from app.models.image import Image
-        
-        # Import database setup
-        from app.database import engine as hrm_engine, Base
-        
-        # Create HRM tables
-        logger.info("Creating HRM database tables...")
-        Base.metadata.create_all(bind=hrm_engine)
-        logger.info("[OK] HRM database tables created")
+    # Components load concurrently in worker threads; /ping answers at
+    # once and /ready reports when the required ones are warm
+    from app.core.startup import get_warmup
+    warmup = get_warmup()
+    
+    async def warm_up():
+        await warmup.run()
+        try:
+            from app.core.dependencies import check_dependencies_health
+            health = await asyncio.to_thread(check_dependencies_health)
+            for service, status in health.items():
+                if status == "operational":
+                    logger.info(f"[OK] {service}: {status}")
+                elif status == "disabled":
+                    logger.info(f"[DISABLED] {service}: {status}")
+                else:
+                    logger.warning(f"[ERROR] {service}: {status}")
+        except Exception as e:
+            logger.error(f"Health check failed: {str(e)}")
+            logger.error(traceback.format_exc())
         
-        # Initialize RAG database
-        init_db()
-        logger.info("[OK] RAG database initialized successfully")
-    except Exception as e:
-        logger.error(f"[ERROR] Database initialization failed: {str(e)}")
-        logger.error(traceback.format_exc())
-        # Don't raise - allow app to continue
+        if warmup.ready:
+            logger.info("[OK] All services ready")
+        else:
+            logger.warning("[WARNING] Required services failed to start; /ready will report 503")
     
-    # =================================================================
-    # INITIALIZE RAG ORCHESTRATOR
-    # =================================================================
-    try:
-        from app.core.dependencies import initialize_orchestrator
-        initialize_orchestrator()
-        logger.info("[OK] RAG Orchestrator initialized")
-    except Exception as e:
-        logger.error(f"[ERROR] Orchestrator initialization failed: {str(e)}")
-        logger.error(traceback.format_exc())
+    warmup_task = asyncio.create_task(warm_up())
+    if os.getenv("STARTUP_BACKGROUND_WARMUP", "true").lower() == "true":
+        logger.info("[INFO] Warming up services in the background (see /ready)")
+    else:
+        await warmup_task
     
-    # =================================================================
-    # HEALTH CHECK
-    # =================================================================
-    try:
-        from app.core.dependencies import check_dependencies_health
-        health = check_dependencies_health()
-        for service, status in health.items():
-            if status == "operational":
-                logger.info(f"[OK] {service}: {status}")
-            elif status == "disabled":
-                logger.info(f"[DISABLED] {service}: {status}")
-            else:
-                logger.warning(f"[ERROR] {service}: {status}")
-    except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
-        logger.error(traceback.format_exc())
+    async def follow_registry():
+        # Switch with the other workers when a re-embedding job activates a new collection
+        await warmup_task
+        if warmup.ready:
+            from app.services.embedding_registry import watch_registry
+            await watch_registry()
+    
+    registry_task = asyncio.create_task(follow_registry())
+    
+    async def start_ingestion():
+        # Queued uploads wait for the models and stores they are indexed into,
+        # not for unrelated components (LLM, orchestrator)
+        await warmup_task
+        from app.services.ingestion import REQUIRED_COMPONENTS, get_ingestion_queue
+        if warmup.components_ready(REQUIRED_COMPONENTS):
+            await get_ingestion_queue().start()
+        else:
+            logger.warning(f"[WARNING] Ingestion workers not started: {', '.join(REQUIRED_COMPONENTS)} must be ready")
+    
+    ingestion_task = asyncio.create_task(start_ingestion())
     
-    logger.info("[OK] All services ready")
     logger.info(f"[INFO] API Documentation: http://localhost:8000/docs")
     logger.info("=" * 60)
     
@@ -142,6 +143,52 @@ async def lifespan(app: FastAPI):
     # SHUTDOWN
     # =================================================================
     logger.info("Shutting down application...")
+    if not warmup_task.done():
+        # Let loaders finish before their state is saved
+        logger.info("Waiting for warm-up to finish before shutdown...")
+        await asyncio.wait({warmup_task}, timeout=60)
+    registry_task.cancel()
+    ingestion_task.cancel()
+    
+    try:
+        from app.services.ingestion import get_ingestion_queue
+        # Interrupted jobs are queued again and restart on the next start-up
+        await get_ingestion_queue().stop()
+        logger.info("[OK] Ingestion workers stopped")
+    except Exception as e:
+        logger.error(f"Error stopping ingestion workers: {str(e)}")
+
+    from app.utils.pdf_reader import shutdown_pdf_pool
+    shutdown_pdf_pool()
+
+    from app.services.embedding_registry import get_reembed_job
+    job = get_reembed_job()
+    if job is not None and job.task is not None and not job.task.done():
+        # Progress is in the registry: starting the job again resumes it
+        logger.info(f"[REEMBED] Stopping re-embedding with {job.model_name} after {job.done} chunks")
+        job.task.cancel()
+    
+    try:
+        from app.services.vectorstore import save_vector_store
+        save_vector_store()
+        logger.info("[OK] In-memory vector store saved")
+    except Exception as e:
+        logger.error(f"Error saving in-memory vector store: {str(e)}")
+    
+    try:
+        from app.services.lexical_index import save_lexical_index
+        save_lexical_index()
+        logger.info("[OK] Lexical index saved")
+    except Exception as e:
+        logger.error(f"Error saving lexical index: {str(e)}")
+    
+    try:
+        from app.services.near_duplicates import save_near_duplicate_index
+        save_near_duplicate_index()
+        logger.info("[OK] Near-duplicate index saved")
+    except Exception as e:
+        logger.error(f"Error saving near-duplicate index: {str(e)}")
+    
     try:
         engine.dispose()
         logger.info("[OK] Database connections closed")
@@ -207,6 +254,21 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+
+@app.middleware("http")
+async def readiness_gate(request, call_next):
+    """RAG endpoints answer 503 while warm-up runs instead of blocking on model loads"""
+    if request.url.path.startswith("/api/rag"):
+        from app.core.startup import get_warmup
+        warmup = get_warmup()
+        if not warmup.finished:
+            return JSONResponse(
+                status_code=503,
+                headers={"Retry-After": "5"},
+                content={"error": "Service warming up", "startup": warmup.status()}
+            )
+    return await call_next(request)
+
 # =================================================================
 # STATIC FILES (mount after routers to avoid conflicts)
 # =================================================================
@@ -317,6 +379,7 @@ async def root():
             "documentation": "/docs",
             "alternative_docs": "/redoc",
             "health": "/health",
+            "ready": "/ready",
             "routes": "/debug/routes",
             "auth": "/api/auth/login",
             "employees": "/api/employees",
@@ -331,8 +394,11 @@ async def health_check():
     """Comprehensive health check for all systems"""
     try:
         from app.core.dependencies import get_orchestrator
+        from app.core.startup import get_warmup
         from sqlalchemy import text
         
+        warmup = get_warmup()
+        
         # Database health
         db_status = "operational"
         try:
@@ -341,8 +407,10 @@ async def health_check():
         except Exception as e:
             db_status = f"error: {str(e)}"
         
-        # RAG orchestrator stats
+        # RAG orchestrator stats (not while warm-up may still be building it)
         try:
+            if not warmup.finished:
+                raise RuntimeError("warming up")
             orchestrator = get_orchestrator()
             stats = orchestrator.get_stats()
         except Exception:
@@ -374,7 +442,8 @@ async def health_check():
                 "vector_store": "operational",
                 "knowledge_graph": "operational" if settings.ENABLE_GRAPH_RAG else "disabled"
             },
-            "stats": stats
+            "stats": stats,
+            "startup": warmup.status()
         }
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -393,7 +462,7 @@ def hello():
 
 @app.get("/ping", tags=["Root"])
 async def ping():
-    """Simple ping endpoint"""
+    """Liveness probe: answers as soon as the process is serving"""
     cnn_status = "loaded" if cnn_model and getattr(cnn_model, 'is_loaded', False) else "not_loaded"
     return {
         "status": "healthy", 
@@ -402,6 +471,14 @@ async def ping():
     }
 
 
+@app.get("/ready", tags=["Root"])
+async def ready():
+    """Readiness probe: 200 once the required services are warm, 503 until then"""
+    from app.core.startup import get_warmup
+    status = get_warmup().status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
 @app.get("/test", tags=["Root"])
 def test():
     """Test endpoint"""
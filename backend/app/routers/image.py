@@ -274,6 +274,9 @@ def update_image_route(
         db.refresh(db_image)
         return db_image
 
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,7 +1,7 @@
 import io
 import os
 import traceback
-from fastapi import APIRouter, BackgroundTasks, HTTPException, UploadFile, File, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Response, UploadFile, File, Depends
 from sqlalchemy.orm import Session
 from typing import Dict
 import time
@@ -42,10 +42,13 @@ from app.schemas.rag_schemas import (
     # Session schemas (NEW)
     SessionCreate,
     SessionResponse,
+    
+    # Embedding model schemas
+    ReembedRequest,
 )
 
 # Database
-from app.core.config import get_db
+from app.core.config import get_db, settings
 from app.models.rag_model import (
     Document,
     DocumentChunk,
@@ -57,15 +60,20 @@ from app.models.rag_model import (
 
 # Dependencies
 from app.core.dependencies import (
-    extract_text_from_docx_bytes,
-    extract_text_from_pdf_bytes,
-    extract_text_from_txt_bytes,
     get_rag_service,
     get_vectorstore,
     get_embedding_service
 )
 from app.core.enums import RAGStrategy
-from app.services.chunking import chunk_text
+from app.services.embedding_registry import get_model_registry, get_reembed_job, start_reembedding
+from app.services.ingestion import (
+    get_ingestion_queue, ingestion_available, ingestion_status, remove_upload, upload_path
+)
+from app.services.lexical_index import get_lexical_index
+from app.services.near_duplicates import (
+    get_near_duplicate_index, promote_duplicates, reindex_promoted
+)
+from app.services.upload_spool import UploadTooLarge, spool_upload
 from app.models.rag_model import Query
 
 from app.core.dependencies import get_vectorstore
@@ -247,6 +255,8 @@ async def clear_all_documents(db: Session = Depends(get_db)):
             
             # Clear ChromaDB collection
             vector_store.reset_collection()
+            get_lexical_index().clear()
+            get_near_duplicate_index().clear()
             
             # Verify it's actually cleared
             vector_count_after = vector_store.get_count()
@@ -265,6 +275,10 @@ async def clear_all_documents(db: Session = Depends(get_db)):
                 detail=f"Failed to clear vector store: {str(e)}"
             )
         
+        # Files of documents still waiting for ingestion
+        for document in db.query(Document).filter(Document.status.in_(["queued", "processing"])):
+            remove_upload(document)
+        
         # 🧹 STEP 2: Delete from database (your existing code)
         deleted_docs = 0
         deleted_chunks = 0
@@ -369,17 +383,22 @@ async def clear_all_documents(db: Session = Depends(get_db)):
 
     
 from app.core.dependencies import get_vectorstore, get_embedding_service
-@router.post("/upload", response_model=DocumentUploadResponse)
-async def upload_document(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    """Upload and process document for RAG (PDF, TXT, DOCX) - FIXED for ChromaDB"""
+@router.post("/upload", response_model=DocumentUploadResponse, status_code=202)
+async def upload_document(
+    response: Response,
+    file: UploadFile = File(...),
+    wait: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Queue a document (PDF, TXT, DOCX) for background ingestion
+
+    Answers 202 with the job id as soon as the file is saved; follow
+    progress at /documents/{id}/status. With ?wait=true the request waits
+    for the job and answers 200 with the final chunk counts, or 202 with
+    the current status if it is not done within INGEST_WAIT_TIMEOUT.
+    """
     start_time = time.time()
-    processing_metrics = {
-        'extraction_time': 0,
-        'chunking_time': 0,
-        'db_operations_time': 0,
-        'vector_store_time': 0,
-        'total_chars_processed': 0
-    }
     
     try:
         logger.info(f"[UPLOAD] Received file upload: {file.filename} (Size: {file.size or 'unknown'})")
@@ -399,222 +418,107 @@ async def upload_document(file: UploadFile = File(...), db: Session = Depends(ge
                     detail=f"File type not supported. Allowed: PDF, TXT, DOCX. Got: {file.content_type}"
                 )
 
-        # Read bytes
-        content = await file.read()
-        if len(content) == 0:
-            raise HTTPException(status_code=400, detail="Uploaded file is empty")
-
-        file_size_mb = len(content) / (1024 * 1024)
-        logger.info(f"[FILE] File size: {len(content)} bytes ({file_size_mb:.2f} MB)")
+        if not ingestion_available():
+            # The job would stay queued: the services it needs failed to start
+            raise HTTPException(
+                status_code=503,
+                detail="Document ingestion is unavailable: the embedding service or vector store failed to start"
+            )
 
-        # Extract text based on content type
-        extraction_start = time.time()
+        # Streamed to disk in chunks (never read whole), before the row exists,
+        # so a queued document always has its file
+        doc_id = str(uuid.uuid4())
         try:
-            if file.content_type == "application/pdf":
-                text = extract_text_from_pdf_bytes(content)
-            elif file.content_type == "text/plain":
-                text = extract_text_from_txt_bytes(content)
-            elif file.content_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-                text = extract_text_from_docx_bytes(content)
-            else:
-                # Fallback: try to detect by extension
-                if file.filename.lower().endswith('.pdf'):
-                    text = extract_text_from_pdf_bytes(content)
-                elif file.filename.lower().endswith('.docx'):
-                    text = extract_text_from_docx_bytes(content)
-                else:
-                    text = extract_text_from_txt_bytes(content)
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Text extraction failed: {str(e)}")
-        
-        processing_metrics['extraction_time'] = time.time() - extraction_start
-
-        # Enhanced text validation
-        if not text or text.strip() == "":
-            logger.warning(f"[WARN] No extractable text found in {file.filename}")
-            raise HTTPException(status_code=400, detail="No extractable text found in uploaded document")
-
-        clean_text = text.strip()
-        if len(clean_text) < 10:
-            logger.warning(f"[WARN] Very little text extracted from {file.filename}: {len(clean_text)} chars")
-            raise HTTPException(status_code=400, detail="Extracted text appears to be too short or invalid")
-
-        processing_metrics['total_chars_processed'] = len(clean_text)
-        logger.info(f"[TEXT] Extracted {len(clean_text)} characters from document")
-
-        # Chunk the extracted text
-        chunking_start = time.time()
-        chunks = chunk_text(clean_text)
-        processing_metrics['chunking_time'] = time.time() - chunking_start
-
-        # Validate chunks
-        if not isinstance(chunks, list) or not chunks:
-            raise HTTPException(status_code=400, detail="No chunks generated from document text")
-
-        logger.info(f"[CHUNKS] Generated {len(chunks)} chunks for file {file.filename}")
+            spooled = await spool_upload(file, upload_path(doc_id, file.filename), settings.MAX_DOCUMENT_SIZE)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        path = spooled.path
+        if spooled.size == 0:
+            os.remove(path)
+            raise HTTPException(status_code=400, detail="Uploaded file is empty")
 
-        # ✅ CRITICAL FIX: Use ChromaDB vector store instead of in-memory
-        
-        
-        vector_store = get_vectorstore()  # ✅ ChromaDB
-        embedding_service = get_embedding_service()
-        
-        # ✅ DEBUG: Check current ChromaDB state
-        chroma_count_before = vector_store.get_count()
-        logger.info(f"[CHROMA_DEBUG] ChromaDB count before upload: {chroma_count_before}")
+        file_size_mb = spooled.size / (1024 * 1024)
+        logger.info(f"[FILE] File size: {spooled.size} bytes ({file_size_mb:.2f} MB), sha256 {spooled.sha256[:12]}")
 
-        # Create document ID and DB record
-        doc_id = str(uuid.uuid4())
-        db_operations_start = time.time()
-        
         try:
             db_doc = Document(
                 id=doc_id,
                 filename=file.filename,
                 content_type=file.content_type,
-                size=len(content),
-                status="processing",
+                size=spooled.size,
+                status="queued",
                 chunks_count=0,
                 uploaded_at=datetime.utcnow(),
                 meta_data={
-                    "original_size": len(content),
-                    "processing_method": "chromadb_extraction",
-                    "extracted_chars": len(clean_text),
-                    "chunks_generated": len(chunks)
+                    "original_size": spooled.size,
+                    "sha256": spooled.sha256,
+                    "processing_method": "background_ingestion",
+                    "ingestion": {
+                        "stage": "queued",
+                        "percent": 0,
+                        "chunks_done": 0,
+                        "attempts": 0,
+                        "file_path": path,
+                        "updated_at": time.time()
+                    }
                 }
             )
             db.add(db_doc)
-            db.flush()
-
-            # ✅ FIXED: Generate embeddings and add to ChromaDB
-            vector_store_start = time.time()
-            
-            chunks_created = 0
-            failed_chunks = 0
-            chunk_details = []
-
-            # Prepare data for ChromaDB batch upload
-            documents_to_add = []
-            embeddings_to_add = []
-            metadatas_to_add = []
-            ids_to_add = []
-
-            for idx, chunk in enumerate(chunks):
-                try:
-                    chunk_text_content = chunk.get("content") if isinstance(chunk, dict) else chunk
-                    if not chunk_text_content or not chunk_text_content.strip():
-                        logger.warning(f"[WARN] Skipping empty chunk at index {idx}")
-                        failed_chunks += 1
-                        continue
-
-                    chunk_id = str(uuid.uuid4())
-
-                    # Create database chunk record
-                    db_chunk = DocumentChunk(
-                        id=chunk_id,
-                        document_id=doc_id,
-                        content=chunk_text_content,
-                        chunk_index=idx,
-                        meta_data={
-                            "source": file.filename,
-                            "content_type": file.content_type,
-                            "chunk_size": len(chunk_text_content),
-                            "chunk_chars": len(chunk_text_content)
-                        },
-                        created_at=datetime.utcnow()
-                    )
-                    db.add(db_chunk)
-
-                    # Prepare for ChromaDB batch upload
-                    documents_to_add.append(chunk_text_content)
-                    metadatas_to_add.append({
-                        "chunk_id": chunk_id,
-                        "chunk_index": idx,
-                        "document_id": doc_id,
-                        "source": file.filename,
-                        "content_type": file.content_type,
-                        "chunk_size": len(chunk_text_content)
-                    })
-                    ids_to_add.append(chunk_id)
-                    
-                    chunks_created += 1
-                    chunk_details.append({
-                        "index": idx,
-                        "size": len(chunk_text_content),
-                        "status": "success"
-                    })
-
-                except Exception as e:
-                    logger.error(f"[ERROR] Failed to process chunk {idx}: {str(e)}")
-                    failed_chunks += 1
-                    chunk_details.append({
-                        "index": idx,
-                        "size": len(chunk_text_content) if chunk_text_content else 0,
-                        "status": "failed",
-                        "error": str(e)
-                    })
-                    continue
-
-            # ✅ Generate embeddings and add to ChromaDB in batch
-            if documents_to_add:
-                logger.info(f"[CHROMA] Generating embeddings for {len(documents_to_add)} chunks...")
-                embeddings_to_add = embedding_service.embed_texts(documents_to_add)
-                
-                logger.info(f"[CHROMA] Adding {len(documents_to_add)} chunks to ChromaDB...")
-                vector_store.add_documents(
-                    documents=documents_to_add,
-                    embeddings=embeddings_to_add,
-                    metadata=metadatas_to_add,
-                    ids=ids_to_add
-                )
-                logger.info(f"[CHROMA] Successfully added {len(documents_to_add)} chunks to ChromaDB")
-
-            processing_metrics['vector_store_time'] = time.time() - vector_store_start
-
-            # Update document record
-            db_doc.status = "completed" if chunks_created > 0 else "failed"
-            db_doc.chunks_count = chunks_created
-            db_doc.processed_at = datetime.utcnow()
-            db_doc.meta_data.update({
-                "chunks_created": chunks_created,
-                "chunks_failed": failed_chunks,
-                "processing_metrics": processing_metrics,
-                "chunk_details": chunk_details
-            })
-
-            processing_metrics['db_operations_time'] = time.time() - db_operations_start
-
-            # Commit transaction
             db.commit()
-            db.refresh(db_doc)
-
-            # ✅ VERIFICATION: Check ChromaDB after upload
-            chroma_count_after = vector_store.get_count()
-            doc_chunks_in_chroma = vector_store.get_documents_by_id(doc_id)
-            
-            logger.info(f"[CHROMA_VERIFY] ChromaDB count after upload: {chroma_count_after}")
-            logger.info(f"[CHROMA_VERIFY] Document chunks in ChromaDB: {len(doc_chunks_in_chroma)}")
-
         except Exception as e:
             db.rollback()
+            os.remove(path)
             logger.error(f"[ERROR] Database transaction failed: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Database operation failed: {str(e)}")
 
-        # Log final statistics
-        total_processing_time = time.time() - start_time
-        logger.info(f"[SUCCESS] Upload complete: {chunks_created} chunks created, {failed_chunks} failed")
-        logger.info(f"[TIME] Processing times - Total: {total_processing_time:.2f}s")
+        ingestion_queue = get_ingestion_queue()
+        # Before the workers start (warm-up), their first poll picks the document up
+        ingestion_queue.enqueue(doc_id)
+        logger.info(f"[UPLOAD] Queued {file.filename} as {doc_id}")
 
-        # ✅ Format processing time as "4.4 seconds"
-        formatted_time = f"{total_processing_time:.1f} seconds"
+        if not wait:
+            return DocumentUploadResponse(
+                document_id=doc_id,
+                job_id=doc_id,
+                filename=file.filename,
+                status="queued",
+                chunks_created=0,
+                message=f"Document '{file.filename}' queued for processing",
+                status_url=f"/api/rag/documents/{doc_id}/status"
+            )
+
+        settled = await ingestion_queue.wait(doc_id)
+        db.expire_all()
+        db_doc = db.query(Document).filter(Document.id == doc_id).first()
+        if db_doc is None:
+            raise HTTPException(status_code=404, detail="Document was deleted while processing")
+        job_status = ingestion_status(db_doc)
+        if not settled:
+            # Still running (here or in another process): answer 202 with where it stands
+            return DocumentUploadResponse(
+                document_id=doc_id,
+                job_id=doc_id,
+                filename=file.filename,
+                status=db_doc.status,
+                chunks_created=job_status["chunks_done"],
+                message=f"Document '{file.filename}' is still {job_status['stage']} ({job_status['percent']}%)",
+                status_url=f"/api/rag/documents/{doc_id}/status"
+            )
+        if db_doc.status != "completed":
+            raise HTTPException(status_code=400, detail=job_status["error"] or "Document processing failed")
 
+        response.status_code = 200
+        total_processing_time = time.time() - start_time
         return DocumentUploadResponse(
-            document_id=db_doc.id,
+            document_id=doc_id,
+            job_id=doc_id,
             filename=file.filename,
             status="success",
-            chunks_created=chunks_created,
-            message=f"Document '{file.filename}' processed successfully with {chunks_created} chunks",
-            processing_time=formatted_time
+            chunks_created=db_doc.chunks_count,
+            duplicate_chunks=job_status["duplicate_chunks"],
+            message=f"Document '{file.filename}' processed successfully with {db_doc.chunks_count} chunks",
+            processing_time=f"{total_processing_time:.1f} seconds",
+            status_url=f"/api/rag/documents/{doc_id}/status"
         )
 
     except HTTPException:
@@ -672,7 +576,7 @@ async def debug_vector_store():
     return {
         "vector_store_instance_id": id(vector_store),
         "in_memory_documents_count": len(vector_store.documents),
-        "in_memory_embeddings_count": len(vector_store.embeddings),
+        "in_memory_embeddings_count": vector_store._num_rows,
         "in_memory_metadata_count": len(vector_store.metadata),
         "get_count_result": vector_store.get_count(),
         "documents_sample": vector_store.documents[:2] if vector_store.documents else [],
@@ -725,6 +629,15 @@ async def list_documents(skip: int = 0, limit: int = 100, db: Session = Depends(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/documents/{document_id}/status")
+async def get_document_status(document_id: str, db: Session = Depends(get_db)):
+    """Ingestion progress: status, stage, percent and chunks done"""
+    document = db.query(Document).filter(Document.id == document_id).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return ingestion_status(document)
+
+
 @router.get("/documents/{document_id}")
 async def get_document(document_id: str, db: Session = Depends(get_db)):
     document = db.query(Document).filter(Document.id == document_id).first()
@@ -749,8 +662,14 @@ async def delete_document(document_id: str, db: Session = Depends(get_db)):
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     filename = document.filename
+    remove_upload(document)
+    # Shared chunks this document owned are handed to a document that still references them
+    promotions = get_near_duplicate_index().delete_document(document_id)
     db.delete(document)
+    promoted = promote_duplicates(db, promotions)
     db.commit()
+    get_lexical_index().delete_document(document_id)
+    await reindex_promoted(promoted, promotions)
     return {"status": "success", "message": f"Document '{filename}' deleted successfully"}
 
 
@@ -848,8 +767,8 @@ async def health_check(db: Session = Depends(get_db)):
     # 3. Test Embedding Service
     try:
         if rag_service:
-            test_embedding = rag_service.embedding_service.embed_text("test")
-            if test_embedding and len(test_embedding) > 0:
+            test_embedding = await rag_service.embedding_service.aembed_text("test")
+            if test_embedding is not None and len(test_embedding) > 0:
                 components["embedding_service"] = "operational"
             else:
                 components["embedding_service"] = "error: no embedding generated"
@@ -975,13 +894,13 @@ async def detailed_health_check(db: Session = Depends(get_db)):
     embed_start = time.time()
     try:
         test_text = "Health check test"
-        embedding = rag_service.embedding_service.embed_text(test_text)
+        embedding = await rag_service.embedding_service.aembed_text(test_text)
         
         results["checks"]["embedding_service"] = {
             "status": "healthy",
             "response_time_ms": round((time.time() - embed_start) * 1000, 2),
             "model": os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
-            "embedding_dimension": len(embedding) if embedding else 0,
+            "embedding_dimension": len(embedding) if embedding is not None else 0,
             "message": "Embedding service working"
         }
     except Exception as e:
@@ -997,7 +916,7 @@ async def detailed_health_check(db: Session = Depends(get_db)):
         count = rag_service.vectorstore.get_count()
         
         # Try a test search
-        test_embedding = rag_service.embedding_service.embed_text("test query")
+        test_embedding = await rag_service.embedding_service.aembed_text("test query")
         search_results = rag_service.vectorstore.search(test_embedding, top_k=1)
         
         results["checks"]["vector_store"] = {
@@ -1100,10 +1019,48 @@ async def get_statistics(db: Session = Depends(get_db)):
         "total_queries": total_queries,
         "total_chunks": int(total_chunks),
         "average_processing_time": float(avg_time),
-        "strategy_distribution": {s: c for s, c in strategy_stats}
+        "strategy_distribution": {s: c for s, c in strategy_stats},
+        "embedding_cache": get_embedding_service().cache_stats(),
+        "near_duplicates": get_near_duplicate_index().stats()
+    }
+
+
+# ============================================================
+# 🧬 Embedding Model Endpoints
+# ============================================================
+@router.get("/embedding-models")
+async def list_embedding_models():
+    """Collections with the model that built them, and this worker's re-embedding job"""
+    job = get_reembed_job()
+    return {
+        **get_model_registry().state(),
+        "serving": {
+            "collection": get_vectorstore().collection_name,
+            "model": get_embedding_service().model_name
+        },
+        "job": job.status() if job else None
     }
 
 
+@router.post("/embedding-models/reembed", status_code=202)
+async def reembed_documents(request: ReembedRequest):
+    """
+    Re-embed every chunk with another model into a new collection
+
+    Queries keep using the current model until the new collection has
+    caught up; then all workers switch to it. An interrupted job resumes
+    when started again with the same model.
+    """
+    try:
+        job = start_reembedding(request.model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logger.info(f"[REEMBED] Started re-embedding with {request.model}")
+    return job.status()
+
+
 # ============================================================
 # 💬 Session Endpoints
 # ============================================================
@@ -1242,7 +1199,7 @@ async def debug_vector_store_detailed():
         "_is_cleared": vector_store._is_cleared,
         "documents_count": len(vector_store.documents),
         "metadata_count": len(vector_store.metadata),
-        "embeddings_count": len(vector_store.embeddings),
+        "embeddings_count": vector_store._num_rows,
         "index_exists": vector_store.index is not None,
         "get_count_result": vector_store.get_count(),
     }
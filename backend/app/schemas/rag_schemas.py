@@ -611,21 +611,25 @@ class DocumentUpload(BaseModel):
 class DocumentUploadResponse(BaseModel):
     """Document upload response"""
     document_id: str
+    job_id: Optional[str] = None
     filename: str
     status: str
     chunks_created: int
+    duplicate_chunks: int = 0
     message: str
     processing_time: Optional[str] = None
+    status_url: Optional[str] = None
     
     class Config:
         json_schema_extra = {
             "example": {
                 "document_id": "doc-123",
+                "job_id": "doc-123",
                 "filename": "machine_learning.pdf",
-                "status": "success",
-                "chunks_created": 45,
-                "message": "Document processed successfully",
-                "processing_time": "5.2 seconds"
+                "status": "queued",
+                "chunks_created": 0,
+                "message": "Document 'machine_learning.pdf' queued for processing",
+                "status_url": "/api/rag/documents/doc-123/status"
             }
         }
 
@@ -854,6 +858,22 @@ class SystemStats(BaseModel):
         }
 
 
+# ============================================================
+# EMBEDDING MODEL SCHEMAS
+# ============================================================
+
+class ReembedRequest(BaseModel):
+    """Start re-embedding every chunk with another embedding model"""
+    model: str = Field(..., min_length=1, description="sentence-transformers model name or path")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "model": "BAAI/bge-small-en-v1.5"
+            }
+        }
+
+
 # ============================================================
 # SESSION SCHEMAS
 # ============================================================
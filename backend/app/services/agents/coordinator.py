@@ -2,10 +2,17 @@
 Enhanced Coordinator Agent with ReAct Pattern
 Decides which tools to use for answering queries
 """
+import asyncio
 import logging
+import os
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
+from app.services.embedding_registry import get_switch_gate
+from app.services.lexical_index import get_lexical_index, reciprocal_rank_fusion
+from app.services.near_duplicates import shared_chunk_ids
+from app.services.reranker import get_reranker
+
 logger = logging.getLogger(__name__)
 
 
@@ -22,6 +29,13 @@ class CoordinatorAgent:
         self.llm_service = llm_service
         self.embedding_service = embedding_service
         self.vectorstore = vectorstore
+        # Fuse BM25 results into document search (HYBRID_SEARCH_ENABLED)
+        self.hybrid_search = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+        # Optional cross-encoder stage (RERANK_ENABLED); confident scores skip the LLM relevance check
+        self.reranker = get_reranker()
+        self.rerank_top_n = int(os.getenv("RERANK_TOP_N", "20"))
+        self.rerank_accept_score = float(os.getenv("RERANK_ACCEPT_SCORE", "0.8"))
+        self.rerank_reject_score = float(os.getenv("RERANK_REJECT_SCORE", "0.01"))
         
         # Track execution steps for transparency
         self.execution_steps = []
@@ -157,25 +171,55 @@ Provide a brief reasoning (2-3 sentences):"""
         return thought.strip()
     
     async def _search_chromadb(self, query: str, context: Dict) -> Dict[str, Any]:
-        """Action: Search ChromaDB"""
+        """
+        Action: Search uploaded documents
+        
+        Dense ChromaDB results are fused with BM25 results (reciprocal
+        rank fusion) so exact identifiers, names and codes are found too.
+        Short keyword queries are answered from the lexical index alone,
+        without computing an embedding, when it has matches.
+        With the reranker enabled, the top RERANK_TOP_N candidates are
+        reordered by the cross-encoder before keeping top_k.
+        """
         try:
-            query_embedding = self.embedding_service.embed_text(query)
+            top_k = context.get("top_k", 5)
+            document_id = context.get("document_id")
+            candidate_k = max(top_k, self.rerank_top_n) if self.reranker is not None else top_k
+            
+            # Chunks of other documents standing in for this document's near-duplicates
+            shared_ids = await asyncio.to_thread(self._shared_chunk_ids, document_id) if document_id else []
+            
+            lexical_index = get_lexical_index() if self.hybrid_search else None
+            if lexical_index is not None and lexical_index.is_keyword_query(query):
+                results = lexical_index.search(query, top_k=candidate_k, document_id=document_id, shared_ids=shared_ids)
+                if results:
+                    logger.info(f"[COORDINATOR] Keyword query answered from lexical index ({len(results)} chunks)")
+                    return await self._retrieval_result(query, results, top_k, "lexical")
             
             filter_params = None
-            if context.get("document_id"):
-                filter_params = {"document_id": context["document_id"]}
+            if document_id:
+                filter_params = {"document_id": document_id}
+                if shared_ids:
+                    filter_params = {"$or": [filter_params, {"chunk_id": {"$in": shared_ids}}]}
             
-            results = self.vectorstore.search_by_embedding(
-                query_embedding=query_embedding,
-                top_k=context.get("top_k", 5),
-                filter=filter_params
-            )
+            # Fetch deeper lists than top_k so fusion has something to reorder
+            fetch_k = candidate_k * 2 if lexical_index is not None else candidate_k
+            # Query vector and collection from the same model, even across a re-embedding switch
+            async with get_switch_gate().using():
+                query_embedding = await self.embedding_service.aembed_text(query)
+                results = self.vectorstore.search_by_embedding(
+                    query_embedding=query_embedding,
+                    top_k=fetch_k,
+                    filter=filter_params
+                )
             
-            return {
-                "success": True,
-                "chunks": results,
-                "count": len(results)
-            }
+            if lexical_index is None:
+                return await self._retrieval_result(query, results, top_k, "dense")
+            
+            lexical_results = lexical_index.search(query, top_k=fetch_k, document_id=document_id, shared_ids=shared_ids)
+            fused = reciprocal_rank_fusion([results, lexical_results], top_k=candidate_k)
+            
+            return await self._retrieval_result(query, fused, top_k, "hybrid")
         
         except Exception as e:
             logger.error(f"[CHROMADB SEARCH ERROR] {str(e)}")
@@ -186,8 +230,43 @@ Provide a brief reasoning (2-3 sentences):"""
                 "error": str(e)
             }
     
+    @staticmethod
+    def _shared_chunk_ids(document_id: str) -> List[str]:
+        """Canonical chunk ids referenced by the document's duplicate chunks (see near_duplicates)"""
+        from app.core.config import SessionLocal
+        
+        db = SessionLocal()
+        try:
+            return shared_chunk_ids(db, document_id)
+        finally:
+            db.close()
+    
+    async def _retrieval_result(self, query: str, chunks: List[Dict], top_k: int, retrieval: str) -> Dict[str, Any]:
+        """Rerank candidates (if enabled), keep top_k and wrap as a search result"""
+        if self.reranker is not None and chunks:
+            try:
+                # Cross-encoder inference (and its first-use model load) off the event loop
+                chunks = await asyncio.to_thread(self.reranker.rerank, query, chunks, top_k=top_k)
+                retrieval = f"{retrieval}+rerank"
+            except Exception as e:
+                # Retrieval order is still usable without the cross-encoder
+                logger.error(f"[RERANKER ERROR] {str(e)}")
+        chunks = chunks[:top_k]
+        return {
+            "success": True,
+            "chunks": chunks,
+            "count": len(chunks),
+            "retrieval": retrieval
+        }
+    
     async def _check_relevance(self, query: str, chromadb_result: Dict) -> Dict[str, Any]:
-        """Thought: Check if ChromaDB results are truly relevant"""
+        """
+        Thought: Check if ChromaDB results are truly relevant
+        
+        Reranked results whose best cross-encoder score is at least
+        RERANK_ACCEPT_SCORE (or below RERANK_REJECT_SCORE) are decided
+        without the LLM call.
+        """
         chunks = chromadb_result.get("chunks", [])
         
         if not chunks:
@@ -198,6 +277,24 @@ Provide a brief reasoning (2-3 sentences):"""
                 "score": 0.0
             }
         
+        rerank_scores = [chunk["rerank_score"] for chunk in chunks if "rerank_score" in chunk]
+        if rerank_scores:
+            best_score = max(rerank_scores)
+            if best_score >= self.rerank_accept_score:
+                return {
+                    "is_relevant": True,
+                    "verdict": "RELEVANT",
+                    "reason": f"Cross-encoder score {best_score:.2f} >= {self.rerank_accept_score}",
+                    "score": best_score
+                }
+            if best_score < self.rerank_reject_score:
+                return {
+                    "is_relevant": False,
+                    "verdict": "NOT_RELEVANT",
+                    "reason": f"Cross-encoder score {best_score:.3f} < {self.rerank_reject_score}",
+                    "score": best_score
+                }
+        
         # Get top 3 chunks for verification
         top_chunks = chunks[:3]
         context_text = "\n\n".join([
@@ -1,20 +1,455 @@
-# Helper function for chunking
-from typing import List
+"""
+===================================================================
+app/services/chunking.py - Streaming text chunking
+===================================================================
+One chunker for the whole app. iter_chunks makes a single pass over the
+text and yields Chunk tuples with the character offsets of each chunk in
+the source, without building a word list or re-joining windows. Chunks
+are slices of the source, so their whitespace is the original one.
+
+Size and overlap are counted in a unit:
+
+    chars    characters
+    words    whitespace-separated words (as str.split)
+    tokens   tokens of a Hugging Face tokenizer (default: the one of the
+             active embedding model in the model registry), counted per
+             word through a cache
+
+and the windows follow a strategy:
+
+    fixed     windows of `size` units, each overlapping the previous by
+              `overlap` units (chars: exactly text[i:i + size] every
+              size - overlap characters, as chunk_text always did)
+    sentence  whole sentences (ending in . ! ? or at a blank line) packed
+              up to `size` units, repeating trailing sentences of up to
+              `overlap` units; longer sentences are cut at `size` units
+
+The text is scanned in blocks of CHUNK_STREAM_BLOCK_SIZE characters:
+word boundaries, sentence ends and paragraph breaks of a block are found
+with numpy, and windows are placed with searchsorted over the words'
+cumulative sizes, so Python only runs per chunk, not per word. The
+source may be a string or a text file / iterable of strings; only the
+current window is kept of a streamed source, so a file of any size
+chunks in bounded memory.
+
+chunk_text (chars, fixed) keeps its old signature for existing callers;
+ingestion uses chunking_options() (CHUNKING_* settings).
+"""
+import os
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+UNITS = ("chars", "words", "tokens")
+STRATEGIES = ("fixed", "sentence")
+
+
+def _code_point_table(characters) -> np.ndarray:
+    table = np.zeros(0x110000, dtype=bool)
+    table[[ord(c) for c in characters]] = True
+    return table
+
+
+# Per code point: str.isspace (the same as str.split and regex \s), sentence punctuation
+_SPACE = _code_point_table(chr(c) for c in range(0x3001) if chr(c).isspace())
+_TERMINAL = _code_point_table(".!?…")
+_CLOSER = _code_point_table("\"'”’)]")
+_NEWLINE = ord("\n")
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+
+class Chunk(NamedTuple):
+    index: int
+    text: str
+    start: int       # character offsets in the source, end exclusive
+    end: int
+    unit_start: int  # position in the chosen unit (chars, words or tokens) of the source
+    unit_end: int
+
+
+class _Words(NamedTuple):
+    starts: np.ndarray            # source offsets
+    ends: np.ndarray
+    weights: np.ndarray           # size in the unit (chars: length)
+    sentence_end: np.ndarray      # ends in . ! ? (optionally then a closing quote or bracket)
+    paragraph_before: np.ndarray  # a blank line separates it from the previous word
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return _Words(*(column[key] for column in self))
+        return tuple.__getitem__(self, key)
+
+    def __add__(self, other):
+        return _Words(*(np.concatenate((a, b)) for a, b in zip(self, other)))
+
+
+_NO_WORDS = _Words(_EMPTY, _EMPTY, _EMPTY, np.zeros(0, dtype=bool), np.zeros(0, dtype=bool))
+
+
+# ============================================
+# Tokens
+# ============================================
+
+def active_tokenizer_name() -> str:
+    """Model of the active embedding collection, so token sizes follow a re-embedding switch"""
+    from app.services.embedding_registry import get_model_registry
+
+    return get_model_registry().active()[1]["model"]
+
+
+@lru_cache(maxsize=4)
+def _load_tokenizer(name: str):
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(name)
+
+
+def get_tokenizer(name: Optional[str] = None):
+    """Hugging Face tokenizer, loaded once per name (default: the active embedding model)"""
+    return _load_tokenizer(name or active_tokenizer_name())
+
+
+class TokenCounter:
+    """
+    Tokens per word, with a cache of CHUNK_TOKEN_CACHE_SIZE words
+
+    Unseen words of a block are tokenized in one batch. Exact for
+    WordPiece tokenizers (BERT family, the default embedding models),
+    which split on whitespace before tokenizing; close for BPE ones, where
+    a word's first token carries the preceding space.
+    """
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.limit = int(os.getenv("CHUNK_TOKEN_CACHE_SIZE", "200000"))
+        self.counts: Dict[str, int] = {}
+
+    def __call__(self, words: List[str]) -> np.ndarray:
+        missing = set(words).difference(self.counts)
+        if len(self.counts) + len(missing) > self.limit:
+            self.counts.clear()
+            missing = set(words)
+        if missing:
+            missing = list(missing)
+            backend = getattr(self.tokenizer, "backend_tokenizer", None)
+            if backend is not None:
+                # The Rust tokenizer directly: transformers' per-word conversion costs more than tokenizing
+                lengths = [len(encoding.ids) for encoding in backend.encode_batch(missing, add_special_tokens=False)]
+            elif callable(self.tokenizer):
+                lengths = [len(ids) for ids in self.tokenizer(missing, add_special_tokens=False)["input_ids"]]
+            else:
+                lengths = [len(self.tokenizer.encode(word, add_special_tokens=False)) for word in missing]
+            self.counts.update(zip(missing, (max(1, length) for length in lengths)))
+        return np.fromiter(map(self.counts.__getitem__, words), dtype=np.int64, count=len(words))
+
+
+@lru_cache(maxsize=4)
+def _token_counter(name: str) -> TokenCounter:
+    return TokenCounter(get_tokenizer(name))
+
+
+def get_token_counter(name: Optional[str] = None) -> TokenCounter:
+    """TokenCounter of a named tokenizer (default: the active embedding model's), shared with its cache by all chunking"""
+    return _token_counter(name or active_tokenizer_name())
+
+
+# ============================================
+# Source and scanning
+# ============================================
+
+class _Source:
+    """Block reader; keeps the text that chunks may still be cut from"""
+
+    def __init__(self, source, block_size: int):
+        self.block_size = block_size
+        self.base = 0  # source offset of buffer[0]
+        if isinstance(source, str):
+            self.buffer, self.blocks = source, None
+            self.position = 0
+        else:
+            if hasattr(source, "read"):
+                reader = source
+                source = iter(lambda: reader.read(block_size), "")
+            self.buffer, self.blocks = "", iter(source)
+
+    def read(self) -> Optional[str]:
+        """The next block, or None at the end"""
+        if self.blocks is None:
+            block = self.buffer[self.position:self.position + self.block_size]
+            self.position += len(block)
+            return block or None
+        for block in self.blocks:
+            if block:
+                self.buffer += block
+                return block
+        return None
+
+    def text(self, start: int, end: int) -> str:
+        return self.buffer[start - self.base:end - self.base]
+
+    def release(self, upto: int) -> None:
+        """Nothing before source offset `upto` is needed again"""
+        # Only streamed buffers, and only once half is stale, so trimming stays linear overall
+        if self.blocks is not None and upto - self.base > len(self.buffer) // 2:
+            self.buffer = self.buffer[upto - self.base:]
+            self.base = upto
+
+
+def _scan(source: _Source, unit: str, count_tokens: Optional[TokenCounter]) -> Iterator[Tuple[_Words, bool]]:
+    """The words of each block, and whether it is the last one"""
+    carry, offset = "", 0  # partial word at the end of the previous block, and its source offset
+    newlines = 0           # newlines since the last word
+    while True:
+        block = source.read()
+        final = block is None
+        text = carry + (block or "")
+        code_points = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        space = _SPACE[code_points]
+        if not final:
+            # Words end in this block only up to its last whitespace
+            blanks = np.flatnonzero(space)
+            if len(blanks) == 0:
+                carry = text
+                continue
+            cut = int(blanks[-1]) + 1
+            carry, text = text[cut:], text[:cut]
+            code_points, space = code_points[:cut], space[:cut]
+
+        # Words start and end where the text flips between space and not
+        edges = np.flatnonzero(np.diff(space, prepend=True, append=True))
+        starts, ends = edges[0::2], edges[1::2]
+        newline_at = np.flatnonzero(code_points == _NEWLINE)
+        if len(starts):
+            # Newlines between each word and the one before it
+            newline_count = np.searchsorted(newline_at, starts) - np.searchsorted(
+                newline_at, np.concatenate(([0], ends[:-1]))
+            )
+            newline_count[0] += newlines
+            newlines = len(newline_at) - int(np.searchsorted(newline_at, ends[-1]))
+
+            last = code_points[ends - 1]
+            previous = code_points[np.maximum(ends - 2, starts)]
+            sentence_end = _TERMINAL[last] | (_CLOSER[last] & (ends - starts >= 2) & _TERMINAL[previous])
+            if unit == "tokens":
+                weights = count_tokens(text.split())
+            elif unit == "words":
+                weights = np.ones(len(starts), dtype=np.int64)
+            else:
+                weights = (ends - starts).astype(np.int64)
+            words = _Words(starts + offset, ends + offset, weights, sentence_end, newline_count >= 2)
+        else:
+            newlines += len(newline_at)
+            words = _NO_WORDS
+        yield words, final
+        if final:
+            return
+        offset += len(text)
+
+
+# ============================================
+# Windows
+# ============================================
+
+def _windows(starts, ends, weights, size: int, overlap: int, chars: bool, final: bool) -> Tuple[List[Tuple[int, int]], int]:
+    """
+    Place windows over consecutive spans
+
+    Each window takes spans while they fit in `size` units (at least one)
+    and the next starts at its last spans of up to `overlap` units that
+    leave room for the span after it.
+
+    Returns:
+        (first, last) span indexes of each window, and the index the next
+        window starts at; without `final` the last window is left for
+        when more spans arrive
+    """
+    if chars:
+        # Characters of the slice, whitespace between spans included
+        begin, finish = starts, ends
+    else:
+        finish = np.cumsum(weights)
+        begin = finish - weights
+    count = len(starts)
+    windows = []
+    first = 0
+    while first < count:
+        last = max(int(np.searchsorted(finish, begin[first] + size, "right")) - 1, first)
+        if last == count - 1:
+            if not final:
+                break
+            windows.append((first, last))
+            return windows, count
+        windows.append((first, last))
+        keep = int(np.searchsorted(begin, finish[last] - overlap, "left"))
+        room = int(np.searchsorted(begin, finish[last + 1] - size, "left"))
+        first = min(max(keep, room, first + 1), last + 1)
+    return windows, first
+
+
+def _sentences(words: _Words, size: int, chars: bool, final: bool) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    First and last word of each complete sentence, none over `size` units unless it is one word
+
+    Returns:
+        (firsts, lasts, open_from): open_from is where the words of the
+        sentence still going on begin (len(words) when there is none)
+    """
+    count = len(words.starts)
+    boundary = words.sentence_end.copy()
+    boundary[:-1] |= words.paragraph_before[1:]
+    if final and count:
+        boundary[-1] = True
+    lasts = np.flatnonzero(boundary)
+    firsts = np.concatenate(([0], lasts[:-1] + 1)).astype(np.int64) if len(lasts) else _EMPTY
+    open_from = int(lasts[-1]) + 1 if len(lasts) else 0
+
+    if chars:
+        sizes = words.ends[lasts] - words.starts[firsts]
+    else:
+        cumulative = np.cumsum(words.weights)
+        sizes = cumulative[lasts] - (cumulative[firsts] - words.weights[firsts])
+    oversized = (sizes > size) & (lasts > firsts)
+    tail_oversized = False
+    if open_from < count:
+        tail = words[open_from:]
+        tail_oversized = (tail.ends[-1] - tail.starts[0] if chars else tail.weights.sum()) > size
+    if not oversized.any() and not tail_oversized:
+        return firsts, lasts, open_from
+
+    def pieces(first: int, last: int, closed: bool) -> Tuple[List[Tuple[int, int]], int]:
+        span = words[first:last + 1]
+        found, rest = _windows(span.starts, span.ends, span.weights, size, 0, chars, closed)
+        return [(first + a, first + b) for a, b in found], first + rest
+
+    split = []
+    for first, last, too_big in zip(firsts.tolist(), lasts.tolist(), oversized.tolist()):
+        split.extend(pieces(first, last, True)[0] if too_big else [(first, last)])
+    if tail_oversized:
+        found, open_from = pieces(open_from, count - 1, False)
+        split.extend(found)
+    split = np.array(split, dtype=np.int64).reshape(-1, 2)
+    return split[:, 0], split[:, 1], open_from
+
+
+def _fixed_chars(source: _Source, size: int, overlap: int) -> Iterator[Chunk]:
+    step = size - overlap
+    start = index = 0
+    loaded = 0  # source offset read up to
+    while True:
+        while loaded < start + size:
+            block = source.read()
+            if block is None:
+                break
+            loaded += len(block)
+        text = source.text(start, start + size)
+        if not text:
+            return
+        if text.strip():  # Only add non-empty chunks
+            yield Chunk(index, text, start, start + len(text), start, start + len(text))
+            index += 1
+        start += step
+        source.release(start)
+
+
+def _chunks(source: _Source, unit: str, strategy: str, size: int, overlap: int,
+            count_tokens: Optional[TokenCounter]) -> Iterator[Chunk]:
+    chars = unit == "chars"
+    pending = _NO_WORDS  # words from the start of the next window on
+    unit_base = 0        # unit position of pending's first word
+    index = 0
+    for words, final in _scan(source, unit, count_tokens):
+        pending = pending + words if len(pending.starts) else words
+        count = len(pending.starts)
+        if count == 0:
+            continue
+        if strategy == "sentence":
+            firsts, lasts, open_from = _sentences(pending, size, chars, final)
+            span_starts, span_ends = pending.starts[firsts], pending.ends[lasts]
+            if chars:
+                span_weights = span_ends - span_starts
+            else:
+                cumulative = np.cumsum(pending.weights)
+                span_weights = cumulative[lasts] - cumulative[firsts] + pending.weights[firsts]
+            windows, next_span = _windows(span_starts, span_ends, span_weights, size, overlap, chars, final)
+            next_word = int(firsts[next_span]) if next_span < len(firsts) else open_from
+            windows = [(int(firsts[a]), int(lasts[b])) for a, b in windows]
+        else:
+            windows, next_word = _windows(pending.starts, pending.ends, pending.weights, size, overlap, chars, final)
+
+        if windows and not chars:
+            cumulative = np.cumsum(pending.weights)
+        for first, last in windows:
+            start, end = int(pending.starts[first]), int(pending.ends[last])
+            if chars:
+                unit_start, unit_end = start, end
+            else:
+                unit_start = unit_base + int(cumulative[first] - pending.weights[first])
+                unit_end = unit_base + int(cumulative[last])
+            yield Chunk(index, source.text(start, end), start, end, unit_start, unit_end)
+            index += 1
+
+        if not chars and next_word:
+            unit_base += int(pending.weights[:next_word].sum())
+        pending = pending[next_word:]
+        if len(pending.starts):
+            source.release(int(pending.starts[0]))
+        elif windows:
+            source.release(end)
+
+
+def iter_chunks(
+    source: Union[str, Iterable[str]],
+    size: int = 500,
+    overlap: int = 50,
+    unit: str = "chars",
+    strategy: str = "fixed",
+    tokenizer=None,
+    block_size: int = None
+) -> Iterator[Chunk]:
+    """
+    Yield the chunks of a text in one pass
+
+    Args:
+        source: Text, text file object or iterable of text pieces
+        size: Chunk size in `unit`
+        overlap: Units repeated from the end of the previous chunk (< size)
+        unit: "chars", "words" or "tokens"
+        strategy: "fixed" or "sentence"
+        tokenizer: For tokens: a tokenizer name, or object with encode()
+            (and batch __call__); defaults to the active embedding model's tokenizer
+        block_size: Characters per block. Defaults to CHUNK_STREAM_BLOCK_SIZE.
+
+    Yields:
+        Chunk with the text, its character offsets and its unit positions
+    """
+    if unit not in UNITS:
+        raise ValueError(f"Unknown chunking unit '{unit}' (expected one of {', '.join(UNITS)})")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown chunking strategy '{strategy}' (expected one of {', '.join(STRATEGIES)})")
+    if size <= 0 or not 0 <= overlap < size:
+        raise ValueError(f"Chunk size must be positive and overlap in [0, size), got {size} / {overlap}")
+
+    text = _Source(source, block_size or int(os.getenv("CHUNK_STREAM_BLOCK_SIZE", str(256 * 1024))))
+    if unit == "chars" and strategy == "fixed":
+        return _fixed_chars(text, size, overlap)
+    count_tokens = None
+    if unit == "tokens":
+        count_tokens = get_token_counter(tokenizer) if tokenizer is None or isinstance(tokenizer, str) else TokenCounter(tokenizer)
+    return _chunks(text, unit, strategy, size, overlap, count_tokens)
+
+
+def chunking_options() -> Dict:
+    """iter_chunks arguments for document ingestion (CHUNKING_* settings)"""
+    return {
+        "size": int(os.getenv("CHUNKING_SIZE", "500")),
+        "overlap": int(os.getenv("CHUNKING_OVERLAP", "50")),
+        "unit": os.getenv("CHUNKING_UNIT", "chars"),
+        "strategy": os.getenv("CHUNKING_STRATEGY", "fixed"),
+        "tokenizer": os.getenv("CHUNKING_TOKENIZER") or None
+    }
 
 
 def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
     """Split text into overlapping chunks"""
-    chunks = []
-    start = 0
-    text_length = len(text)
-    
-    while start < text_length:
-        end = start + chunk_size
-        chunk = text[start:end]
-        
-        if chunk.strip():  # Only add non-empty chunks
-            chunks.append(chunk)
-        
-        start += (chunk_size - overlap)
-    
-    return chunks
\ No newline at end of file
+    return [chunk.text for chunk in iter_chunks(text, chunk_size, overlap)]
@@ -0,0 +1,141 @@
+"""
+===================================================================
+app/services/embedding_batcher.py - Micro-batching for single texts
+===================================================================
+Concurrent embed_text() calls each ran their own batch-size-1 forward
+pass. The batcher queues them instead: a worker thread takes the first
+waiting text, collects more for up to EMBEDDING_BATCH_WAIT_MS or until
+EMBEDDING_MAX_BATCH_SIZE texts are queued, runs one batched encode and
+resolves every caller's future.
+
+Sync callers block on the future; async callers await it through
+asyncio.wrap_future, so the event loop keeps serving other requests
+while the model runs.
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class EmbeddingBatcher:
+    """Collects single-text requests into batched encode calls"""
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = None,
+        max_wait_ms: float = None
+    ):
+        """
+        Args:
+            encode: Embeds a list of texts, returning one row per text
+            max_batch_size: Texts per encode call. Defaults to EMBEDDING_MAX_BATCH_SIZE.
+            max_wait_ms: How long the first queued text waits for company.
+                Defaults to EMBEDDING_BATCH_WAIT_MS.
+        """
+        self.encode = encode
+        self.max_batch_size = max_batch_size or int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64"))
+        self.max_wait = (max_wait_ms if max_wait_ms is not None
+                         else float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "3"))) / 1000
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self.batches = 0
+        self.texts = 0
+
+    # ================================================================
+    # SUBMIT
+    # ================================================================
+
+    def submit(self, text: str) -> Future:
+        """Queue one text; the future resolves to its float32 embedding"""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, text: str) -> np.ndarray:
+        """Blocking single-text embedding through the batcher"""
+        return self.submit(text).result()
+
+    async def aembed(self, text: str) -> np.ndarray:
+        """Await a single-text embedding without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(text))
+
+    # ================================================================
+    # WORKER
+    # ================================================================
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self, first) -> List:
+        """The first item plus whatever arrives before the deadline or the size cap"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Finish this batch, then stop
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = self._collect(first)
+            # Callers that gave up (cancelled) are skipped
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                vectors = self.encode([text for text, _ in batch])
+                for (_, future), vector in zip(batch, vectors):
+                    future.set_result(vector)
+            except Exception as e:
+                logger.error(f"[EMBED_BATCHER] Batch of {len(batch)} failed: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
+            self.batches += 1
+            self.texts += len(batch)
+
+    def close(self) -> None:
+        """Stop the worker after the queued texts are embedded"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "mean_batch_size": self.texts / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000
+        }
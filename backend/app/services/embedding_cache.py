@@ -0,0 +1,252 @@
+"""
+===================================================================
+app/services/embedding_cache.py - Content-addressed embedding cache
+===================================================================
+Embeddings keyed by SHA-256 of (model name, normalized text), so a
+re-uploaded file or boilerplate shared between documents is only encoded
+once per model.
+
+Two tiers:
+    memory  LRU of float32 vectors (EMBEDDING_CACHE_SIZE entries)
+    disk    append-only binary files per model under EMBEDDING_CACHE_DIR:
+                keys.bin     32-byte digests, one per row
+                vectors.f32  raw float32 rows (rows x dimension)
+                meta.json    model name and dimension
+
+The disk tier keeps only the digest -> row map in memory and reads rows
+with pread. A row is written before its key, so a crash mid-append leaves
+at most a trailing row without a key, which is truncated on open. Appends
+hold an exclusive flock, so several worker processes can share a
+directory (rows another process appends are simply not seen until restart).
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+KEY_BYTES = 32
+KEYS_FILE = "keys.bin"
+VECTORS_FILE = "vectors.f32"
+META_FILE = "meta.json"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys (NFC, collapsed whitespace)"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+class EmbeddingCache:
+    """Two-tier (memory LRU + binary disk) embedding cache for one model"""
+
+    def __init__(self, model_name: str, directory: str = None, memory_size: int = None, persist: bool = None):
+        """
+        Args:
+            model_name: Embedding model; part of every key and of the disk path
+            directory: Root of the disk tier. Defaults to EMBEDDING_CACHE_DIR.
+            memory_size: Vectors kept in the LRU tier. Defaults to EMBEDDING_CACHE_SIZE.
+            persist: Enable the disk tier. Defaults to EMBEDDING_CACHE_PERSIST.
+        """
+        self.model_name = model_name
+        self.memory_size = memory_size or int(os.getenv("EMBEDDING_CACHE_SIZE", "50000"))
+        if persist is None:
+            persist = os.getenv("EMBEDDING_CACHE_PERSIST", "true").lower() == "true"
+        root = directory or os.getenv("EMBEDDING_CACHE_DIR", "./data/embedding_cache")
+        self.directory = os.path.join(root, re.sub(r"[^\w.-]+", "_", model_name)) if persist else None
+
+        self._model_prefix = model_name.encode("utf-8") + b"\0"
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.dimension: Optional[int] = None
+        self._disk_rows: Dict[bytes, int] = {}
+        self._vectors_fd: Optional[int] = None
+        self._keys_fd: Optional[int] = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.directory:
+            try:
+                self._open_disk()
+            except Exception as e:
+                logger.error(f"[EMBED_CACHE] Disk tier unavailable, using memory only: {str(e)}")
+                self.directory = None
+
+    # ================================================================
+    # KEYS / LOOKUP
+    # ================================================================
+
+    def key(self, text: str) -> bytes:
+        """SHA-256 digest of (model name, normalized text)"""
+        return hashlib.sha256(self._model_prefix + normalize_text(text).encode("utf-8")).digest()
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        """
+        Cached vectors for the given keys (None for misses)
+
+        Disk hits are promoted to the memory tier.
+        """
+        found: List[Optional[np.ndarray]] = [None] * len(keys)
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[i] = vector
+                    self.memory_hits += 1
+                    continue
+                row = self._disk_rows.get(key)
+                vector = self._read_row(row) if row is not None else None
+                if vector is not None:
+                    self._remember(key, vector)
+                    found[i] = vector
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray) -> None:
+        """Add vectors (one row per key) to both tiers"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            new_rows = []
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+                if self.directory and key not in self._disk_rows:
+                    new_rows.append((key, vector))
+            if new_rows:
+                try:
+                    self._append(new_rows)
+                except Exception as e:
+                    logger.error(f"[EMBED_CACHE] Failed to persist {len(new_rows)} vectors: {str(e)}")
+
+    def _remember(self, key: bytes, vector: np.ndarray) -> None:
+        """Insert into the LRU tier (caller holds the lock)"""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    # ================================================================
+    # DISK TIER
+    # ================================================================
+
+    def _open_disk(self) -> None:
+        """Load the digest -> row map and drop any torn trailing append"""
+        os.makedirs(self.directory, exist_ok=True)
+        meta_path = os.path.join(self.directory, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self.dimension = json.load(f)["dimension"]
+
+        keys_path = os.path.join(self.directory, KEYS_FILE)
+        vectors_path = os.path.join(self.directory, VECTORS_FILE)
+        self._keys_fd = os.open(keys_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._vectors_fd = os.open(vectors_path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        if not self.dimension:
+            return
+
+        self._lock_files()
+        try:
+            rows = min(os.fstat(self._keys_fd).st_size // KEY_BYTES,
+                       os.fstat(self._vectors_fd).st_size // (4 * self.dimension))
+            with open(keys_path, "rb") as f:
+                digests = f.read(rows * KEY_BYTES)
+            # Truncate a torn append so new rows line up with their keys
+            os.ftruncate(self._keys_fd, rows * KEY_BYTES)
+            os.ftruncate(self._vectors_fd, rows * 4 * self.dimension)
+        finally:
+            self._unlock_files()
+        self._disk_rows = {digests[i * KEY_BYTES:(i + 1) * KEY_BYTES]: i for i in range(rows)}
+        logger.info(f"[EMBED_CACHE] Opened {rows} cached embeddings for {self.model_name}")
+
+    def _read_row(self, row: int) -> Optional[np.ndarray]:
+        """One cached vector, or None if the file was cleared by another process"""
+        row_bytes = 4 * self.dimension
+        data = os.pread(self._vectors_fd, row_bytes, row * row_bytes)
+        return np.frombuffer(data, dtype=np.float32) if len(data) == row_bytes else None
+
+    def _append(self, rows: List) -> None:
+        """Append rows to the disk tier (caller holds the lock)"""
+        dimension = len(rows[0][1])
+        if self.dimension is None:
+            self.dimension = dimension
+            with open(os.path.join(self.directory, META_FILE), "w", encoding="utf-8") as f:
+                json.dump({"model": self.model_name, "dimension": dimension}, f)
+        elif dimension != self.dimension:
+            raise ValueError(f"Dimension {dimension} does not match cached dimension {self.dimension}")
+
+        self._lock_files()
+        try:
+            # Another process may have appended since we opened the files
+            first_row = os.fstat(self._vectors_fd).st_size // (4 * dimension)
+            os.write(self._vectors_fd, np.stack([vector for _, vector in rows]).tobytes())
+            os.write(self._keys_fd, b"".join(key for key, _ in rows))
+        finally:
+            self._unlock_files()
+        for offset, (key, _) in enumerate(rows):
+            self._disk_rows[key] = first_row + offset
+
+    def _lock_files(self) -> None:
+        if fcntl is not None:
+            fcntl.flock(self._vectors_fd, fcntl.LOCK_EX)
+
+    def _unlock_files(self) -> None:
+        if fcntl is not None:
+            fcntl.flock(self._vectors_fd, fcntl.LOCK_UN)
+
+    # ================================================================
+    # STATS / MAINTENANCE
+    # ================================================================
+
+    def stats(self) -> Dict:
+        """Tier sizes and hit/miss counters"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "model": self.model_name,
+                "memory_entries": len(self._memory),
+                "disk_entries": len(self._disk_rows),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+            }
+
+    def clear(self) -> None:
+        """Drop both tiers and reset the counters"""
+        with self._lock:
+            self._memory.clear()
+            self.memory_hits = self.disk_hits = self.misses = 0
+            if self.directory:
+                self._disk_rows = {}
+                self._lock_files()
+                try:
+                    os.ftruncate(self._keys_fd, 0)
+                    os.ftruncate(self._vectors_fd, 0)
+                finally:
+                    self._unlock_files()
+
+    def close(self) -> None:
+        with self._lock:
+            for fd in (self._keys_fd, self._vectors_fd):
+                if fd is not None:
+                    os.close(fd)
+            self._keys_fd = self._vectors_fd = None
+            self.directory = None
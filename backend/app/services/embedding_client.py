@@ -0,0 +1,362 @@
+"""
+===================================================================
+app/services/embedding_client.py - Worker side of the embedding sidecar
+===================================================================
+RemoteEmbeddingService has the public interface of EmbeddingService but
+sends the texts to the sidecar (app/services/embedding_server.py) over
+EMBEDDING_SERVER_SOCKET. get_embedding_service() returns it when that
+variable is set.
+
+    sync calls    one blocking socket per thread, one request at a time
+    async calls   one connection per event loop with any number of
+                  requests in flight, matched to their callers by request id
+
+If the sidecar cannot be reached the worker falls back to its own
+in-process EmbeddingService (EMBEDDING_SERVER_FALLBACK), loaded on first
+need, and tries the sidecar again after EMBEDDING_SERVER_RETRY_SECONDS.
+Errors reported by the sidecar itself are raised, not retried locally.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.embedding_server import (
+    OP_EMBED, OP_INFO, OP_STATS, STATUS_OK, RESPONSE_HEADER, ProtocolError,
+    encode_texts, parse_response_header, request_frame
+)
+
+logger = logging.getLogger(__name__)
+
+# Failures of the connection, as opposed to errors reported by the sidecar
+TRANSPORT_ERRORS = (OSError, EOFError, ProtocolError, asyncio.TimeoutError, asyncio.IncompleteReadError)
+
+
+class EmbeddingServerError(Exception):
+    """The sidecar answered with an error"""
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            raise EOFError("Embedding server closed the connection")
+        received += count
+    return bytes(buffer)
+
+
+class _AsyncConnection:
+    """One pipelined connection owned by a single event loop"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.closed = False
+        self.reader_task = asyncio.get_running_loop().create_task(self._read_responses())
+
+    async def _read_responses(self) -> None:
+        try:
+            while True:
+                status, op, request_id, rows, dimension, length = parse_response_header(
+                    await self.reader.readexactly(RESPONSE_HEADER.size)
+                )
+                body = await self.reader.readexactly(length)
+                future = self.pending.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_result((status, rows, dimension, body))
+        except Exception as e:
+            self.close(e if isinstance(e, TRANSPORT_ERRORS) else ProtocolError(str(e)))
+
+    async def request(self, op: int, request_id: int, body: bytes, timeout: float) -> Tuple[int, int, int, bytes]:
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        try:
+            self.writer.write(request_frame(op, request_id, body))
+            await self.writer.drain()
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.pending.pop(request_id, None)
+
+    def close(self, error: Exception = None) -> None:
+        self.closed = True
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(error or EOFError("Embedding server connection closed"))
+        self.pending.clear()
+        self.writer.close()
+
+
+class RemoteEmbeddingService:
+    """
+    Embedding service backed by the shared embedding sidecar
+    """
+
+    def __init__(self, socket_path: str = None):
+        """
+        Args:
+            socket_path: Sidecar socket. Defaults to EMBEDDING_SERVER_SOCKET.
+        """
+        self.socket_path = socket_path or os.getenv("EMBEDDING_SERVER_SOCKET", "/tmp/embedding.sock")
+        self.timeout = float(os.getenv("EMBEDDING_SERVER_TIMEOUT", "30"))
+        self.fallback_enabled = os.getenv("EMBEDDING_SERVER_FALLBACK", "true").lower() == "true"
+        self.retry_seconds = float(os.getenv("EMBEDDING_SERVER_RETRY_SECONDS", "30"))
+
+        self._request_ids = itertools.count(1)
+        self._local = threading.local()
+        self._connections: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._info: Optional[dict] = None
+        self._down_until = 0.0
+        self._fallback = None
+        self._fallback_lock = threading.Lock()
+
+        try:
+            info = self._server_info()
+            logger.info(
+                f"[EMBED_CLIENT] Using embedding server {self.socket_path} "
+                f"({info['model']}, {info['backend']}, pid {info['pid']})"
+            )
+        except TRANSPORT_ERRORS as e:
+            self._server_down(e)
+
+    # ============================================
+    # Transport
+    # ============================================
+
+    def _next_id(self) -> int:
+        return next(self._request_ids) & 0xFFFFFFFF
+
+    def _server_down(self, error: Exception) -> None:
+        self._down_until = time.monotonic() + self.retry_seconds
+        logger.warning(
+            f"[EMBED_CLIENT] Embedding server {self.socket_path} unavailable ({error!r}); "
+            + (f"embedding in-process, retrying in {self.retry_seconds:.0f}s"
+               if self.fallback_enabled else "no fallback configured")
+        )
+
+    def _use_server(self) -> bool:
+        return not self.fallback_enabled or time.monotonic() >= self._down_until
+
+    @staticmethod
+    def _check(status: int, body: bytes) -> None:
+        if status != STATUS_OK:
+            raise EmbeddingServerError(f"Embedding server error: {body.decode('utf-8', 'replace')}")
+
+    def _request(self, op: int, body: bytes = b"") -> Tuple[int, int, int, bytes]:
+        """Blocking request on this thread's connection"""
+        # A kept-alive socket may have been closed by a sidecar restart: retry once on a new one
+        reused = getattr(self._local, "sock", None) is not None
+        try:
+            return self._request_once(op, body)
+        except TRANSPORT_ERRORS:
+            if not reused:
+                raise
+        return self._request_once(op, body)
+
+    def _request_once(self, op: int, body: bytes) -> Tuple[int, int, int, bytes]:
+        sock = getattr(self._local, "sock", None)
+        try:
+            if sock is None:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                self._local.sock = sock
+            request_id = self._next_id()
+            sock.sendall(request_frame(op, request_id, body))
+            status, _, response_id, rows, dimension, length = parse_response_header(
+                _recv_exactly(sock, RESPONSE_HEADER.size)
+            )
+            response = _recv_exactly(sock, length)
+            if response_id != request_id:
+                raise ProtocolError(f"Response {response_id} does not match request {request_id}")
+        except TRANSPORT_ERRORS:
+            if sock is not None:
+                sock.close()
+            self._local.sock = None
+            raise
+        self._check(status, response)
+        return status, rows, dimension, response
+
+    async def _arequest(self, op: int, body: bytes = b"") -> Tuple[int, int, int, bytes]:
+        """Request on the running loop's pipelined connection"""
+        loop = asyncio.get_running_loop()
+        connection = self._connections.get(loop)
+        reused = self._is_open(connection)
+        try:
+            return await self._arequest_once(loop, op, body)
+        except TRANSPORT_ERRORS:
+            if not reused:
+                raise
+        return await self._arequest_once(loop, op, body)
+
+    @staticmethod
+    def _is_open(connection: Optional[asyncio.Task]) -> bool:
+        """The connect task finished with a connection that is still open"""
+        return (
+            connection is not None and connection.done() and not connection.cancelled()
+            and connection.exception() is None and not connection.result().closed
+        )
+
+    async def _connect(self) -> _AsyncConnection:
+        reader, writer = await asyncio.wait_for(asyncio.open_unix_connection(self.socket_path), self.timeout)
+        return _AsyncConnection(reader, writer)
+
+    async def _arequest_once(self, loop: asyncio.AbstractEventLoop, op: int, body: bytes) -> Tuple[int, int, int, bytes]:
+        connection = self._connections.get(loop)
+        if connection is None or (connection.done() and not self._is_open(connection)):
+            # Callers arriving while the connection opens wait for it instead of opening their own
+            connection = self._connections[loop] = loop.create_task(self._connect())
+        connection = await asyncio.shield(connection)
+        try:
+            status, rows, dimension, response = await connection.request(op, self._next_id(), body, self.timeout)
+        except TRANSPORT_ERRORS:
+            connection.close()
+            raise
+        self._check(status, response)
+        return status, rows, dimension, response
+
+    @staticmethod
+    def _vectors(rows: int, dimension: int, body: bytes) -> np.ndarray:
+        return np.frombuffer(body, dtype="<f4").reshape(rows, dimension)
+
+    def _server_info(self) -> dict:
+        if self._info is None:
+            self._info = json.loads(self._request(OP_INFO)[3])
+        return self._info
+
+    # ============================================
+    # In-process fallback
+    # ============================================
+
+    @property
+    def fallback(self):
+        """In-process EmbeddingService, loaded the first time the sidecar is unavailable"""
+        if self._fallback is None:
+            with self._fallback_lock:
+                if self._fallback is None:
+                    from app.core.dependencies import EmbeddingService
+                    from app.services.embedding_registry import get_model_registry
+                    logger.info("[EMBED_CLIENT] Loading in-process embedding fallback")
+                    self._fallback = EmbeddingService(get_model_registry().active()[1]["model"])
+        return self._fallback
+
+    def _failed(self, error: Exception):
+        """Record a transport failure; returns the fallback or raises"""
+        self._server_down(error)
+        if not self.fallback_enabled:
+            raise Exception(f"Embedding server unavailable: {str(error)}")
+        return self.fallback
+
+    # ============================================
+    # EmbeddingService interface
+    # ============================================
+
+    def embed_text(self, text: str) -> np.ndarray:
+        """
+        Generate embedding for single text
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            float32 embedding vector (1-D numpy array)
+        """
+        return self.embed_texts([text])[0]
+
+    async def aembed_text(self, text: str) -> np.ndarray:
+        """
+        Generate embedding for single text without blocking the event loop
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            float32 embedding vector (1-D numpy array)
+        """
+        return (await self.aembed_texts([text]))[0]
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for multiple texts
+
+        Args:
+            texts: List of texts to embed
+
+        Returns:
+            float32 array of shape (len(texts), dimension)
+        """
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        if self._use_server():
+            try:
+                return self._vectors(*self._request(OP_EMBED, encode_texts(texts))[1:])
+            except TRANSPORT_ERRORS as e:
+                return self._failed(e).embed_texts(texts)
+        return self.fallback.embed_texts(texts)
+
+    async def aembed_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for multiple texts without blocking the event loop
+
+        Args:
+            texts: List of texts to embed
+
+        Returns:
+            float32 array of shape (len(texts), dimension)
+        """
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        if self._use_server():
+            try:
+                return self._vectors(*(await self._arequest(OP_EMBED, encode_texts(texts)))[1:])
+            except TRANSPORT_ERRORS as e:
+                return await self._failed(e).aembed_texts(texts)
+        return await self.fallback.aembed_texts(texts)
+
+    def cache_stats(self) -> dict:
+        """Embedding cache of the sidecar, plus its request counters"""
+        if self._use_server():
+            try:
+                stats = json.loads(self._request(OP_STATS)[3])
+                return {**stats["embedding_cache"], "server": stats["server"]}
+            except TRANSPORT_ERRORS as e:
+                self._server_down(e)
+        if self._fallback is not None:
+            return {**self._fallback.cache_stats(), "server": None}
+        return {"enabled": False, "server": None}
+
+    def _attribute(self, key: str, attribute: str):
+        """Sidecar INFO field, or the fallback's attribute while the sidecar is unavailable"""
+        if self._use_server():
+            try:
+                return self._server_info()[key]
+            except TRANSPORT_ERRORS as e:
+                return getattr(self._failed(e), attribute)
+        return getattr(self.fallback, attribute)
+
+    @property
+    def model_name(self) -> str:
+        return self._attribute("model", "model_name")
+
+    @property
+    def backend(self) -> str:
+        backend = self._attribute("backend", "backend")
+        return f"server ({backend})" if self._use_server() else backend
+
+    @property
+    def dimension(self) -> int:
+        """Get embedding dimension"""
+        return self._attribute("dimension", "dimension")
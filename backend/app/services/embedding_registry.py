@@ -0,0 +1,551 @@
+"""
+===================================================================
+app/services/embedding_registry.py - Embedding model registry and re-embedding
+===================================================================
+Vectors are only comparable with queries embedded by the same model, so
+every Chroma collection is tagged with the model, backend and dimension
+that built it. The registry (embedding_registry.json in
+CHROMA_PERSIST_DIR, replaced atomically on every change) records them and
+which collection is active:
+
+    active collection   searched and written by the API; its model is the
+                        one get_embedding_service() loads, whatever
+                        EMBEDDING_MODEL says (a mismatch is logged)
+    building            shadow collection filled by a re-embedding job
+    retired             previous collections, kept for rollback
+
+A re-embedding job (start_reembedding) loads the new model next to the
+active one, streams canonical DocumentChunk rows (REEMBED_BATCH_SIZE per
+batch, ordered by id) into a shadow collection and records its progress
+in the registry, so a restarted job resumes after the last stored chunk.
+Queries keep using the old model and collection meanwhile. When the
+shadow has caught up with the table, the switch waits for in-flight
+embed-and-search / embed-and-add sequences (get_switch_gate), then swaps
+the collection and the embedding service together. Other workers notice
+the new registry version (watch_registry) and switch the same way.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_FILE = "embedding_registry.json"
+
+ACTIVE = "active"
+BUILDING = "building"
+RETIRED = "retired"
+
+
+# ============================================
+# Registry
+# ============================================
+
+class ModelRegistry:
+    """Collections, the model that built each one, and which one is active"""
+
+    def __init__(self, directory: str = None):
+        """
+        Args:
+            directory: Chroma persist directory. Defaults to CHROMA_PERSIST_DIR.
+        """
+        self.directory = directory or os.getenv("CHROMA_PERSIST_DIR", "./data/vectors")
+        self.path = os.path.join(self.directory, REGISTRY_FILE)
+        self.base_name = os.getenv("COLLECTION_NAME", "advanced_rag")
+        self._lock = threading.RLock()
+        self._state: Optional[Dict] = None
+        self._mtime: Optional[int] = None
+
+    def _bootstrap(self) -> Dict:
+        # Collections created before the registry: assume the configured model built them
+        return {
+            "version": 0,
+            "active": self.base_name,
+            "collections": {
+                self.base_name: {
+                    "model": os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
+                    "backend": os.getenv("EMBEDDING_BACKEND", "torch").lower(),
+                    "dimension": None,
+                    "status": ACTIVE,
+                    "created_at": datetime.utcnow().isoformat()
+                }
+            }
+        }
+
+    def _read(self) -> Dict:
+        """Current state, re-read when another process replaced the file"""
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                if self._state is None:
+                    self._state = self._bootstrap()
+                return self._state
+            if mtime != self._mtime:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+                self._mtime = mtime
+            return self._state
+
+    def _write(self, state: Dict) -> None:
+        with self._lock:
+            state["version"] = state.get("version", 0) + 1
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2)
+            os.replace(self.path + ".tmp", self.path)
+            self._state = state
+            self._mtime = os.stat(self.path).st_mtime_ns
+
+    def state(self) -> Dict:
+        """A copy of the whole registry"""
+        return json.loads(json.dumps(self._read()))
+
+    @property
+    def version(self) -> int:
+        return self._read().get("version", 0)
+
+    def active(self) -> Tuple[str, Dict]:
+        """(collection name, tags) of the active collection"""
+        state = self._read()
+        return state["active"], dict(state["collections"][state["active"]])
+
+    def entry(self, name: str) -> Optional[Dict]:
+        entry = self._read()["collections"].get(name)
+        return dict(entry) if entry is not None else None
+
+    def update(self, name: str, **fields) -> None:
+        """Set fields of a collection's entry"""
+        with self._lock:
+            state = self.state()
+            state["collections"][name].update(fields)
+            self._write(state)
+
+    def create_shadow(self, model: str, backend: str, dimension: int) -> str:
+        """
+        Shadow collection for a re-embedding with `model`
+
+        Returns the unfinished one for the same model and backend if there
+        is one, so an interrupted job resumes.
+        """
+        with self._lock:
+            state = self.state()
+            for name, entry in state["collections"].items():
+                if entry["status"] == BUILDING and entry["model"] == model and entry["backend"] == backend:
+                    return name
+            number = len(state["collections"]) + 1
+            while f"{self.base_name}_v{number}" in state["collections"]:
+                number += 1
+            name = f"{self.base_name}_v{number}"
+            state["collections"][name] = {
+                "model": model,
+                "backend": backend,
+                "dimension": dimension,
+                "status": BUILDING,
+                "created_at": datetime.utcnow().isoformat(),
+                "progress": {"done": 0, "total": None, "last_id": None, "updated_at": None, "pid": os.getpid()}
+            }
+            self._write(state)
+            return name
+
+    def activate(self, name: str) -> None:
+        """Make `name` the active collection and retire the previous one"""
+        with self._lock:
+            state = self.state()
+            previous = state["active"]
+            if previous != name:
+                state["collections"][previous]["status"] = RETIRED
+                state["collections"][previous]["retired_at"] = datetime.utcnow().isoformat()
+            state["collections"][name]["status"] = ACTIVE
+            state["collections"][name]["activated_at"] = datetime.utcnow().isoformat()
+            state["active"] = name
+            self._write(state)
+
+    @staticmethod
+    def collection_metadata(entry: Dict) -> Dict:
+        """Chroma collection metadata carrying the entry's tags"""
+        metadata = {
+            "hnsw:space": "cosine",
+            "embedding_model": entry.get("model"),
+            "embedding_backend": entry.get("backend"),
+            "embedding_dimension": entry.get("dimension")
+        }
+        # Chroma rejects None metadata values
+        return {key: value for key, value in metadata.items() if value is not None}
+
+
+_registry: Optional[ModelRegistry] = None
+
+
+def get_model_registry() -> ModelRegistry:
+    """Get the registry of CHROMA_PERSIST_DIR"""
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
+
+
+def check_active_model(service) -> None:
+    """Tag the active collection with `service`'s dimension, or log why they do not match"""
+    registry = get_model_registry()
+    name, entry = registry.active()
+    configured = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    if configured != entry["model"]:
+        logger.warning(
+            f"[REGISTRY] EMBEDDING_MODEL is {configured} but collection '{name}' was built with "
+            f"{entry['model']}; queries use {entry['model']}. Start a re-embedding job to switch."
+        )
+    if service.model_name != entry["model"]:
+        logger.error(
+            f"[REGISTRY] Embedding service uses {service.model_name} but collection '{name}' "
+            f"was built with {entry['model']}; search results will be meaningless"
+        )
+    elif entry.get("dimension") is None:
+        registry.update(name, dimension=service.dimension)
+    elif entry["dimension"] != service.dimension:
+        logger.error(
+            f"[REGISTRY] Collection '{name}' holds {entry['dimension']}-d vectors, "
+            f"{service.model_name} produces {service.dimension}-d"
+        )
+
+
+# ============================================
+# Switch gate
+# ============================================
+
+class SwitchGate:
+    """
+    Keeps the embedding service and collection switch out of
+    embed-then-search / embed-then-add sequences
+
+    Such a sequence holds the gate (`async with gate.using()`) so its
+    vectors and the collection it touches come from the same model; the
+    switch waits until no sequence holds it and keeps new ones waiting.
+    """
+
+    def __init__(self):
+        self._condition = asyncio.Condition()
+        self._users = 0
+        self._switching = False
+
+    @asynccontextmanager
+    async def using(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._switching)
+            self._users += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._users -= 1
+                self._condition.notify_all()
+
+    @asynccontextmanager
+    async def switching(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._switching)
+            self._switching = True
+            await self._condition.wait_for(lambda: self._users == 0)
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._switching = False
+                self._condition.notify_all()
+
+
+_switch_gate: Optional[SwitchGate] = None
+
+
+def get_switch_gate() -> SwitchGate:
+    global _switch_gate
+    if _switch_gate is None:
+        _switch_gate = SwitchGate()
+    return _switch_gate
+
+
+# ============================================
+# Re-embedding
+# ============================================
+
+def _canonical_filter():
+    from app.models.rag_model import DocumentChunk
+    # Near duplicates are indexed through their canonical chunk
+    return DocumentChunk.meta_data["duplicate_of"].as_string().is_(None)
+
+
+class ReembedJob:
+    """Re-embeds every canonical chunk with a new model into a shadow collection, then switches"""
+
+    def __init__(self, model_name: str, batch_size: int = None):
+        """
+        Args:
+            model_name: Model to re-embed with
+            batch_size: Chunks per batch. Defaults to REEMBED_BATCH_SIZE.
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size or int(os.getenv("REEMBED_BATCH_SIZE", "256"))
+        self.max_catch_up_rounds = int(os.getenv("REEMBED_CATCH_UP_ROUNDS", "5"))
+        self.registry = get_model_registry()
+        self.state = "pending"
+        self.collection_name: Optional[str] = None
+        self.done = 0
+        self.total: Optional[int] = None
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def status(self) -> Dict:
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "model": self.model_name,
+            "state": self.state,
+            "collection": self.collection_name,
+            "done": self.done,
+            "total": self.total,
+            "elapsed_seconds": round(elapsed, 1),
+            "chunks_per_second": round(self.done / elapsed, 1) if elapsed > 0 else None,
+            **({"error": self.error} if self.error else {})
+        }
+
+    # ---------------- database access (worker threads) ----------------
+
+    @staticmethod
+    def _count() -> int:
+        from app.core.config import SessionLocal
+        from app.models.rag_model import DocumentChunk
+        db = SessionLocal()
+        try:
+            return db.query(DocumentChunk).filter(_canonical_filter()).count()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _rows_after(last_id: Optional[str], limit: int) -> List[Tuple]:
+        from app.core.config import SessionLocal
+        from app.models.rag_model import DocumentChunk
+        db = SessionLocal()
+        try:
+            query = db.query(
+                DocumentChunk.id, DocumentChunk.document_id, DocumentChunk.chunk_index,
+                DocumentChunk.content, DocumentChunk.meta_data
+            ).filter(_canonical_filter())
+            if last_id is not None:
+                query = query.filter(DocumentChunk.id > last_id)
+            return query.order_by(DocumentChunk.id).limit(limit).all()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _rows_with_ids(ids: List[str]) -> List[Tuple]:
+        from app.core.config import SessionLocal
+        from app.models.rag_model import DocumentChunk
+        db = SessionLocal()
+        try:
+            return db.query(
+                DocumentChunk.id, DocumentChunk.document_id, DocumentChunk.chunk_index,
+                DocumentChunk.content, DocumentChunk.meta_data
+            ).filter(DocumentChunk.id.in_(ids)).all()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _chunk_ids() -> set:
+        from app.core.config import SessionLocal
+        from app.models.rag_model import DocumentChunk
+        db = SessionLocal()
+        try:
+            return {chunk_id for (chunk_id,) in db.query(DocumentChunk.id).filter(_canonical_filter())}
+        finally:
+            db.close()
+
+    # ---------------- job ----------------
+
+    async def _embed_rows(self, service, collection, rows: List[Tuple]) -> None:
+        from app.core.dependencies import get_vectorstore
+        from app.crud.chunk_writer import vector_metadata
+        texts = [row[3] for row in rows]
+        embeddings = await service.aembed_texts(texts)
+        await asyncio.to_thread(
+            get_vectorstore().add_documents,
+            documents=texts,
+            embeddings=embeddings,
+            metadata=[vector_metadata(*row) for row in rows],
+            ids=[row[0] for row in rows],
+            collection=collection
+        )
+
+    async def catch_up(self, service, collection) -> int:
+        """Add chunks the shadow is missing and drop ones deleted meanwhile; returns the changes made"""
+        expected = await asyncio.to_thread(self._chunk_ids)
+        present = set((await asyncio.to_thread(collection.get, include=[]))["ids"])
+        missing = sorted(expected - present)
+        extra = list(present - expected)
+        for start in range(0, len(missing), self.batch_size):
+            rows = await asyncio.to_thread(self._rows_with_ids, missing[start:start + self.batch_size])
+            if rows:
+                await self._embed_rows(service, collection, rows)
+        if extra:
+            await asyncio.to_thread(collection.delete, ids=extra)
+        return len(missing) + len(extra)
+
+    async def run(self) -> None:
+        from app.core.dependencies import EmbeddingService, get_vectorstore
+
+        try:
+            self.state = "loading"
+            service = await asyncio.to_thread(EmbeddingService, self.model_name)
+            if service.backend == "onnx" and service.model.source_model != self.model_name:
+                # The ONNX backend loads EMBEDDING_ONNX_DIR whatever the model name says
+                raise ValueError(f"{service.model.directory} holds an export of {service.model.source_model}")
+            dimension = service.dimension
+            self.collection_name = self.registry.create_shadow(service.model_name, service.backend, dimension)
+            entry = self.registry.entry(self.collection_name)
+            vector_store = get_vectorstore()
+            collection = await asyncio.to_thread(
+                vector_store.client.get_or_create_collection,
+                name=self.collection_name,
+                metadata=ModelRegistry.collection_metadata(entry)
+            )
+
+            # Resume after the last chunk a previous run stored
+            progress = entry.get("progress") or {}
+            last_id = progress.get("last_id")
+            self.done = progress.get("done") or 0
+            self.total = await asyncio.to_thread(self._count)
+            self.state = "embedding"
+            logger.info(
+                f"[REEMBED] {self.model_name} -> '{self.collection_name}': {self.total} chunks"
+                + (f", resuming after {self.done}" if last_id else "")
+            )
+            while True:
+                rows = await asyncio.to_thread(self._rows_after, last_id, self.batch_size)
+                if not rows:
+                    break
+                await self._embed_rows(service, collection, rows)
+                last_id = rows[-1][0]
+                self.done += len(rows)
+                self.registry.update(self.collection_name, progress={
+                    "done": self.done, "total": self.total, "last_id": last_id,
+                    "updated_at": time.time(), "pid": os.getpid()
+                })
+
+            # Uploads and deletes that happened meanwhile
+            self.state = "catching_up"
+            for _ in range(self.max_catch_up_rounds):
+                if not await self.catch_up(service, collection):
+                    break
+
+            self.state = "switching"
+            async with get_switch_gate().switching():
+                # Nothing can write to the old collection now; take the last stragglers
+                await self.catch_up(service, collection)
+                self.registry.activate(self.collection_name)
+                vector_store.use_collection(self.collection_name)
+                previous = _swap_embedding_service(service)
+            if previous is not None:
+                previous.executor.shutdown(wait=False)
+
+            self.state = "done"
+            logger.info(f"[REEMBED] Switched to '{self.collection_name}' ({self.model_name}, {dimension}-d)")
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            logger.error(f"[REEMBED] Re-embedding with {self.model_name} failed: {str(e)}", exc_info=True)
+        finally:
+            self.finished_at = time.time()
+
+
+def _swap_embedding_service(service):
+    """Put `service` behind get_embedding_service(); returns the local service it replaced"""
+    from app.core.dependencies import get_embedding_service
+    previous = get_embedding_service().swap(service)
+    return previous if previous is not service and hasattr(previous, "executor") else None
+
+
+_job: Optional[ReembedJob] = None
+
+
+def get_reembed_job() -> Optional[ReembedJob]:
+    """The latest re-embedding job of this process"""
+    return _job
+
+
+def start_reembedding(model_name: str) -> ReembedJob:
+    """
+    Start re-embedding every chunk with `model_name` in the background
+
+    Raises:
+        ValueError: the model already serves the active collection, or the
+            shared embedding server is in use (restart it with the new model)
+        RuntimeError: a job is already running here or in another worker
+    """
+    global _job
+    if _job is not None and _job.task is not None and not _job.task.done():
+        raise RuntimeError(f"A re-embedding job with {_job.model_name} is already running")
+    if os.getenv("EMBEDDING_SERVER_SOCKET"):
+        raise ValueError("Re-embedding needs the in-process embedding service; unset EMBEDDING_SERVER_SOCKET")
+
+    registry = get_model_registry()
+    _, active = registry.active()
+    if active["model"] == model_name:
+        raise ValueError(f"{model_name} already built the active collection")
+    stale_after = float(os.getenv("REEMBED_STALE_SECONDS", "120"))
+    for name, entry in registry.state()["collections"].items():
+        progress = entry.get("progress") or {}
+        if (entry["status"] == BUILDING and progress.get("pid") != os.getpid()
+                and time.time() - (progress.get("updated_at") or 0) < stale_after):
+            raise RuntimeError(f"Collection '{name}' is being built by process {progress.get('pid')}")
+
+    _job = ReembedJob(model_name)
+    _job.task = asyncio.get_running_loop().create_task(_job.run())
+    return _job
+
+
+# ============================================
+# Other workers
+# ============================================
+
+async def watch_registry(interval: float = None) -> None:
+    """
+    Follow switches made by another worker's re-embedding job
+
+    Polls the registry every REGISTRY_POLL_SECONDS; when another
+    collection became active, loads its model in a worker thread (the old
+    one keeps serving meanwhile), switches, and adds the chunks this worker
+    wrote to the old collection after the job's last catch-up.
+    """
+    from app.core.dependencies import EmbeddingService, get_embedding_service, get_vectorstore
+
+    interval = interval or float(os.getenv("REGISTRY_POLL_SECONDS", "5"))
+    registry = get_model_registry()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            name, entry = registry.active()
+            vector_store = get_vectorstore()
+            if name == vector_store.collection_name:
+                continue
+            logger.info(f"[REGISTRY] Collection '{name}' became active; loading {entry['model']}")
+            if get_embedding_service().model_name == entry["model"]:
+                service = get_embedding_service().service
+            else:
+                service = await asyncio.to_thread(EmbeddingService, entry["model"])
+            async with get_switch_gate().switching():
+                vector_store.use_collection(name)
+                previous = _swap_embedding_service(service)
+            if previous is not None:
+                previous.executor.shutdown(wait=False)
+            changes = await ReembedJob(entry["model"]).catch_up(service, vector_store.collection)
+            logger.info(f"[REGISTRY] Switched to '{name}' ({changes} chunks caught up)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[REGISTRY] Following the registry failed: {str(e)}")
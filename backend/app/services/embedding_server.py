@@ -0,0 +1,227 @@
+"""
+===================================================================
+app/services/embedding_server.py - Shared embedding sidecar
+===================================================================
+With several uvicorn/gunicorn workers, every worker loaded its own
+EmbeddingService, so N workers held N copies of the model and competed
+for the same cores. The sidecar holds the single copy: workers send
+texts over a Unix domain socket (EMBEDDING_SERVER_SOCKET) and get float32
+rows back. Requests from all workers go through the sidecar's
+micro-batcher and executor, so they are batched together.
+
+    python -m app.services.embedding_server --socket /run/embedding.sock
+
+Framing (little-endian, one frame per request / response; a connection
+may have many requests in flight, matched by request id):
+
+    request   magic "ES" | version u8 | op u8 | request id u32 | body length u32
+              EMBED body: count u32 | count x byte length u32 | UTF-8 texts
+    response  magic "ES" | status u8 | op u8 | request id u32 | rows u32 |
+              dimension u32 | body length u32
+              EMBED body: rows x dimension float32
+              INFO / STATS body: JSON; error (status 1) body: UTF-8 message
+
+The worker side is app/services/embedding_client.py.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import struct
+from typing import List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"ES"
+VERSION = 1
+
+OP_EMBED = 1
+OP_INFO = 2
+OP_STATS = 3
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+REQUEST_HEADER = struct.Struct("<2sBBII")
+RESPONSE_HEADER = struct.Struct("<2sBBIIII")
+_COUNT = struct.Struct("<I")
+
+MAX_FRAME_BYTES = int(os.getenv("EMBEDDING_SERVER_MAX_FRAME_MB", "64")) * 1024 * 1024
+
+
+class ProtocolError(Exception):
+    """A frame that does not follow the sidecar protocol"""
+
+
+# ============================================
+# Framing
+# ============================================
+
+def encode_texts(texts: List[str]) -> bytes:
+    """EMBED request body"""
+    encoded = [text.encode("utf-8") for text in texts]
+    lengths = np.fromiter(map(len, encoded), dtype="<u4", count=len(encoded))
+    return _COUNT.pack(len(encoded)) + lengths.tobytes() + b"".join(encoded)
+
+
+def decode_texts(body: bytes) -> List[str]:
+    """Texts of an EMBED request body"""
+    if len(body) < _COUNT.size:
+        raise ProtocolError("EMBED body too short")
+    (count,) = _COUNT.unpack_from(body)
+    offset = _COUNT.size + 4 * count
+    if len(body) < offset:
+        raise ProtocolError("EMBED body too short for its text lengths")
+    lengths = np.frombuffer(body, dtype="<u4", count=count, offset=_COUNT.size)
+    ends = offset + np.cumsum(lengths, dtype=np.int64)
+    if count and ends[-1] != len(body):
+        raise ProtocolError("EMBED text lengths do not match the body")
+    starts = np.concatenate(([offset], ends[:-1])) if count else ends
+    view = memoryview(body)
+    return [str(view[start:end], "utf-8") for start, end in zip(starts.tolist(), ends.tolist())]
+
+
+def request_frame(op: int, request_id: int, body: bytes = b"") -> bytes:
+    return REQUEST_HEADER.pack(MAGIC, VERSION, op, request_id, len(body)) + body
+
+
+def response_frame(status: int, op: int, request_id: int, body: bytes = b"", rows: int = 0, dimension: int = 0) -> bytes:
+    return RESPONSE_HEADER.pack(MAGIC, status, op, request_id, rows, dimension, len(body)) + body
+
+
+def parse_request_header(header: bytes) -> Tuple[int, int, int]:
+    """(op, request id, body length) of a request header"""
+    magic, version, op, request_id, length = REQUEST_HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ProtocolError(f"Bad request header (magic {magic!r}, version {version})")
+    if length > MAX_FRAME_BYTES:
+        raise ProtocolError(f"Request of {length} bytes exceeds {MAX_FRAME_BYTES}")
+    return op, request_id, length
+
+
+def parse_response_header(header: bytes) -> Tuple[int, int, int, int, int, int]:
+    """(status, op, request id, rows, dimension, body length) of a response header"""
+    magic, status, op, request_id, rows, dimension, length = RESPONSE_HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ProtocolError(f"Bad response header (magic {magic!r})")
+    return status, op, request_id, rows, dimension, length
+
+
+# ============================================
+# Server
+# ============================================
+
+class EmbeddingServer:
+    """Serves one EmbeddingService to every worker over a Unix socket"""
+
+    def __init__(self, service, socket_path: str = None):
+        """
+        Args:
+            service: The EmbeddingService that does the work
+            socket_path: Socket to listen on. Defaults to EMBEDDING_SERVER_SOCKET.
+        """
+        self.service = service
+        self.socket_path = socket_path or os.getenv("EMBEDDING_SERVER_SOCKET", "/tmp/embedding.sock")
+        self.connections = 0
+        self.requests = 0
+        self.texts = 0
+
+    async def _respond(self, writer: asyncio.StreamWriter, op: int, request_id: int, body: bytes) -> None:
+        try:
+            if op == OP_EMBED:
+                texts = decode_texts(body)
+                if len(texts) == 1:
+                    # Single texts from every worker share the micro-batcher
+                    vectors = (await self.service.aembed_text(texts[0])).reshape(1, -1)
+                else:
+                    vectors = await self.service.aembed_texts(texts)
+                vectors = np.ascontiguousarray(vectors, dtype="<f4")
+                self.requests += 1
+                self.texts += len(texts)
+                frame = response_frame(STATUS_OK, op, request_id, vectors.tobytes(), *vectors.shape)
+            elif op == OP_INFO:
+                info = {
+                    "model": self.service.model_name,
+                    "backend": self.service.backend,
+                    "dimension": self.service.dimension,
+                    "pid": os.getpid()
+                }
+                frame = response_frame(STATUS_OK, op, request_id, json.dumps(info).encode("utf-8"))
+            elif op == OP_STATS:
+                stats = {"server": self.stats(), "embedding_cache": self.service.cache_stats()}
+                frame = response_frame(STATUS_OK, op, request_id, json.dumps(stats).encode("utf-8"))
+            else:
+                raise ProtocolError(f"Unknown op {op}")
+        except Exception as e:
+            logger.error(f"[EMBED_SERVER] Request {request_id} (op {op}) failed: {str(e)}")
+            frame = response_frame(STATUS_ERROR, op, request_id, str(e).encode("utf-8"))
+        # One write per frame keeps concurrent responses from interleaving
+        writer.write(frame)
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        in_flight = set()
+        try:
+            while True:
+                op, request_id, length = parse_request_header(await reader.readexactly(REQUEST_HEADER.size))
+                body = await reader.readexactly(length)
+                task = asyncio.create_task(self._respond(writer, op, request_id, body))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+        except asyncio.IncompleteReadError:
+            pass  # worker closed the connection
+        except ProtocolError as e:
+            logger.error(f"[EMBED_SERVER] Dropping connection: {str(e)}")
+        except ConnectionError:
+            pass
+        finally:
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+            self.connections -= 1
+            writer.close()
+
+    async def serve(self) -> None:
+        """Listen until cancelled"""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        logger.info(
+            f"[EMBED_SERVER] Serving {self.service.model_name} ({self.service.backend}) on {self.socket_path}"
+        )
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def stats(self) -> dict:
+        return {
+            "connections": self.connections,
+            "requests": self.requests,
+            "texts": self.texts,
+            "pid": os.getpid()
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared embedding server for multi-worker deployments")
+    parser.add_argument("--socket", default=None, help="Unix socket path (default: EMBEDDING_SERVER_SOCKET)")
+    args = parser.parse_args()
+
+    from app.core.dependencies import EmbeddingService
+    from app.services.embedding_registry import get_model_registry
+
+    # Built directly (not via get_embedding_service): the sidecar always embeds in-process,
+    # with the model that built the active collection
+    service = EmbeddingService(get_model_registry().active()[1]["model"])
+    service.embed_text("warm up")
+    try:
+        asyncio.run(EmbeddingServer(service, args.socket).serve())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,695 @@
+"""
+===================================================================
+app/services/ingestion.py - Background document ingestion jobs
+===================================================================
+POST /upload used to extract, chunk, embed and index a document before
+answering, holding the connection open for minutes on large PDFs. It now
+spools the file to INGEST_UPLOAD_DIR (app/services/upload_spool.py),
+creates the Document with status "queued" and answers 202; a pool of
+INGEST_WORKERS coroutines in each API process runs the pipeline:
+
+    extracting -> chunking -> embedding (INGEST_BATCH_SIZE chunks per
+    batch: document_chunks, lexical index, Chroma) -> completed
+
+The job state lives on the Document row, so any worker can answer
+/documents/{id}/status: the status column (queued, processing,
+completed, failed) and meta_data["ingestion"] with the stage, percent,
+chunks done and a heartbeat. A worker claims a queued document with a
+conditional UPDATE, so two workers never run the same job.
+
+A failed attempt discards what it wrote and is queued again after
+INGEST_RETRY_DELAY * attempt seconds, up to INGEST_MAX_ATTEMPTS (errors
+in the document itself, like no extractable text, fail at once). On
+startup and every INGEST_POLL_SECONDS each process picks up queued
+documents, and processing ones whose heartbeat is older than
+INGEST_STALE_SECONDS (their worker died); those restart from the saved
+file, and their already-embedded chunks are embedding cache hits.
+"""
+import asyncio
+import logging
+import mmap
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Warm-up components a job needs: the workers start once these are up, whatever else failed
+REQUIRED_COMPONENTS = ("database", "embedding_service", "vector_store")
+
+# Share of the progress bar before embedding starts
+STAGE_PERCENT = {"queued": 0, "extracting": 5, "chunking": 10, "embedding": 10, "completed": 100}
+
+
+class IngestionError(Exception):
+    """A problem with the document itself; retrying will not help"""
+
+
+class DocumentGone(Exception):
+    """The document was deleted while its job ran"""
+
+
+# ============================================
+# Pipeline steps
+# ============================================
+
+def upload_path(document_id: str, filename: str) -> str:
+    """Where an upload waits for its job"""
+    directory = os.getenv("INGEST_UPLOAD_DIR", "./data/ingest")
+    extension = os.path.splitext(filename or "")[1].lower()
+    return os.path.join(directory, f"{document_id}{extension}")
+
+
+def remove_upload(document) -> None:
+    """Delete the saved file of a document whose job will not run (deleted documents)"""
+    path = ((document.meta_data or {}).get("ingestion") or {}).get("file_path")
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def extract_text(path: str, filename: str, content_type: str) -> Tuple[str, List]:
+    """
+    Text of a saved PDF, DOCX or TXT upload, by content type and then extension
+
+    Returns:
+        (text, pages): pages are the PageSpan offsets of a PDF's pages in
+        the text (app/utils/pdf_reader.py), empty for other types
+    """
+    from app.core.dependencies import extract_text_from_docx_bytes, extract_text_from_txt_bytes
+    from app.utils.pdf_reader import PdfPoolError, extract_pdf
+
+    def extract_txt() -> str:
+        # Decoded straight from the page cache, without a bytes copy of the file
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return extract_text_from_txt_bytes(b"")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return extract_text_from_txt_bytes(mapped)
+
+    def extract_pdf_pages() -> Tuple[str, List]:
+        # Page ranges go to the extraction process pool, which reads the file itself
+        result = extract_pdf(path)
+        if result.skipped:
+            logger.warning(f"[INGEST] {filename}: skipped pages {[page for page, _ in result.skipped]}")
+        return result.text, result.pages
+
+    try:
+        if content_type == "application/pdf":
+            return extract_pdf_pages()
+        if content_type == "text/plain":
+            return extract_txt(), []
+        if content_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+            return extract_text_from_docx_bytes(path), []
+        # Fallback: try to detect by extension
+        if filename.lower().endswith('.pdf'):
+            return extract_pdf_pages()
+        if filename.lower().endswith('.docx'):
+            return extract_text_from_docx_bytes(path), []
+        return extract_txt(), []
+    except PdfPoolError:
+        # A crashed extraction worker, not a bad document: the attempt is retried
+        raise
+    except Exception as e:
+        raise IngestionError(f"Text extraction failed: {str(e)}")
+
+
+async def run_with_session(func, *args):
+    """
+    asyncio.to_thread for work on the job's database session
+
+    A cancelled caller (shutdown) still waits for the thread, so the
+    cleanup that follows never uses the session at the same time.
+    """
+    task = asyncio.ensure_future(asyncio.to_thread(func, *args))
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        await asyncio.wait({task})
+        raise
+
+
+def chunk_pages(chunks: List, pages: List) -> List[Optional[Tuple[int, int]]]:
+    """First and last page of each chunk (app.services.chunking.Chunk), from the page offsets of the text"""
+    from app.utils.pdf_reader import pages_for_span
+
+    if not pages:
+        return [None] * len(chunks)
+    starts = [span.start for span in pages]
+    return [pages_for_span(pages, chunk.start, chunk.end, starts) for chunk in chunks]
+
+
+async def discard_document_chunks(db, document_id: str) -> None:
+    """
+    Remove what a failed or interrupted run wrote for a document
+
+    Its chunk rows, vectors and lexical entries go; chunks of other uploads
+    that matched its chunks in the near-duplicate index meanwhile are
+    promoted to canonical chunks.
+    """
+    from app.core.dependencies import get_vectorstore
+    from app.models.rag_model import DocumentChunk
+    from app.services.lexical_index import get_lexical_index
+    from app.services.near_duplicates import get_near_duplicate_index, promote_duplicates, reindex_promoted
+
+    def discard() -> Tuple[List, List]:
+        promotions = get_near_duplicate_index().delete_document(document_id)
+        db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).delete(synchronize_session=False)
+        promoted = promote_duplicates(db, promotions)
+        db.commit()
+        for chunk in promoted:
+            # Loaded again here, not lazily by reindex_promoted on the event loop
+            db.refresh(chunk)
+        get_lexical_index().delete_document(document_id)
+        return promoted, promotions
+
+    promoted, promotions = await run_with_session(discard)
+    await asyncio.to_thread(get_vectorstore().collection.delete, where={"document_id": document_id})
+    await reindex_promoted(promoted, promotions)
+
+
+# ============================================
+# Job
+# ============================================
+
+class IngestionJob:
+    """One attempt at ingesting a claimed document"""
+
+    def __init__(self, document_id: str):
+        self.document_id = document_id
+        self.batch_size = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+        self.heartbeat_seconds = float(os.getenv("INGEST_HEARTBEAT_SECONDS", "30"))
+        self.progress: Dict = {}
+        self._save_lock = asyncio.Lock()
+
+    def _write(self, columns: Dict, meta: Dict) -> None:
+        from app.core.config import SessionLocal
+        from app.models.rag_model import Document
+
+        db = SessionLocal()
+        try:
+            document = db.query(Document).filter(Document.id == self.document_id).first()
+            if document is None:
+                raise DocumentGone(self.document_id)
+            meta_data = dict(document.meta_data or {})
+            meta_data.update(meta)
+            meta_data["ingestion"] = dict(self.progress)
+            # Reassigned, not mutated: SQLAlchemy only notices a new JSON value
+            document.meta_data = meta_data
+            for key, value in columns.items():
+                setattr(document, key, value)
+            db.commit()
+        finally:
+            db.close()
+
+    async def save(self, columns: Dict = None, meta: Dict = None, **progress) -> None:
+        """Update the progress (and optionally columns / other meta_data keys) on the Document row"""
+        async with self._save_lock:
+            self.progress.update(progress, updated_at=time.time())
+            await asyncio.to_thread(self._write, columns or {}, meta or {})
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            await self.save()
+
+    async def run(self) -> None:
+        """Run the pipeline; raises on failure with nothing of this attempt left behind"""
+        heartbeat = asyncio.get_running_loop().create_task(self._heartbeat())
+        try:
+            await self._run()
+        finally:
+            heartbeat.cancel()
+
+    async def _run(self) -> None:
+        from app.core.config import SessionLocal
+        from app.core.dependencies import get_embedding_service, get_vectorstore
+        from app.crud.chunk_writer import vector_metadata, write_chunks
+        from app.models.rag_model import Document
+        from app.services.chunking import chunking_options, iter_chunks
+        from app.services.embedding_registry import get_switch_gate
+        from app.services.lexical_index import get_lexical_index
+        from app.services.near_duplicates import dedup_enabled, get_near_duplicate_index
+
+        start_time = time.time()
+        processing_metrics = {
+            'extraction_time': 0,
+            'chunking_time': 0,
+            'db_operations_time': 0,
+            'vector_store_time': 0,
+            'total_chars_processed': 0
+        }
+        db = SessionLocal()
+        try:
+            document = db.query(Document).filter(Document.id == self.document_id).first()
+            if document is None:
+                raise DocumentGone(self.document_id)
+            filename, content_type = document.filename, document.content_type
+            path = self.progress["file_path"]
+
+            # A previous attempt may have stopped half way
+            await discard_document_chunks(db, self.document_id)
+
+            await self.save(stage="extracting", percent=STAGE_PERCENT["extracting"], error=None)
+            extraction_start = time.time()
+            if not os.path.exists(path):
+                raise IngestionError(f"Uploaded file {path} is missing")
+            text, pages = await asyncio.to_thread(extract_text, path, filename, content_type)
+            processing_metrics['extraction_time'] = time.time() - extraction_start
+
+            if not text or text.strip() == "":
+                raise IngestionError("No extractable text found in uploaded document")
+            clean_text = text.strip()
+            if pages:
+                # Page offsets are into the unstripped text
+                leading = len(text) - len(text.lstrip())
+                pages = [span._replace(start=span.start - leading, end=span.end - leading) for span in pages]
+            if len(clean_text) < 10:
+                raise IngestionError("Extracted text appears to be too short or invalid")
+            processing_metrics['total_chars_processed'] = len(clean_text)
+            logger.info(f"[INGEST] {filename}: extracted {len(clean_text)} characters")
+
+            await self.save(stage="chunking", percent=STAGE_PERCENT["chunking"])
+            chunking_start = time.time()
+            try:
+                chunks = await asyncio.to_thread(lambda: list(iter_chunks(clean_text, **chunking_options())))
+            except ValueError as e:
+                # Bad CHUNKING_* settings: no use retrying
+                raise IngestionError(f"Chunking failed: {str(e)}")
+            processing_metrics['chunking_time'] = time.time() - chunking_start
+            if not chunks:
+                raise IngestionError("No chunks generated from document text")
+            chunk_page_spans = chunk_pages(chunks, pages)
+
+            await self.save(stage="embedding", chunks_total=len(chunks), chunks_done=0)
+            vector_store = get_vectorstore()
+            embedding_service = get_embedding_service()
+            near_duplicates = get_near_duplicate_index() if dedup_enabled() else None
+            lexical_index = get_lexical_index()
+            chunks_created = failed_chunks = duplicate_chunks = 0
+            chunk_details = []
+
+            def store_batch(batch_start: int) -> Tuple[List[str], List[Dict], List[str]]:
+                """
+                Dedup, write and lexically index one batch (in a worker thread)
+
+                Returns:
+                    (texts, metadatas, ids) of the canonical chunks to embed
+                """
+                nonlocal chunks_created, failed_chunks, duplicate_chunks
+                if db.query(Document.id).filter(Document.id == self.document_id).first() is None:
+                    raise DocumentGone(self.document_id)
+                rows: List[Dict] = []
+                documents_to_add, metadatas_to_add, ids_to_add = [], [], []
+                for idx in range(batch_start, min(batch_start + self.batch_size, len(chunks))):
+                    chunk = chunks[idx]
+                    chunk_text_content = chunk.text
+                    if not chunk_text_content or not chunk_text_content.strip():
+                        failed_chunks += 1
+                        continue
+
+                    chunk_id = str(uuid.uuid4())
+                    chunk_meta = {
+                        "source": filename,
+                        "content_type": content_type,
+                        "chunk_size": len(chunk_text_content),
+                        "chunk_chars": len(chunk_text_content),
+                        "char_start": chunk.start,
+                        "char_end": chunk.end
+                    }
+                    page_span = chunk_page_spans[idx]
+                    if page_span:
+                        chunk_meta["page_start"], chunk_meta["page_end"] = page_span
+                    # Repeated boilerplate is stored but only its first copy is embedded and indexed
+                    duplicate = near_duplicates.register(chunk_id, self.document_id, chunk_text_content) if near_duplicates is not None else None
+                    if duplicate:
+                        chunk_meta["duplicate_of"], chunk_meta["duplicate_similarity"] = duplicate
+                    rows.append({
+                        "id": chunk_id,
+                        "document_id": self.document_id,
+                        "content": chunk_text_content,
+                        "chunk_index": idx,
+                        "meta_data": chunk_meta
+                    })
+                    chunks_created += 1
+                    if duplicate:
+                        duplicate_chunks += 1
+                        chunk_details.append({"index": idx, "size": len(chunk_text_content),
+                                              "status": "duplicate", "duplicate_of": duplicate[0]})
+                        continue
+                    documents_to_add.append(chunk_text_content)
+                    metadatas_to_add.append(
+                        vector_metadata(chunk_id, self.document_id, idx, chunk_text_content, chunk_meta)
+                    )
+                    ids_to_add.append(chunk_id)
+                    chunk_details.append({"index": idx, "size": len(chunk_text_content), "status": "success"})
+
+                # COPY / batched INSERT, not the ORM unit of work
+                write_chunks(db, rows)
+                db.commit()
+                # Keep the BM25 index in step for hybrid / keyword search
+                lexical_index.add_many(ids_to_add, documents_to_add, metadatas_to_add)
+                return documents_to_add, metadatas_to_add, ids_to_add
+
+            for batch_start in range(0, len(chunks), self.batch_size):
+                # Rows, MinHash signatures and BM25 postings off the event loop, so queries keep flowing
+                db_operations_start = time.time()
+                documents_to_add, metadatas_to_add, ids_to_add = await run_with_session(store_batch, batch_start)
+                processing_metrics['db_operations_time'] += time.time() - db_operations_start
+
+                vector_store_start = time.time()
+                if documents_to_add:
+                    # Vectors and collection from the same model, even across a re-embedding switch
+                    async with get_switch_gate().using():
+                        embeddings = await embedding_service.aembed_texts(documents_to_add)
+                        await asyncio.to_thread(
+                            vector_store.add_documents,
+                            documents=documents_to_add,
+                            embeddings=embeddings,
+                            metadata=metadatas_to_add,
+                            ids=ids_to_add
+                        )
+                processing_metrics['vector_store_time'] += time.time() - vector_store_start
+
+                done = min(batch_start + self.batch_size, len(chunks))
+                await self.save(
+                    chunks_done=done,
+                    percent=STAGE_PERCENT["embedding"] + int((100 - STAGE_PERCENT["embedding"]) * done / len(chunks))
+                )
+
+            if chunks_created == 0:
+                raise IngestionError("No usable chunks in document")
+
+            await self.save(
+                columns={"status": COMPLETED, "chunks_count": chunks_created, "processed_at": datetime.utcnow()},
+                meta={
+                    "extracted_chars": len(clean_text),
+                    "chunks_generated": len(chunks),
+                    "chunks_created": chunks_created,
+                    "chunks_failed": failed_chunks,
+                    "chunks_duplicate": duplicate_chunks,
+                    "pages_with_text": len(pages),
+                    "processing_metrics": processing_metrics,
+                    "chunk_details": chunk_details
+                },
+                stage="completed", percent=100, duplicate_chunks=duplicate_chunks,
+                processing_time=round(time.time() - start_time, 1)
+            )
+            logger.info(
+                f"[INGEST] {filename}: {chunks_created} chunks created "
+                f"({duplicate_chunks} near-duplicates not re-indexed), {failed_chunks} failed "
+                f"in {time.time() - start_time:.1f}s"
+            )
+        except BaseException:
+            db.rollback()
+            try:
+                await discard_document_chunks(db, self.document_id)
+            except Exception as cleanup_error:
+                db.rollback()
+                logger.error(f"[INGEST] Cleanup of {self.document_id} failed: {str(cleanup_error)}")
+            raise
+        finally:
+            db.close()
+
+
+# ============================================
+# Queue and workers
+# ============================================
+
+class IngestionQueue:
+    """Worker pool of one API process"""
+
+    def __init__(self):
+        self.num_workers = int(os.getenv("INGEST_WORKERS", "2"))
+        self.max_attempts = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+        self.retry_delay = float(os.getenv("INGEST_RETRY_DELAY", "30"))
+        self.poll_seconds = float(os.getenv("INGEST_POLL_SECONDS", "30"))
+        self.stale_seconds = float(os.getenv("INGEST_STALE_SECONDS", "300"))
+        self.wait_timeout = float(os.getenv("INGEST_WAIT_TIMEOUT", "600"))
+        self.wait_poll_seconds = float(os.getenv("INGEST_WAIT_POLL_SECONDS", "5"))
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._running: Dict[str, IngestionJob] = {}
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    def enqueue(self, document_id: str) -> None:
+        """Hand a queued document to this process's workers"""
+        if self._queue is not None:
+            self._queue.put_nowait(document_id)
+
+    async def wait(self, document_id: str, timeout: float = None) -> bool:
+        """
+        Wait until the document's job completes or finally fails
+
+        A job of this process's workers resolves the wait at once; one run
+        by another process (a poll or a retry there) is noticed by reading
+        the Document status every INGEST_WAIT_POLL_SECONDS.
+
+        Args:
+            document_id: Queued document
+            timeout: Seconds to wait at most. Defaults to INGEST_WAIT_TIMEOUT.
+
+        Returns:
+            False if the job was still queued or processing at the timeout
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (self.wait_timeout if timeout is None else timeout)
+        future = loop.create_future()
+        self._waiters.setdefault(document_id, []).append(future)
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return False
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), min(self.wait_poll_seconds, remaining))
+                    return True
+                except asyncio.TimeoutError:
+                    if await asyncio.to_thread(self._settled, document_id):
+                        return True
+        finally:
+            waiters = self._waiters.get(document_id)
+            if waiters and future in waiters:
+                waiters.remove(future)
+                if not waiters:
+                    del self._waiters[document_id]
+
+    def _resolve(self, document_id: str) -> None:
+        for future in self._waiters.pop(document_id, []):
+            if not future.done():
+                future.set_result(None)
+
+    # ---------------- claiming ----------------
+
+    @staticmethod
+    def _settled(document_id: str) -> bool:
+        """The job completed or failed for good (or the document is gone)"""
+        from app.core.config import SessionLocal
+        from app.models.rag_model import Document
+
+        db = SessionLocal()
+        try:
+            row = db.query(Document.status).filter(Document.id == document_id).first()
+            return row is None or row[0] not in (QUEUED, PROCESSING)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _claim(document_id: str) -> bool:
+        """queued -> processing, unless another worker got there first"""
+        from app.core.config import SessionLocal
+        from app.models.rag_model import Document
+
+        db = SessionLocal()
+        try:
+            claimed = db.query(Document).filter(
+                Document.id == document_id, Document.status == QUEUED
+            ).update({"status": PROCESSING}, synchronize_session=False)
+            db.commit()
+            return claimed == 1
+        finally:
+            db.close()
+
+    def _pending(self) -> List[str]:
+        """Queued documents due for an attempt; processing ones of dead workers are queued again"""
+        from app.core.config import SessionLocal
+        from app.models.rag_model import Document
+
+        db = SessionLocal()
+        try:
+            now = time.time()
+            pending = []
+            for document in db.query(Document).filter(Document.status.in_([QUEUED, PROCESSING])):
+                progress = (document.meta_data or {}).get("ingestion")
+                if progress is None:
+                    continue
+                if document.status == PROCESSING:
+                    if document.id in self._running or now - (progress.get("updated_at") or 0) < self.stale_seconds:
+                        continue
+                    reset = db.query(Document).filter(
+                        Document.id == document.id, Document.status == PROCESSING
+                    ).update({"status": QUEUED}, synchronize_session=False)
+                    db.commit()
+                    if not reset:
+                        continue
+                    logger.info(f"[INGEST] Resuming {document.filename} ({document.id}) after a stopped worker")
+                if (progress.get("retry_at") or 0) <= now:
+                    pending.append(document.id)
+            return pending
+        finally:
+            db.close()
+
+    # ---------------- workers ----------------
+
+    async def _finish(self, job: IngestionJob, error: Exception) -> None:
+        """Record a failed attempt: queue a retry or fail the document"""
+        attempts = job.progress.get("attempts", 0)
+        permanent = isinstance(error, IngestionError)
+        try:
+            if permanent or attempts >= self.max_attempts:
+                await job.save(columns={"status": FAILED, "processed_at": datetime.utcnow()},
+                               stage="failed", error=str(error))
+                logger.error(f"[INGEST] {job.document_id} failed after {attempts} attempt(s): {str(error)}")
+                self._remove_file(job)
+                self._resolve(job.document_id)
+                return
+            delay = self.retry_delay * attempts
+            await job.save(columns={"status": QUEUED}, stage="queued", percent=0,
+                           error=str(error), retry_at=time.time() + delay)
+            logger.warning(f"[INGEST] {job.document_id} attempt {attempts} failed ({str(error)}); retrying in {delay:g}s")
+            asyncio.get_running_loop().call_later(delay, self.enqueue, job.document_id)
+        except DocumentGone:
+            self._resolve(job.document_id)
+
+    @staticmethod
+    def _remove_file(job: IngestionJob) -> None:
+        path = job.progress.get("file_path")
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    async def _process(self, document_id: str) -> None:
+        if not await asyncio.to_thread(self._claim, document_id):
+            return
+        job = self._running[document_id] = IngestionJob(document_id)
+        try:
+            await self._attempt(job)
+        finally:
+            self._running.pop(document_id, None)
+
+    async def _attempt(self, job: IngestionJob) -> None:
+        try:
+            from app.core.config import SessionLocal
+            from app.models.rag_model import Document
+            db = SessionLocal()
+            try:
+                document = db.query(Document).filter(Document.id == job.document_id).first()
+                if document is None:
+                    raise DocumentGone(job.document_id)
+                job.progress = dict((document.meta_data or {}).get("ingestion") or {})
+            finally:
+                db.close()
+            await job.save(attempts=job.progress.get("attempts", 0) + 1, retry_at=None)
+            await job.run()
+        except DocumentGone:
+            logger.info(f"[INGEST] {job.document_id} was deleted; job dropped")
+            self._remove_file(job)
+            self._resolve(job.document_id)
+            return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self._finish(job, e)
+            return
+        self._remove_file(job)
+        self._resolve(job.document_id)
+
+    async def _worker(self) -> None:
+        while True:
+            document_id = await self._queue.get()
+            try:
+                await self._process(document_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[INGEST] Worker error on {document_id}: {str(e)}", exc_info=True)
+
+    async def _poll(self) -> None:
+        while True:
+            try:
+                for document_id in await asyncio.to_thread(self._pending):
+                    self.enqueue(document_id)
+            except Exception as e:
+                logger.error(f"[INGEST] Polling for queued documents failed: {str(e)}")
+            await asyncio.sleep(self.poll_seconds)
+
+    async def start(self) -> None:
+        """Start the workers; queued and interrupted documents are picked up right away"""
+        if self.started:
+            return
+        self._queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.num_workers)]
+        self._tasks.append(loop.create_task(self._poll()))
+        logger.info(f"[INGEST] {self.num_workers} ingestion workers started")
+
+    async def stop(self) -> None:
+        """Stop the workers; running jobs go back to queued for the next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job in list(self._running.values()):
+            try:
+                await job.save(columns={"status": QUEUED}, stage="queued", percent=0)
+            except Exception as e:
+                logger.error(f"[INGEST] Could not requeue {job.document_id}: {str(e)}")
+        self._running.clear()
+
+
+_queue: Optional[IngestionQueue] = None
+
+
+def get_ingestion_queue() -> IngestionQueue:
+    global _queue
+    if _queue is None:
+        _queue = IngestionQueue()
+    return _queue
+
+
+def ingestion_available() -> bool:
+    """Whether queued uploads will run in this process (workers started, or about to)"""
+    from app.core.startup import get_warmup
+
+    return get_ingestion_queue().started or get_warmup().components_ready(REQUIRED_COMPONENTS)
+
+
+def ingestion_status(document) -> Dict:
+    """Job status of a Document row, for /documents/{id}/status"""
+    progress = (document.meta_data or {}).get("ingestion") or {}
+    return {
+        "document_id": document.id,
+        "job_id": document.id,
+        "filename": document.filename,
+        "status": document.status,
+        "stage": progress.get("stage", document.status),
+        "percent": progress.get("percent", 100 if document.status == COMPLETED else 0),
+        "chunks_done": progress.get("chunks_done", document.chunks_count or 0),
+        "chunks_total": progress.get("chunks_total"),
+        "duplicate_chunks": progress.get("duplicate_chunks", 0),
+        "attempts": progress.get("attempts", 0),
+        "error": progress.get("error"),
+        "retry_at": progress.get("retry_at"),
+        "uploaded_at": document.uploaded_at.isoformat() if document.uploaded_at else None,
+        "processed_at": document.processed_at.isoformat() if document.processed_at else None,
+        "updated_at": progress.get("updated_at")
+    }
@@ -0,0 +1,485 @@
+"""
+===================================================================
+app/services/lexical_index.py - BM25 inverted index over chunks
+===================================================================
+Lexical retrieval for exact identifiers, names and codes that dense
+embeddings tend to miss. Holds every DocumentChunk.content:
+
+    term -> (array('i') chunk slots, array('i') term frequencies)
+
+Chunks are added at upload time and removed (tombstoned, then compacted)
+when their document is deleted. Scoring uses zero-copy NumPy views over
+the posting arrays, so short keyword queries are answered in well under
+a millisecond without computing an embedding.
+
+The index is saved to LEXICAL_INDEX_DIR on shutdown and rebuilt from the
+document_chunks table when the saved copy is missing or out of date.
+"""
+import json
+import logging
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Words joined by - . / : stay one token ("ISO-9001", "v2.1") and are
+# also indexed as their parts
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./:]\w+)*")
+TOKEN_SEPARATORS = re.compile(r"[-./:]")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can could did do does for from had has have how i if in into is it its
+me my no not of on or our should so than that the their them then there these they this to was we
+were what when where which who whom why will with would you your
+""".split())
+
+INDEX_FILE = "lexical.npz"
+DOCUMENTS_FILE = "lexical.json"
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords; compound tokens also yield their parts"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = TOKEN_SEPARATORS.split(token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part and part not in STOPWORDS)
+    return tokens
+
+
+class LexicalIndex:
+    """Incrementally maintained BM25 index keyed by chunk id"""
+
+    def __init__(self, k1: float = None, b: float = None):
+        """
+        Args:
+            k1: BM25 term-frequency saturation. Defaults to BM25_K1.
+            b: BM25 length normalisation. Defaults to BM25_B.
+        """
+        self.k1 = k1 if k1 is not None else float(os.getenv("BM25_K1", "1.2"))
+        self.b = b if b is not None else float(os.getenv("BM25_B", "0.75"))
+        # Raw BM25 scores are unbounded; results also carry
+        # score = bm25 / (bm25 + pivot) so they sit on the same 0-1 scale as
+        # cosine similarities
+        self.score_pivot = float(os.getenv("LEXICAL_SCORE_PIVOT", "5.0"))
+        self.fast_path_max_terms = int(os.getenv("LEXICAL_FAST_PATH_MAX_TERMS", "3"))
+        # Terms whose idf falls below this (in ~90%+ of chunks) are skipped
+        self.min_idf = float(os.getenv("BM25_MIN_IDF", "0.1"))
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        # term -> (chunk slots, term frequencies), slots ascending
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        # Per slot (slots are never reused until compaction)
+        self._doc_len = array("i")
+        self._alive = bytearray()
+        self._chunk_ids: List[str] = []
+        self._texts: List[Optional[str]] = []
+        self._metadata: List[Optional[Dict]] = []
+        # chunk id / document id -> slots
+        self._slot_of: Dict[str, int] = {}
+        self._document_slots: Dict[str, array] = {}
+        self._total_len = 0
+        self._live = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    # ================================================================
+    # UPDATES
+    # ================================================================
+
+    def add_many(self, chunk_ids: List[str], texts: List[str], metadatas: List[Dict]) -> None:
+        """
+        Index a batch of chunks (re-adding a chunk id replaces it)
+
+        Args:
+            chunk_ids: DocumentChunk ids
+            texts: Chunk contents
+            metadatas: Chunk metadata; "document_id" is used for filtering
+                and delete_document()
+        """
+        with self._lock:
+            for chunk_id, text, metadata in zip(chunk_ids, texts, metadatas):
+                if chunk_id in self._slot_of:
+                    self._remove_slot(self._slot_of[chunk_id])
+                self._add(chunk_id, text, metadata or {})
+
+    def _add(self, chunk_id: str, text: str, metadata: Dict) -> None:
+        slot = len(self._chunk_ids)
+        tokens = tokenize(text)
+
+        for term, tf in Counter(tokens).items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("i"), array("i"))
+            postings[0].append(slot)
+            postings[1].append(tf)
+
+        self._doc_len.append(len(tokens))
+        self._alive.append(1)
+        self._chunk_ids.append(chunk_id)
+        self._texts.append(text)
+        self._metadata.append(metadata)
+        self._slot_of[chunk_id] = slot
+        document_id = metadata.get("document_id")
+        if document_id is not None:
+            self._document_slots.setdefault(document_id, array("i")).append(slot)
+        self._total_len += len(tokens)
+        self._live += 1
+
+    def _remove_slot(self, slot: int) -> None:
+        """Tombstone a slot; postings are cleaned up by compact()"""
+        if not self._alive[slot]:
+            return
+        self._alive[slot] = 0
+        self._total_len -= self._doc_len[slot]
+        self._live -= 1
+        self._slot_of.pop(self._chunk_ids[slot], None)
+        self._texts[slot] = None
+        self._metadata[slot] = None
+
+    def delete_document(self, document_id: str) -> int:
+        """
+        Remove every chunk of a document
+
+        Returns:
+            Number of chunks removed
+        """
+        with self._lock:
+            slots = self._document_slots.pop(document_id, array("i"))
+            removed = 0
+            for slot in slots:
+                if self._alive[slot]:
+                    self._remove_slot(slot)
+                    removed += 1
+            # Rewrite the postings once tombstones outnumber live chunks
+            if len(self._chunk_ids) - self._live > self._live:
+                self.compact()
+            logger.debug(f"[LEXICAL] Removed {removed} chunks of document {document_id}")
+            return removed
+
+    def compact(self) -> None:
+        """Drop tombstoned chunks and renumber slots"""
+        with self._lock:
+            keep = [slot for slot in range(len(self._chunk_ids)) if self._alive[slot]]
+            if len(keep) == len(self._chunk_ids):
+                return
+            new_slot = np.full(len(self._chunk_ids), -1, dtype=np.int32)
+            new_slot[keep] = np.arange(len(keep), dtype=np.int32)
+
+            postings = {}
+            for term, (slots, tfs) in self._postings.items():
+                old = np.frombuffer(slots, dtype=np.int32)
+                mapped = new_slot[old]
+                live = mapped >= 0
+                if live.any():
+                    postings[term] = (
+                        array("i", mapped[live].tobytes()),
+                        array("i", np.frombuffer(tfs, dtype=np.int32)[live].tobytes())
+                    )
+                del old
+
+            self._postings = postings
+            self._doc_len = array("i", (self._doc_len[slot] for slot in keep))
+            self._alive = bytearray(b"\x01" * len(keep))
+            self._chunk_ids = [self._chunk_ids[slot] for slot in keep]
+            self._texts = [self._texts[slot] for slot in keep]
+            self._metadata = [self._metadata[slot] for slot in keep]
+            self._slot_of = {chunk_id: slot for slot, chunk_id in enumerate(self._chunk_ids)}
+            self._document_slots = {}
+            for slot, metadata in enumerate(self._metadata):
+                document_id = metadata.get("document_id")
+                if document_id is not None:
+                    self._document_slots.setdefault(document_id, array("i")).append(slot)
+            logger.info(f"[LEXICAL] Compacted index to {len(keep)} chunks")
+
+    def clear(self) -> None:
+        """Remove everything"""
+        with self._lock:
+            self._reset()
+
+    # ================================================================
+    # SEARCH
+    # ================================================================
+
+    def is_keyword_query(self, query: str) -> bool:
+        """Short queries with no question or stopwords, e.g. an identifier or a name"""
+        if "?" in query:
+            return False
+        words = TOKEN_PATTERN.findall(query.lower())
+        return 0 < len(words) <= self.fast_path_max_terms and not any(word in STOPWORDS for word in words)
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        document_id: Optional[str] = None,
+        shared_ids: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """
+        BM25 search
+
+        Args:
+            query: Free-text query
+            top_k: Number of results to return
+            document_id: Only return chunks of this document
+            shared_ids: With document_id, chunks of other documents to search
+                as part of it (the canonical copies of its near-duplicate
+                chunks, which are not indexed themselves)
+
+        Returns:
+            Results in the same shape as vector search results, plus "id"
+            (chunk id) and "bm25_score"
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or self._live == 0:
+                return []
+
+            doc_len = np.frombuffer(self._doc_len, dtype=np.int32)
+            avgdl = self._total_len / self._live
+
+            # Only the query terms' postings are touched, never every chunk
+            slot_parts, score_parts = [], []
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                slots = np.frombuffer(postings[0], dtype=np.int32)
+                idf = np.log(1 + (self._live - len(slots) + 0.5) / (len(slots) + 0.5))
+                if idf < self.min_idf:
+                    # Present in nearly every chunk: adds cost, not ranking signal
+                    continue
+                tfs = np.frombuffer(postings[1], dtype=np.int32).astype(np.float32)
+                length_norm = self.k1 * (1 - self.b + self.b * doc_len[slots] / avgdl)
+                slot_parts.append(slots.copy())
+                score_parts.append(idf * tfs * (self.k1 + 1) / (tfs + length_norm))
+                del slots
+            # Release the buffer views so the arrays can grow again
+            del doc_len
+            if not slot_parts:
+                return []
+
+            if len(slot_parts) == 1:
+                candidates, scores = slot_parts[0], score_parts[0]
+            else:
+                candidates, inverse = np.unique(np.concatenate(slot_parts), return_inverse=True)
+                scores = np.bincount(inverse, weights=np.concatenate(score_parts)).astype(np.float32)
+
+            alive = np.frombuffer(self._alive, dtype=np.uint8)
+            keep = alive[candidates] != 0
+            del alive
+            if document_id is not None:
+                document_slots = np.frombuffer(self._document_slots.get(document_id, array("i")), dtype=np.int32)
+                if shared_ids:
+                    document_slots = np.concatenate((document_slots, np.fromiter(
+                        (self._slot_of[chunk_id] for chunk_id in shared_ids if chunk_id in self._slot_of),
+                        dtype=np.int32
+                    )))
+                keep &= np.isin(candidates, document_slots)
+                del document_slots
+            candidates, scores = candidates[keep], scores[keep]
+
+            if len(candidates) > top_k:
+                best = np.argpartition(-scores, top_k - 1)[:top_k]
+                candidates, scores = candidates[best], scores[best]
+            order = np.argsort(-scores, kind="stable")
+            candidates, scores = candidates[order], scores[order]
+
+            results = []
+            for slot, bm25 in zip(candidates.tolist(), scores.tolist()):
+                results.append({
+                    "id": self._chunk_ids[slot],
+                    "document": self._texts[slot],
+                    "content": self._texts[slot],
+                    "metadata": self._metadata[slot],
+                    "score": bm25 / (bm25 + self.score_pivot),
+                    "bm25_score": bm25
+                })
+            return results
+
+    # ================================================================
+    # PERSISTENCE
+    # ================================================================
+
+    def save(self, directory: str) -> None:
+        """Write the index (compacted) to `directory`"""
+        with self._lock:
+            self.compact()
+            os.makedirs(directory, exist_ok=True)
+            terms = list(self._postings)
+            lengths = np.array([len(self._postings[term][0]) for term in terms], dtype=np.int64)
+            offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+            slots = np.empty(offsets[-1], dtype=np.int32)
+            tfs = np.empty(offsets[-1], dtype=np.int32)
+            for term, start, end in zip(terms, offsets[:-1], offsets[1:]):
+                slots[start:end] = np.frombuffer(self._postings[term][0], dtype=np.int32)
+                tfs[start:end] = np.frombuffer(self._postings[term][1], dtype=np.int32)
+
+            index_path = os.path.join(directory, INDEX_FILE)
+            documents_path = os.path.join(directory, DOCUMENTS_FILE)
+            with open(index_path + ".tmp", "wb") as f:
+                np.savez(f, offsets=offsets, slots=slots, tfs=tfs,
+                         doc_len=np.frombuffer(self._doc_len, dtype=np.int32))
+            with open(documents_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({
+                    "terms": terms,
+                    "chunk_ids": self._chunk_ids,
+                    "texts": self._texts,
+                    "metadata": self._metadata
+                }, f)
+            os.replace(index_path + ".tmp", index_path)
+            os.replace(documents_path + ".tmp", documents_path)
+            logger.info(f"[LEXICAL] Saved {self._live} chunks, {len(terms)} terms to {directory}")
+
+    def load(self, directory: str) -> bool:
+        """
+        Load an index written by save()
+
+        Returns:
+            True if a saved index was found
+        """
+        index_path = os.path.join(directory, INDEX_FILE)
+        documents_path = os.path.join(directory, DOCUMENTS_FILE)
+        if not (os.path.exists(index_path) and os.path.exists(documents_path)):
+            return False
+
+        with open(documents_path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        arrays = np.load(index_path)
+        offsets, slots, tfs = arrays["offsets"], arrays["slots"], arrays["tfs"]
+
+        with self._lock:
+            self._reset()
+            for term, start, end in zip(saved["terms"], offsets[:-1].tolist(), offsets[1:].tolist()):
+                self._postings[term] = (array("i", slots[start:end].tobytes()), array("i", tfs[start:end].tobytes()))
+            self._doc_len = array("i", arrays["doc_len"].astype(np.int32).tobytes())
+            self._chunk_ids = saved["chunk_ids"]
+            self._texts = saved["texts"]
+            self._metadata = saved["metadata"]
+            self._alive = bytearray(b"\x01" * len(self._chunk_ids))
+            self._slot_of = {chunk_id: slot for slot, chunk_id in enumerate(self._chunk_ids)}
+            for slot, metadata in enumerate(self._metadata):
+                document_id = metadata.get("document_id")
+                if document_id is not None:
+                    self._document_slots.setdefault(document_id, array("i")).append(slot)
+            self._total_len = int(arrays["doc_len"].sum())
+            self._live = len(self._chunk_ids)
+
+        logger.info(f"[LEXICAL] Loaded {self._live} chunks from {directory}")
+        return True
+
+
+def chunk_key(result: Dict) -> str:
+    """Identity of a search result: "id", metadata["chunk_id"], else the text"""
+    return result.get("id") or (result.get("metadata") or {}).get("chunk_id") or result.get("document")
+
+
+def reciprocal_rank_fusion(
+    result_lists: Iterable[List[Dict]],
+    top_k: int,
+    k: int = None
+) -> List[Dict]:
+    """
+    Fuse ranked result lists with reciprocal rank fusion
+
+    Results are matched on chunk_key(). The first list a chunk appears in supplies
+    its dict; "rrf_score" is added.
+
+    Args:
+        result_lists: Ranked result lists (best first)
+        top_k: Number of fused results to return
+        k: RRF rank constant. Defaults to RRF_K.
+    """
+    k = k if k is not None else int(os.getenv("RRF_K", "60"))
+    fused: Dict[str, Dict] = {}
+    scores: Dict[str, float] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results):
+            key = chunk_key(result)
+            if key not in fused:
+                fused[key] = dict(result)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+
+    ranked = sorted(fused, key=lambda key: scores[key], reverse=True)[:top_k]
+    for key in ranked:
+        fused[key]["rrf_score"] = scores[key]
+    return [fused[key] for key in ranked]
+
+
+# ============================================
+# Singleton
+# ============================================
+
+_lexical_index: Optional[LexicalIndex] = None
+
+
+def get_lexical_index() -> LexicalIndex:
+    """Get or create the lexical index singleton (loaded from LEXICAL_INDEX_DIR)"""
+    global _lexical_index
+    if _lexical_index is None:
+        _lexical_index = LexicalIndex()
+        try:
+            _lexical_index.load(os.getenv("LEXICAL_INDEX_DIR", "./data/lexical"))
+        except Exception as e:
+            logger.error(f"[LEXICAL] Failed to load saved index: {str(e)}")
+    return _lexical_index
+
+
+def sync_lexical_index(db) -> LexicalIndex:
+    """
+    Make the singleton match the document_chunks table
+
+    Rebuilds from the database when the loaded index holds a different
+    number of chunks (missing file, crash before the last save). Near
+    duplicates (meta_data["duplicate_of"]) are only indexed through their
+    canonical chunk.
+    """
+    from app.models.rag_model import DocumentChunk
+
+    index = get_lexical_index()
+    canonical = DocumentChunk.meta_data["duplicate_of"].as_string().is_(None)
+    expected = db.query(DocumentChunk).filter(canonical).count()
+    if len(index) == expected:
+        return index
+
+    logger.info(f"[LEXICAL] Index has {len(index)} chunks, database has {expected}; rebuilding")
+    index.clear()
+    rows = db.query(
+        DocumentChunk.id, DocumentChunk.document_id, DocumentChunk.chunk_index,
+        DocumentChunk.content, DocumentChunk.meta_data
+    ).filter(canonical).yield_per(1000)
+    batch_ids, batch_texts, batch_meta = [], [], []
+    for chunk_id, document_id, chunk_index, content, meta_data in rows:
+        batch_ids.append(chunk_id)
+        batch_texts.append(content)
+        batch_meta.append({
+            "chunk_id": chunk_id,
+            "chunk_index": chunk_index,
+            "document_id": document_id,
+            "source": (meta_data or {}).get("source"),
+            "content_type": (meta_data or {}).get("content_type")
+        })
+        if len(batch_ids) >= 1000:
+            index.add_many(batch_ids, batch_texts, batch_meta)
+            batch_ids, batch_texts, batch_meta = [], [], []
+    index.add_many(batch_ids, batch_texts, batch_meta)
+    logger.info(f"[LEXICAL] Rebuilt index with {len(index)} chunks")
+    return index
+
+
+def save_lexical_index() -> None:
+    """Persist the singleton, if one was created"""
+    if _lexical_index is not None:
+        _lexical_index.save(os.getenv("LEXICAL_INDEX_DIR", "./data/lexical"))
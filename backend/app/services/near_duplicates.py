@@ -0,0 +1,553 @@
+"""
+===================================================================
+app/services/near_duplicates.py - Near-duplicate chunk detection
+===================================================================
+Repeated headers, footers and template pages used to be embedded and
+indexed once per occurrence, so searches returned several copies of the
+same boilerplate. Each uploaded chunk is now checked against every chunk
+already indexed:
+
+    exact   SHA-256 of the whitespace/case-normalised text
+    near    MinHash signature (DEDUP_NUM_PERM hashes of DEDUP_SHINGLE_SIZE
+            word shingles), candidates from an LSH index of
+            DEDUP_LSH_BANDS bands, accepted when the estimated Jaccard
+            similarity is at least DEDUP_THRESHOLD
+
+A chunk that matches is stored in document_chunks with
+meta_data["duplicate_of"] = the canonical chunk id, but is not embedded
+or added to Chroma / the lexical index. The canonical chunk stays indexed
+while any document references it: deleting its owner promotes one of the
+duplicates in its place (promote_duplicates / reindex_promoted).
+
+The index is saved to DEDUP_INDEX_DIR on shutdown and rebuilt from the
+document_chunks table when the saved copy is missing or out of date.
+Document-scoped searches include the canonical chunks a document's
+duplicates reference (shared_chunk_ids).
+
+Single-process limit: the index lives in the memory of each API
+process, which only knows the chunks in the database when it started
+plus the ones it ingested itself, and every process saves its copy to
+the same DEDUP_INDEX_DIR (the last one to exit wins; the next start-up
+rebuilds it if it does not match document_chunks). With several API
+workers, dedup decisions and delete promotions of one process miss what
+the others wrote, so run DEDUP_ENABLED with a single worker and set it
+to false otherwise.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from array import array
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Permutations are multiply-shift hashes of the 32-bit shingle hash x:
+# ((a * x + b) mod 2^64) >> 32 with random odd a and random b
+HASH_SHIFT = np.uint64(32)
+
+SIGNATURES_FILE = "near_duplicates.npz"
+CHUNKS_FILE = "near_duplicates.json"
+
+
+class Promotion(NamedTuple):
+    """A canonical chunk whose owner was deleted, replaced by one of its duplicates"""
+    old_id: str
+    new_id: str
+    document_id: str
+    duplicates: List[str]
+
+
+def normalize(text: str) -> str:
+    """Lowercased words joined by single spaces"""
+    return " ".join(WORD_PATTERN.findall(text.lower()))
+
+
+class NearDuplicateIndex:
+    """MinHash LSH index of canonical chunks and the duplicates that reference them"""
+
+    def __init__(
+        self,
+        num_perm: int = None,
+        bands: int = None,
+        threshold: float = None,
+        shingle_size: int = None,
+        seed: int = 1
+    ):
+        """
+        Args:
+            num_perm: MinHash signature length. Defaults to DEDUP_NUM_PERM.
+            bands: LSH bands (num_perm must divide evenly). Defaults to DEDUP_LSH_BANDS.
+            threshold: Minimum estimated Jaccard similarity. Defaults to DEDUP_THRESHOLD.
+            shingle_size: Words per shingle. Defaults to DEDUP_SHINGLE_SIZE.
+            seed: Seed of the hash permutations (saved with the index)
+        """
+        self.num_perm = num_perm or int(os.getenv("DEDUP_NUM_PERM", "128"))
+        self.bands = bands or int(os.getenv("DEDUP_LSH_BANDS", "16"))
+        self.threshold = threshold if threshold is not None else float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+        self.shingle_size = shingle_size or int(os.getenv("DEDUP_SHINGLE_SIZE", "3"))
+        self.seed = seed
+        if self.num_perm % self.bands:
+            raise ValueError(f"DEDUP_NUM_PERM ({self.num_perm}) must be a multiple of DEDUP_LSH_BANDS ({self.bands})")
+        self.rows = self.num_perm // self.bands
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(0, np.iinfo(np.uint64).max, size=(self.num_perm, 1), dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, np.iinfo(np.uint64).max, size=(self.num_perm, 1), dtype=np.uint64)
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        # Per slot (slots are never reused until save/load)
+        self._signatures = np.empty((0, self.num_perm), dtype=np.uint32)
+        self._alive = bytearray()
+        self._chunk_ids: List[Optional[str]] = []
+        self._owners: List[Optional[str]] = []
+        self._digests: List[Optional[bytes]] = []
+        # duplicate chunk id -> its document id, per canonical slot
+        self._duplicates: List[Dict[str, str]] = []
+        # band -> bucket key -> slot (or array('i') of slots once shared)
+        self._buckets: List[Dict[int, object]] = [{} for _ in range(self.bands)]
+        self._exact: Dict[bytes, int] = {}
+        self._slot_of: Dict[str, int] = {}
+        self._duplicate_of: Dict[str, int] = {}
+        self._document_slots: Dict[str, array] = {}
+        self._document_duplicates: Dict[str, List[str]] = {}
+        self._live = 0
+
+    def __len__(self) -> int:
+        """Chunks known to the index (canonical plus duplicates)"""
+        return self._live + len(self._duplicate_of)
+
+    # ================================================================
+    # SIGNATURES
+    # ================================================================
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature (uint32, num_perm) of the text's word shingles"""
+        words = normalize(text).split()
+        size = self.shingle_size
+        shingles = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little")
+             for shingle in shingles),
+            dtype=np.uint64, count=len(shingles)
+        )
+        # uint64 arithmetic wraps, which is the mod 2^64
+        permuted = (self._a * hashes + self._b) >> HASH_SHIFT
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        return [
+            int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8).digest(), "little")
+            for band in signature.reshape(self.bands, self.rows)
+        ]
+
+    @staticmethod
+    def _digest(text: str) -> bytes:
+        return hashlib.sha256(normalize(text).encode("utf-8")).digest()
+
+    # ================================================================
+    # LOOKUP / UPDATES
+    # ================================================================
+
+    def _match(self, digest: bytes, signature: np.ndarray, keys: List[int]) -> Tuple[Optional[int], float]:
+        """(canonical slot, similarity) of the closest indexed chunk above the threshold"""
+        slot = self._exact.get(digest)
+        if slot is not None:
+            return slot, 1.0
+
+        candidates = set()
+        for band, key in zip(self._buckets, keys):
+            bucket = band.get(key)
+            if bucket is None:
+                continue
+            if isinstance(bucket, int):
+                candidates.add(bucket)
+            else:
+                candidates.update(bucket)
+        candidates = [slot for slot in candidates if self._alive[slot]]
+        if not candidates:
+            return None, 0.0
+
+        similarity = (self._signatures[candidates] == signature).mean(axis=1)
+        best = int(np.argmax(similarity))
+        if similarity[best] < self.threshold:
+            return None, float(similarity[best])
+        return candidates[best], float(similarity[best])
+
+    def find(self, text: str) -> Optional[Tuple[str, float]]:
+        """
+        Closest indexed chunk
+
+        Returns:
+            (canonical chunk id, estimated Jaccard similarity), or None
+            when nothing reaches the threshold
+        """
+        signature = self.signature(text)
+        with self._lock:
+            slot, similarity = self._match(self._digest(text), signature, self._band_keys(signature))
+            return (self._chunk_ids[slot], similarity) if slot is not None else None
+
+    def register(self, chunk_id: str, document_id: str, text: str) -> Optional[Tuple[str, float]]:
+        """
+        Check a new chunk and record it
+
+        A near duplicate is recorded as a reference to its canonical chunk;
+        anything else becomes a canonical chunk itself.
+
+        Returns:
+            (canonical chunk id, similarity) if the chunk is a duplicate,
+            None if it should be embedded and indexed
+        """
+        signature = self.signature(text)
+        keys = self._band_keys(signature)
+        digest = self._digest(text)
+        with self._lock:
+            slot, similarity = self._match(digest, signature, keys)
+            if slot is not None:
+                self._add_duplicate(chunk_id, document_id, slot)
+                return self._chunk_ids[slot], similarity
+            self._add_canonical(chunk_id, document_id, digest, signature, keys)
+            return None
+
+    def add_canonical(self, chunk_id: str, document_id: str, text: str) -> None:
+        """Record an indexed chunk without checking it (rebuilds)"""
+        signature = self.signature(text)
+        with self._lock:
+            self._add_canonical(chunk_id, document_id, self._digest(text), signature, self._band_keys(signature))
+
+    def add_duplicate(self, chunk_id: str, document_id: str, canonical_id: str) -> bool:
+        """
+        Record a known duplicate (rebuilds)
+
+        Returns:
+            False if the canonical chunk is not in the index
+        """
+        with self._lock:
+            slot = self._slot_of.get(canonical_id)
+            if slot is None:
+                return False
+            self._add_duplicate(chunk_id, document_id, slot)
+            return True
+
+    def _add_canonical(self, chunk_id: str, document_id: str, digest: bytes, signature: np.ndarray, keys: List[int]) -> None:
+        slot = len(self._chunk_ids)
+        if slot == len(self._signatures):
+            grown = np.empty((max(2 * slot, 1024), self.num_perm), dtype=np.uint32)
+            grown[:slot] = self._signatures[:slot]
+            self._signatures = grown
+        self._signatures[slot] = signature
+        self._alive.append(1)
+        self._chunk_ids.append(chunk_id)
+        self._owners.append(document_id)
+        self._digests.append(digest)
+        self._duplicates.append({})
+        for band, key in zip(self._buckets, keys):
+            bucket = band.get(key)
+            if bucket is None:
+                band[key] = slot
+            elif isinstance(bucket, int):
+                band[key] = array("i", (bucket, slot))
+            else:
+                bucket.append(slot)
+        self._exact.setdefault(digest, slot)
+        self._slot_of[chunk_id] = slot
+        self._document_slots.setdefault(document_id, array("i")).append(slot)
+        self._live += 1
+
+    def _add_duplicate(self, chunk_id: str, document_id: str, slot: int) -> None:
+        self._duplicates[slot][chunk_id] = document_id
+        self._duplicate_of[chunk_id] = slot
+        self._document_duplicates.setdefault(document_id, []).append(chunk_id)
+
+    def _remove_slot(self, slot: int) -> None:
+        """Tombstone a canonical slot and drop it from the LSH buckets"""
+        self._alive[slot] = 0
+        self._live -= 1
+        self._slot_of.pop(self._chunk_ids[slot], None)
+        if self._exact.get(self._digests[slot]) == slot:
+            del self._exact[self._digests[slot]]
+        for band, key in zip(self._buckets, self._band_keys(self._signatures[slot])):
+            bucket = band.get(key)
+            if isinstance(bucket, int):
+                del band[key]
+            elif bucket is not None:
+                bucket.remove(slot)
+                if len(bucket) == 1:
+                    band[key] = bucket[0]
+        self._chunk_ids[slot] = self._owners[slot] = self._digests[slot] = None
+
+    def delete_document(self, document_id: str) -> List[Promotion]:
+        """
+        Forget a document's chunks
+
+        Canonical chunks still referenced by other documents are handed to
+        one of their duplicates instead of being dropped.
+
+        Returns:
+            The promotions; callers must re-index the promoted chunks
+            (see promote_duplicates / reindex_promoted)
+        """
+        with self._lock:
+            for chunk_id in self._document_duplicates.pop(document_id, []):
+                slot = self._duplicate_of.pop(chunk_id, None)
+                if slot is not None:
+                    self._duplicates[slot].pop(chunk_id, None)
+
+            promotions = []
+            for slot in self._document_slots.pop(document_id, array("i")):
+                if not self._alive[slot]:
+                    continue
+                duplicates = self._duplicates[slot]
+                if not duplicates:
+                    self._remove_slot(slot)
+                    continue
+                old_id = self._chunk_ids[slot]
+                new_id = next(iter(duplicates))
+                new_document = duplicates.pop(new_id)
+                del self._duplicate_of[new_id]
+                self._document_duplicates[new_document].remove(new_id)
+                self._chunk_ids[slot] = new_id
+                self._owners[slot] = new_document
+                del self._slot_of[old_id]
+                self._slot_of[new_id] = slot
+                self._document_slots.setdefault(new_document, array("i")).append(slot)
+                promotions.append(Promotion(old_id, new_id, new_document, list(duplicates)))
+
+            if promotions:
+                logger.info(f"[DEDUP] Deleting document {document_id} promoted {len(promotions)} shared chunks")
+            return promotions
+
+    def clear(self) -> None:
+        """Remove everything"""
+        with self._lock:
+            self._reset()
+
+    def stats(self) -> Dict:
+        return {
+            "canonical_chunks": self._live,
+            "duplicate_chunks": len(self._duplicate_of),
+            "threshold": self.threshold,
+            "num_perm": self.num_perm,
+            "bands": self.bands
+        }
+
+    # ================================================================
+    # PERSISTENCE
+    # ================================================================
+
+    def _params(self) -> Dict:
+        return {"num_perm": self.num_perm, "bands": self.bands, "shingle_size": self.shingle_size, "seed": self.seed}
+
+    def save(self, directory: str) -> None:
+        """Write the live canonical chunks and their duplicates to `directory`"""
+        with self._lock:
+            os.makedirs(directory, exist_ok=True)
+            keep = [slot for slot in range(len(self._chunk_ids)) if self._alive[slot]]
+            signatures_path = os.path.join(directory, SIGNATURES_FILE)
+            chunks_path = os.path.join(directory, CHUNKS_FILE)
+            with open(signatures_path + ".tmp", "wb") as f:
+                np.savez(
+                    f,
+                    signatures=self._signatures[keep],
+                    digests=np.frombuffer(b"".join(self._digests[slot] for slot in keep), dtype=np.uint8)
+                )
+            with open(chunks_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({
+                    "params": self._params(),
+                    "chunk_ids": [self._chunk_ids[slot] for slot in keep],
+                    "owners": [self._owners[slot] for slot in keep],
+                    "duplicates": [self._duplicates[slot] for slot in keep]
+                }, f)
+            os.replace(signatures_path + ".tmp", signatures_path)
+            os.replace(chunks_path + ".tmp", chunks_path)
+            logger.info(
+                f"[DEDUP] Saved {self._live} canonical and {len(self._duplicate_of)} duplicate chunks to {directory}"
+            )
+
+    def load(self, directory: str) -> bool:
+        """
+        Load an index written by save()
+
+        Returns:
+            True if a saved index with the same parameters was found
+        """
+        signatures_path = os.path.join(directory, SIGNATURES_FILE)
+        chunks_path = os.path.join(directory, CHUNKS_FILE)
+        if not (os.path.exists(signatures_path) and os.path.exists(chunks_path)):
+            return False
+
+        with open(chunks_path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved["params"] != self._params():
+            logger.info(f"[DEDUP] Saved index uses {saved['params']}, not {self._params()}; ignoring it")
+            return False
+        arrays = np.load(signatures_path)
+        signatures = arrays["signatures"]
+        digests = arrays["digests"].reshape(-1, 32)
+
+        with self._lock:
+            self._reset()
+            for chunk_id, owner, duplicates, signature, digest in zip(
+                saved["chunk_ids"], saved["owners"], saved["duplicates"], signatures, digests
+            ):
+                self._add_canonical(chunk_id, owner, digest.tobytes(), signature, self._band_keys(signature))
+                slot = self._slot_of[chunk_id]
+                for duplicate_id, document_id in duplicates.items():
+                    self._add_duplicate(duplicate_id, document_id, slot)
+
+        logger.info(
+            f"[DEDUP] Loaded {self._live} canonical and {len(self._duplicate_of)} duplicate chunks from {directory}"
+        )
+        return True
+
+
+# ============================================
+# Singleton
+# ============================================
+
+_near_duplicate_index: Optional[NearDuplicateIndex] = None
+_near_duplicate_lock = threading.Lock()
+
+
+def dedup_enabled() -> bool:
+    return os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+
+
+def get_near_duplicate_index() -> NearDuplicateIndex:
+    """Get or create the near-duplicate index singleton (loaded from DEDUP_INDEX_DIR)"""
+    global _near_duplicate_index
+    if _near_duplicate_index is None:
+        with _near_duplicate_lock:
+            if _near_duplicate_index is None:
+                index = NearDuplicateIndex()
+                try:
+                    index.load(os.getenv("DEDUP_INDEX_DIR", "./data/near_duplicates"))
+                except Exception as e:
+                    logger.error(f"[DEDUP] Failed to load saved index: {str(e)}")
+                _near_duplicate_index = index
+    return _near_duplicate_index
+
+
+def sync_near_duplicate_index(db) -> NearDuplicateIndex:
+    """
+    Make the singleton match the document_chunks table
+
+    Rebuilds from the database when the loaded index holds a different
+    number of chunks (missing file, crash before the last save).
+    """
+    from app.models.rag_model import DocumentChunk
+
+    index = get_near_duplicate_index()
+    expected = db.query(DocumentChunk).count()
+    if len(index) == expected:
+        return index
+
+    logger.info(f"[DEDUP] Index has {len(index)} chunks, database has {expected}; rebuilding")
+    index.clear()
+    duplicates = []
+    rows = db.query(
+        DocumentChunk.id, DocumentChunk.document_id, DocumentChunk.content, DocumentChunk.meta_data
+    ).yield_per(1000)
+    for chunk_id, document_id, content, meta_data in rows:
+        canonical_id = (meta_data or {}).get("duplicate_of")
+        if canonical_id:
+            duplicates.append((chunk_id, document_id, canonical_id))
+        else:
+            index.add_canonical(chunk_id, document_id, content)
+    missing = [chunk_id for chunk_id, document_id, canonical_id in duplicates
+               if not index.add_duplicate(chunk_id, document_id, canonical_id)]
+    if missing:
+        logger.warning(f"[DEDUP] {len(missing)} duplicate chunks reference missing canonical chunks")
+    logger.info(f"[DEDUP] Rebuilt index with {len(index)} chunks")
+    return index
+
+
+def shared_chunk_ids(db, document_id: str) -> List[str]:
+    """
+    Canonical chunks that a document's near-duplicate chunks reference
+
+    Its duplicates are only in document_chunks, so document-scoped searches
+    look for these (usually owned by other documents) as well. Read from
+    the database, so every API process sees the same references.
+    """
+    from app.models.rag_model import DocumentChunk
+
+    canonical_id = DocumentChunk.meta_data["duplicate_of"].as_string()
+    rows = db.query(canonical_id).filter(
+        DocumentChunk.document_id == document_id, canonical_id.isnot(None)
+    ).distinct()
+    return [row[0] for row in rows]
+
+
+def save_near_duplicate_index() -> None:
+    """Persist the singleton, if one was created"""
+    if _near_duplicate_index is not None:
+        _near_duplicate_index.save(os.getenv("DEDUP_INDEX_DIR", "./data/near_duplicates"))
+
+
+# ============================================
+# Promotion after delete
+# ============================================
+
+def promote_duplicates(db, promotions: List[Promotion]) -> List:
+    """
+    Point the database at the promoted chunks (the caller commits)
+
+    Returns:
+        The promoted DocumentChunk rows
+    """
+    from app.models.rag_model import DocumentChunk
+
+    if not promotions:
+        return []
+    new_ids = {promotion.new_id: promotion for promotion in promotions}
+    retarget = {duplicate: promotion.new_id for promotion in promotions for duplicate in promotion.duplicates}
+    rows = db.query(DocumentChunk).filter(DocumentChunk.id.in_(list(new_ids) + list(retarget))).all()
+    promoted = []
+    for row in rows:
+        meta_data = dict(row.meta_data or {})
+        if row.id in new_ids:
+            meta_data.pop("duplicate_of", None)
+            meta_data.pop("duplicate_similarity", None)
+            promoted.append(row)
+        else:
+            meta_data["duplicate_of"] = retarget[row.id]
+        row.meta_data = meta_data
+    return promoted
+
+
+async def reindex_promoted(chunks: List, promotions: List[Promotion]) -> None:
+    """Embed the promoted chunks into Chroma and the lexical index, dropping the old canonical vectors"""
+    from app.core.dependencies import get_embedding_service, get_vectorstore
+    from app.crud.chunk_writer import vector_metadata
+    from app.services.embedding_registry import get_switch_gate
+    from app.services.lexical_index import get_lexical_index
+
+    if not chunks:
+        return
+    texts = [chunk.content for chunk in chunks]
+    metadatas = [
+        vector_metadata(chunk.id, chunk.document_id, chunk.chunk_index, chunk.content, chunk.meta_data)
+        for chunk in chunks
+    ]
+    ids = [chunk.id for chunk in chunks]
+
+    vector_store = get_vectorstore()
+    async with get_switch_gate().using():
+        # Same texts as the old canonical chunks, so these are embedding cache hits
+        embeddings = await get_embedding_service().aembed_texts(texts)
+        await asyncio.to_thread(
+            vector_store.add_documents, documents=texts, embeddings=embeddings, metadata=metadatas, ids=ids
+        )
+        await asyncio.to_thread(vector_store.collection.delete, ids=[promotion.old_id for promotion in promotions])
+    await asyncio.to_thread(get_lexical_index().add_many, ids, texts, metadatas)
+    logger.info(f"[DEDUP] Re-indexed {len(chunks)} promoted chunks")
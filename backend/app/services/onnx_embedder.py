@@ -0,0 +1,241 @@
+"""
+===================================================================
+app/services/onnx_embedder.py - ONNX Runtime embedding backend
+===================================================================
+Runs the transformer of a sentence-transformers model with ONNX Runtime
+on CPU (EMBEDDING_BACKEND=onnx). Pooling and normalization are done in
+numpy, so no torch is needed at serving time.
+
+The model is exported once into a local directory (EMBEDDING_ONNX_DIR):
+    model.onnx            transformer graph, token embeddings out
+    model_quantized.onnx  same graph with dynamic int8 weights (optional)
+    tokenizer files       saved from the model's Hugging Face tokenizer
+    onnx_config.json      source model, pooling, normalization,
+                          max_seq_length, dimension
+
+Export (needs torch, onnx and sentence-transformers):
+    python -m app.services.onnx_embedder sentence-transformers/all-MiniLM-L6-v2 ./models/all-MiniLM-L6-v2-onnx --quantize
+"""
+import argparse
+import json
+import logging
+import os
+from typing import Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+CONFIG_FILE = "onnx_config.json"
+
+POOLING_MODES = ("mean", "cls", "max")
+_INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+
+class OnnxEmbedder:
+    """Sentence embeddings from an exported ONNX transformer"""
+
+    def __init__(self, directory: str = None, quantized: bool = None, threads: int = None):
+        """
+        Args:
+            directory: Exported model directory. Defaults to EMBEDDING_ONNX_DIR.
+            quantized: Load the int8 graph. Defaults to EMBEDDING_ONNX_QUANTIZED.
+            threads: ONNX Runtime intra-op threads, 0 for its default.
+                Defaults to EMBEDDING_ONNX_THREADS.
+        """
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("onnxruntime package not installed. Run: pip install onnxruntime")
+        from transformers import AutoTokenizer
+
+        self.directory = directory or os.getenv("EMBEDDING_ONNX_DIR", "./models/onnx")
+        if quantized is None:
+            quantized = os.getenv("EMBEDDING_ONNX_QUANTIZED", "false").lower() == "true"
+        self.quantized = quantized
+        threads = threads if threads is not None else int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))
+
+        config_path = os.path.join(self.directory, CONFIG_FILE)
+        if not os.path.exists(config_path):
+            raise FileNotFoundError(
+                f"No exported ONNX model in {self.directory}. "
+                f"Run: python -m app.services.onnx_embedder <model> {self.directory}"
+            )
+        with open(config_path, "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.source_model = self.config["model"]
+        self.pooling = self.config["pooling"]
+        self.normalize = self.config["normalize"]
+        self.max_seq_length = self.config["max_seq_length"]
+        self.do_lower_case = self.config.get("do_lower_case", False)
+        self.dimension = self.config["dimension"]
+
+        model_path = os.path.join(self.directory, QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [node.name for node in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(self.directory)
+
+        logger.info(
+            f"[ONNX] Loaded {os.path.basename(model_path)} for {self.source_model} "
+            f"({self.pooling} pooling, dimension {self.dimension})"
+        )
+
+    # ================================================================
+    # INFERENCE
+    # ================================================================
+
+    def tokenize(self, texts: List[str]):
+        """Unpadded token ids of each text, prepared as SentenceTransformer.tokenize does"""
+        texts = [text.strip() for text in texts]
+        if self.do_lower_case:
+            texts = [text.lower() for text in texts]
+        return self.tokenizer(
+            texts, add_special_tokens=True, truncation="longest_first", max_length=self.max_seq_length
+        )
+
+    def forward(self, encoded, rows: List[int]) -> np.ndarray:
+        """One session run over already tokenized texts, padded to the longest of them"""
+        features = self.tokenizer.pad(
+            {key: [values[i] for i in rows] for key, values in encoded.items()},
+            return_tensors="np"
+        )
+        inputs = {name: features[name].astype(np.int64) for name in self.input_names if name in features}
+        if "token_type_ids" in self.input_names and "token_type_ids" not in inputs:
+            inputs["token_type_ids"] = np.zeros_like(inputs["input_ids"])
+        token_embeddings = self.session.run(None, inputs)[0]
+        return self._pool(token_embeddings, features["attention_mask"])
+
+    def _pool(self, token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """Pooling (and normalization) as configured at export time"""
+        mask = attention_mask[..., None].astype(np.float32)
+        if self.pooling == "cls":
+            embeddings = token_embeddings[:, 0]
+        elif self.pooling == "max":
+            embeddings = np.where(mask > 0, token_embeddings, -1e9).max(axis=1)
+        else:
+            embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        embeddings = embeddings.astype(np.float32, copy=False)
+        if self.normalize:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """float32 embeddings, batched in character-length order like SentenceTransformer.encode"""
+        encoded = self.tokenize(texts)
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            embeddings[rows] = self.forward(encoded, rows.tolist())
+        return embeddings
+
+
+# ================================================================
+# EXPORT
+# ================================================================
+
+def _pooling_mode(pooling) -> str:
+    """Pooling mode name across sentence-transformers versions"""
+    if hasattr(pooling, "get_pooling_mode_str"):
+        return pooling.get_pooling_mode_str()
+    return pooling.pooling_mode
+
+
+def export_model(model_name: str, directory: str, quantize: bool = False, opset: int = 17) -> Dict:
+    """
+    Export a sentence-transformers model for OnnxEmbedder
+
+    Args:
+        model_name: Hub name or local path of the sentence-transformers model
+        directory: Output directory
+        quantize: Also write a dynamic int8 copy (model_quantized.onnx)
+        opset: ONNX opset version
+
+    Returns:
+        The onnx_config.json contents
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    modules = list(model)
+    transformer = modules[0]
+    poolings = [module for module in modules if type(module).__name__ == "Pooling"]
+    if not poolings:
+        raise ValueError(f"{model_name} has no Pooling module")
+    pooling = _pooling_mode(poolings[0])
+    if pooling not in POOLING_MODES:
+        raise ValueError(f"Pooling mode '{pooling}' is not supported (use one of {POOLING_MODES})")
+    unsupported = [
+        type(module).__name__ for module in modules[1:]
+        if type(module).__name__ not in ("Pooling", "Normalize")
+    ]
+    if unsupported:
+        raise ValueError(f"Modules not supported by the ONNX backend: {unsupported}")
+
+    class TokenEmbeddings(torch.nn.Module):
+        """The Hugging Face model with keyword inputs and one tensor output"""
+
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, input_ids, attention_mask, token_type_ids=None):
+            kwargs = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if token_type_ids is not None:
+                kwargs["token_type_ids"] = token_type_ids
+            return self.auto_model(**kwargs).last_hidden_state
+
+    os.makedirs(directory, exist_ok=True)
+    sample = model.tokenizer(["an example sentence", "another one"], padding=True, return_tensors="pt")
+    input_names = [name for name in _INPUT_NAMES if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["token_embeddings"]}
+    model_path = os.path.join(directory, MODEL_FILE)
+    with torch.inference_mode():
+        torch.onnx.export(
+            TokenEmbeddings(transformer.auto_model).eval(),
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["token_embeddings"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            dynamo=False
+        )
+    logger.info(f"[ONNX] Exported {model_name} to {model_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(model_path, os.path.join(directory, QUANTIZED_MODEL_FILE), weight_type=QuantType.QInt8)
+        logger.info(f"[ONNX] Wrote int8 model to {os.path.join(directory, QUANTIZED_MODEL_FILE)}")
+
+    model.tokenizer.save_pretrained(directory)
+    config = {
+        "model": model_name,
+        "pooling": pooling,
+        "normalize": any(type(module).__name__ == "Normalize" for module in modules),
+        "max_seq_length": model.max_seq_length,
+        "do_lower_case": bool(getattr(transformer, "do_lower_case", False)),
+        "dimension": model.get_sentence_embedding_dimension(),
+        "quantized": quantize
+    }
+    with open(os.path.join(directory, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    return config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a sentence-transformers model for EMBEDDING_BACKEND=onnx")
+    parser.add_argument("model", help="sentence-transformers model name or path")
+    parser.add_argument("directory", help="output directory (EMBEDDING_ONNX_DIR)")
+    parser.add_argument("--quantize", action="store_true", help="also write a dynamic int8 model")
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(export_model(args.model, args.directory, args.quantize, args.opset), indent=2))
@@ -3,6 +3,7 @@ Enhanced RAG Orchestrator with Agentic ReAct Pattern
 Delegates query execution to Coordinator Agent
 """
 import logging
+import threading
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 import uuid
@@ -149,7 +150,7 @@ class RAGOrchestrator:
         doc_id = str(uuid.uuid4())
         
         # Generate embeddings and add to vector store
-        embeddings = self.embedding_service.embed_texts(chunks)
+        embeddings = await self.embedding_service.aembed_texts(chunks)
         
         metadatas = [
             {
@@ -196,33 +197,22 @@ class RAGOrchestrator:
     
     def _chunk_text(self, text: str, chunk_size: int = 800, chunk_overlap: int = 100) -> List[str]:
         """Chunk text with overlap"""
+        from app.services.chunking import iter_chunks
+
         if not text or len(text.strip()) == 0:
             return []
-        
-        words = text.split()
-        if len(words) <= chunk_size:
-            return [" ".join(words)]
-        
-        chunks = []
-        start = 0
-        while start < len(words):
-            end = start + chunk_size
-            chunk = " ".join(words[start:end])
-            chunks.append(chunk)
-            
-            if end >= len(words):
-                break
-            start = end - chunk_overlap
-        
-        return chunks
+        return [chunk.text for chunk in iter_chunks(text, chunk_size, chunk_overlap, unit="words")]
 
 
 # Global singleton
 _rag_orchestrator = None
+_rag_orchestrator_lock = threading.Lock()
 
 def get_rag_orchestrator(relevance_threshold: float = 0.30) -> RAGOrchestrator:
     """Get singleton RAG orchestrator with Agentic ReAct pattern"""
     global _rag_orchestrator
     if _rag_orchestrator is None:
-        _rag_orchestrator = RAGOrchestrator(relevance_threshold=relevance_threshold)
+        with _rag_orchestrator_lock:
+            if _rag_orchestrator is None:
+                _rag_orchestrator = RAGOrchestrator(relevance_threshold=relevance_threshold)
     return _rag_orchestrator
\ No newline at end of file
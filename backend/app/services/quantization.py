@@ -0,0 +1,121 @@
+"""
+===================================================================
+app/services/quantization.py - Compact storage for embedding rows
+===================================================================
+Scalar quantization used by the in-memory VectorStore:
+
+    float32 - stored as-is (4 bytes / dimension)
+    float16 - half precision (2 bytes / dimension)
+    int8    - symmetric int8 codes with a per-dimension scale (1 byte / dimension)
+
+Search is asymmetric: the query stays float32 and is scored against the
+stored codes, decoded block by block so no full-size float32 copy of the
+matrix is ever materialised.
+"""
+import logging
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STORAGE_DTYPES = ("float32", "float16", "int8")
+
+# Rows decoded per block while scoring quantized storage
+SCORE_BLOCK_ROWS = 65536
+
+
+class ScalarQuantizer:
+    """Encode, decode and score embedding rows for one storage dtype"""
+
+    def __init__(self, storage: str, dimension: int):
+        """
+        Args:
+            storage: One of STORAGE_DTYPES
+            dimension: Embedding dimension
+        """
+        if storage not in STORAGE_DTYPES:
+            raise ValueError(f"Unknown storage dtype: {storage}. Use one of {STORAGE_DTYPES}")
+
+        self.storage = storage
+        self.dimension = dimension
+        self.dtype = np.dtype(storage)
+        # int8 only: value of one code step per dimension. It is a running
+        # max(|x|) / 127 over everything stored so far.
+        self.scale: Optional[np.ndarray] = (
+            np.zeros(dimension, dtype=np.float32) if storage == "int8" else None
+        )
+
+    @property
+    def is_exact(self) -> bool:
+        """True when stored rows are the original float32 values"""
+        return self.storage == "float32"
+
+    def _safe_scale(self) -> np.ndarray:
+        """Scale with zero entries (all-zero columns so far) replaced by 1"""
+        return np.where(self.scale > 0, self.scale, 1.0).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray, stored: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Encode float32 rows for storage
+
+        For int8 the per-dimension scale only ever grows. When new rows
+        exceed it, the affected columns of `stored` are requantized in
+        place to the wider scale.
+
+        Args:
+            vectors: (n, dimension) float32 rows
+            stored: Codes already in the store (int8 only, modified in place)
+
+        Returns:
+            (n, dimension) array of self.dtype
+        """
+        if self.storage == "float32":
+            return np.asarray(vectors, dtype=np.float32)
+        if self.storage == "float16":
+            return vectors.astype(np.float16)
+
+        new_scale = np.maximum(self.scale, np.abs(vectors).max(axis=0) / 127.0).astype(np.float32)
+        grown = np.flatnonzero((new_scale > self.scale) & (self.scale > 0))
+        if stored is not None and len(stored) and len(grown):
+            ratio = self.scale[grown] / new_scale[grown]
+            stored[:, grown] = np.rint(stored[:, grown] * ratio).astype(np.int8)
+            logger.debug(f"[QUANTIZATION] Requantized {len(grown)} int8 columns")
+        self.scale = new_scale
+
+        return np.clip(np.rint(vectors / self._safe_scale()), -127, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Decode stored rows back to (approximate) float32"""
+        if self.storage == "float32":
+            return codes
+        if self.storage == "float16":
+            return codes.astype(np.float32)
+        return codes.astype(np.float32) * self.scale
+
+    def scores(self, codes: np.ndarray, query_vec: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Inner products of a float32 query with stored rows
+
+        Args:
+            codes: Stored matrix (valid rows only)
+            query_vec: (dimension,) float32 query
+            rows: Optional subset of row positions to score
+
+        Returns:
+            float32 scores, one per scored row
+        """
+        if self.storage == "float32":
+            return (codes[rows] if rows is not None else codes) @ query_vec
+
+        # int8: x . q == codes . (scale * q), so fold the scale into the query
+        if self.storage == "int8":
+            query_vec = query_vec * self.scale
+
+        count = len(rows) if rows is not None else len(codes)
+        out = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SCORE_BLOCK_ROWS):
+            end = min(start + SCORE_BLOCK_ROWS, count)
+            block = codes[rows[start:end]] if rows is not None else codes[start:end]
+            out[start:end] = block.astype(np.float32) @ query_vec
+        return out
@@ -281,14 +281,9 @@ class RAGService:
         if not text:
             return []
         
-        words = text.split()
-        chunks = []
-        
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = ' '.join(words[i:i + chunk_size])
-            if chunk.strip():
-                chunks.append(chunk.strip())
-        
+        from app.services.chunking import iter_chunks
+
+        chunks = [chunk.text for chunk in iter_chunks(text, chunk_size, overlap, unit="words")]
         return chunks if chunks else [text]
     
     async def process_document(
@@ -0,0 +1,187 @@
+"""
+===================================================================
+app/services/reranker.py - Cross-encoder reranking of retrieved chunks
+===================================================================
+Optional stage between retrieval and generation. A small local
+cross-encoder (RERANKER_MODEL, on CPU) scores every (query, chunk) pair of
+the top RERANK_TOP_N candidates in one batched forward pass and reorders
+them. Scores are relevance probabilities in [0, 1].
+
+Scores are cached in an LRU keyed by (query hash, chunk id): a repeated
+query, or the same query over a partly changed candidate list, only sends
+the chunks not scored before through the model.
+
+Enabled with RERANK_ENABLED; the model is loaded on first use.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.lexical_index import chunk_key
+
+logger = logging.getLogger(__name__)
+
+
+def query_hash(query: str) -> str:
+    """Stable cache key of a query (whitespace and case normalised)"""
+    normalized = " ".join(query.lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+class CrossEncoderReranker:
+    """Batched CPU cross-encoder with an LRU score cache"""
+
+    def __init__(
+        self,
+        model_name: str = None,
+        cache_size: int = None,
+        batch_size: int = None,
+        max_length: int = None
+    ):
+        """
+        Args:
+            model_name: Cross-encoder name or local path. Defaults to RERANKER_MODEL.
+            cache_size: Cached (query, chunk) scores. Defaults to RERANK_CACHE_SIZE.
+            batch_size: Pairs per forward pass. Defaults to RERANK_BATCH_SIZE.
+            max_length: Token limit per pair. Defaults to RERANK_MAX_LENGTH.
+        """
+        self.model_name = model_name or os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+        self.cache_size = cache_size or int(os.getenv("RERANK_CACHE_SIZE", "10000"))
+        self.batch_size = batch_size or int(os.getenv("RERANK_BATCH_SIZE", "32"))
+        self.max_length = max_length or int(os.getenv("RERANK_MAX_LENGTH", "512"))
+
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def model(self):
+        """The cross-encoder, loaded on first use"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    logger.info(f"[RERANKER] Loading cross-encoder: {self.model_name}")
+                    self._model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+                    logger.info("[RERANKER] Cross-encoder loaded")
+        return self._model
+
+    # ================================================================
+    # SCORING
+    # ================================================================
+
+    def score(self, query: str, chunks: List[Dict]) -> np.ndarray:
+        """
+        Relevance of each chunk to the query
+
+        Args:
+            query: User query
+            chunks: Search results (with "document" and an id)
+
+        Returns:
+            float32 array of scores in [0, 1], aligned with chunks
+        """
+        qhash = query_hash(query)
+        keys = [(qhash, str(chunk_key(chunk))) for chunk in chunks]
+        scores = np.empty(len(chunks), dtype=np.float32)
+
+        missing = []
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    scores[i] = cached
+            self.hits += len(chunks) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            pairs = [(query, chunks[i].get("document") or chunks[i].get("content") or "") for i in missing]
+            predicted = np.asarray(
+                self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False),
+                dtype=np.float32
+            ).reshape(len(missing))
+            scores[missing] = predicted
+
+            with self._cache_lock:
+                for i, value in zip(missing, predicted.tolist()):
+                    self._cache[keys[i]] = value
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return scores
+
+    def rerank(self, query: str, chunks: List[Dict], top_k: Optional[int] = None) -> List[Dict]:
+        """
+        Reorder chunks by cross-encoder score
+
+        Args:
+            query: User query
+            chunks: Candidate search results
+            top_k: Number of results to keep (all if None)
+
+        Returns:
+            Copies of the best chunks, best first, with "rerank_score" added
+        """
+        if not chunks:
+            return []
+        scores = self.score(query, chunks)
+        order = np.argsort(-scores, kind="stable")
+        if top_k is not None:
+            order = order[:top_k]
+        reranked = []
+        for i in order.tolist():
+            chunk = dict(chunks[i])
+            chunk["rerank_score"] = float(scores[i])
+            reranked.append(chunk)
+        return reranked
+
+    # ================================================================
+    # CACHE
+    # ================================================================
+
+    def clear_cache(self) -> None:
+        with self._cache_lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict:
+        """Cache size and hit/miss counters"""
+        with self._cache_lock:
+            lookups = self.hits + self.misses
+            return {
+                "model": self.model_name,
+                "cached_scores": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+# ============================================
+# Singleton
+# ============================================
+
+_reranker: Optional[CrossEncoderReranker] = None
+
+
+def get_reranker() -> Optional[CrossEncoderReranker]:
+    """Get the reranker singleton, or None unless RERANK_ENABLED is true"""
+    global _reranker
+    if os.getenv("RERANK_ENABLED", "false").lower() != "true":
+        return None
+    if _reranker is None:
+        _reranker = CrossEncoderReranker()
+    return _reranker
@@ -0,0 +1,426 @@
+"""
+===================================================================
+app/services/segments.py - Memory-mapped embedding segments
+===================================================================
+On-disk format of the in-memory VectorStore. Every flush seals the rows
+and documents added since the previous one into an immutable segment:
+
+    seg-000001.f32   raw float32 rows (rows x dimension, C order)
+    seg-000001.ids   raw int64 document position of each row
+    seg-000001.docs  sidecar: JSON list of the segment's texts
+    seg-000001.meta  sidecar: JSON list of the segment's metadata dicts
+
+manifest.json lists the live segments in order, with their row and
+document counts, and is replaced atomically, so a crash mid-write never
+exposes a partial segment. At startup only the manifest and the row ids
+(8 bytes per row) are read: the .f32 files are np.memmap'ed, and a
+sidecar is read the first time one of its documents is needed (see
+SidecarList).
+
+Small segments are merged in a background thread (size-tiered: a run of
+`merge_factor` trailing segments of the same size tier becomes one), so
+the number of segments stays logarithmic in the corpus size.
+"""
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+
+VECTORS_SUFFIX = ".f32"
+ROW_IDS_SUFFIX = ".ids"
+# Sidecar column name -> file suffix
+SIDECAR_SUFFIXES = {"documents": ".docs", "metadata": ".meta"}
+SEGMENT_SUFFIXES = (VECTORS_SUFFIX, ROW_IDS_SUFFIX) + tuple(SIDECAR_SUFFIXES.values())
+
+
+class Segment:
+    """One sealed segment: a contiguous range of rows and of documents"""
+
+    def __init__(self, name: str, vectors: np.ndarray, row_doc_ids: np.ndarray, first_doc: int, num_docs: int):
+        self.name = name
+        self.vectors = vectors
+        self.row_doc_ids = row_doc_ids
+        self.first_doc = first_doc
+        self.num_docs = num_docs
+        # Sidecar columns read so far (column name -> values)
+        self.columns: Dict[str, List] = {}
+
+    @property
+    def rows(self) -> int:
+        return len(self.vectors)
+
+    def header(self) -> Dict:
+        """Manifest entry of the segment"""
+        return {"name": self.name, "rows": self.rows, "first_doc": self.first_doc, "num_docs": self.num_docs}
+
+
+class SidecarList:
+    """
+    List-like view of one sidecar column ("documents" or "metadata")
+
+    The first `sealed` positions live in segments and are read from their
+    sidecar the first time a position in that segment is touched; later
+    positions are the in-memory tail not yet flushed. Supports what
+    VectorStore uses of a list: len, indexing, slicing, iteration,
+    append, extend and clear.
+    """
+
+    def __init__(self, log: "SegmentLog", column: str):
+        self._log = log
+        self._column = column
+        self._sealed = log.docs
+        self._tail: List = []
+
+    def __len__(self) -> int:
+        return self._sealed + len(self._tail)
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1 and start >= self._sealed:
+                return self._tail[start - self._sealed:stop - self._sealed]
+            return [self[i] for i in range(start, stop, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("sidecar index out of range")
+        if index >= self._sealed:
+            return self._tail[index - self._sealed]
+        return self._log.sidecar_value(self._column, index)
+
+    def __iter__(self) -> Iterator:
+        for segment in self._log.snapshot():
+            yield from self._log.read_column(segment, self._column)
+        yield from self._tail
+
+    def append(self, value: Any) -> None:
+        self._tail.append(value)
+
+    def extend(self, values: Iterable) -> None:
+        self._tail.extend(values)
+
+    def clear(self) -> None:
+        self._sealed = 0
+        self._tail = []
+
+    def seal(self) -> None:
+        """Mark the tail as written to a segment (after SegmentLog.append)"""
+        self._sealed += len(self._tail)
+        self._tail = []
+
+
+class SegmentLog:
+    """Ordered, append-only list of segments in one directory"""
+
+    def __init__(self, directory: str, merge_factor: int = None):
+        """
+        Args:
+            directory: Where segments and the manifest live
+            merge_factor: Trailing same-tier segments merged at once.
+                Defaults to VECTOR_SEGMENT_MERGE_FACTOR.
+        """
+        self.directory = directory
+        self.merge_factor = max(2, merge_factor or int(os.getenv("VECTOR_SEGMENT_MERGE_FACTOR", "8")))
+        self.dimension: Optional[int] = None
+        # Store-level values persisted alongside the segment list (index type etc.)
+        self.info: Dict = {}
+        self.segments: List[Segment] = []
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._merge_thread: Optional[threading.Thread] = None
+
+    # ================================================================
+    # STATE
+    # ================================================================
+
+    @property
+    def rows(self) -> int:
+        """Total rows across all segments"""
+        return sum(segment.rows for segment in self.segments)
+
+    @property
+    def docs(self) -> int:
+        """Total documents across all segments"""
+        return sum(segment.num_docs for segment in self.segments)
+
+    def snapshot(self) -> List[Segment]:
+        """Current segment list (merges replace it, never mutate it in place)"""
+        with self._lock:
+            return list(self.segments)
+
+    def blocks(self) -> List[Tuple[int, np.ndarray]]:
+        """(first row, float32 rows) of every non-empty segment, in row order"""
+        blocks, offset = [], 0
+        for segment in self.snapshot():
+            if segment.rows:
+                blocks.append((offset, segment.vectors))
+            offset += segment.rows
+        return blocks
+
+    def _path(self, name: str, suffix: str) -> str:
+        return os.path.join(self.directory, name + suffix)
+
+    def read_column(self, segment: Segment, column: str) -> List:
+        """One sidecar column of a segment, read from disk on first use"""
+        values = segment.columns.get(column)
+        if values is None:
+            if segment.num_docs:
+                with open(self._path(segment.name, SIDECAR_SUFFIXES[column]), "r", encoding="utf-8") as f:
+                    values = json.load(f)
+            else:
+                values = []
+            segment.columns[column] = values
+        return values
+
+    def sidecar_value(self, column: str, doc: int) -> Any:
+        """Sidecar value of the document at position `doc`"""
+        segments = self.snapshot()
+        at = bisect.bisect_right([segment.first_doc for segment in segments], doc) - 1
+        # Empty segments share first_doc with their successor; step past them
+        while segments[at].num_docs == 0 or doc >= segments[at].first_doc + segments[at].num_docs:
+            at += 1
+        segment = segments[at]
+        return self.read_column(segment, column)[doc - segment.first_doc]
+
+    # ================================================================
+    # LOAD / APPEND
+    # ================================================================
+
+    def load(self) -> Optional[np.ndarray]:
+        """
+        Map every segment listed in the manifest
+
+        Texts and metadata are not read here (see SidecarList).
+
+        Returns:
+            Document position of every row across all segments, or None
+            if the directory holds no manifest
+        """
+        manifest_path = os.path.join(self.directory, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return None
+
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.dimension = manifest.get("dimension")
+        self.info = manifest.get("info", {})
+        self._next_id = manifest.get("next_id", 1)
+
+        segments = [self._open(**header) for header in manifest["segments"]]
+        self.segments = segments
+
+        row_doc_ids = (
+            np.concatenate([segment.row_doc_ids for segment in segments])
+            if segments else np.empty(0, dtype=np.int64)
+        )
+        self._remove_unlisted({segment.name for segment in segments})
+        logger.info(f"[SEGMENTS] Mapped {len(segments)} segments ({self.rows} rows) from {self.directory}")
+        return row_doc_ids
+
+    def _open(self, name: str, rows: int, first_doc: int, num_docs: int) -> Segment:
+        """Memory-map one segment's rows and read its row ids"""
+        if rows:
+            vectors = np.memmap(self._path(name, VECTORS_SUFFIX), dtype=np.float32, mode="r",
+                                shape=(rows, self.dimension))
+            row_doc_ids = np.fromfile(self._path(name, ROW_IDS_SUFFIX), dtype=np.int64)
+        else:
+            vectors = np.empty((0, self.dimension or 0), dtype=np.float32)
+            row_doc_ids = np.empty(0, dtype=np.int64)
+        return Segment(name, vectors, row_doc_ids, first_doc, num_docs)
+
+    def _write(
+        self,
+        name: str,
+        blocks: Iterable[np.ndarray],
+        row_doc_ids: np.ndarray,
+        first_doc: int,
+        documents: List[str],
+        metadata: List[Dict]
+    ) -> Segment:
+        """Write a segment's files (not yet listed in the manifest) and map them"""
+        os.makedirs(self.directory, exist_ok=True)
+        if len(row_doc_ids):
+            with open(self._path(name, VECTORS_SUFFIX), "wb") as f:
+                for block in blocks:
+                    f.write(np.ascontiguousarray(block, dtype=np.float32).tobytes())
+            np.asarray(row_doc_ids, dtype=np.int64).tofile(self._path(name, ROW_IDS_SUFFIX))
+        if documents:
+            for column, values in (("documents", documents), ("metadata", metadata)):
+                with open(self._path(name, SIDECAR_SUFFIXES[column]), "w", encoding="utf-8") as f:
+                    json.dump(values, f)
+        return self._open(name, int(len(row_doc_ids)), first_doc, len(documents))
+
+    def append(
+        self,
+        blocks: Iterable[np.ndarray],
+        row_doc_ids: np.ndarray,
+        first_doc: int,
+        documents: List[str],
+        metadata: List[Dict],
+        dimension: Optional[int]
+    ) -> None:
+        """
+        Seal a new segment at the end of the log
+
+        Args:
+            blocks: float32 row blocks, in order (row_doc_ids gives the count)
+            row_doc_ids: Document position of each row
+            first_doc: Position of the first document in the segment
+            documents: Texts of the segment's documents
+            metadata: Metadata of the segment's documents
+            dimension: Embedding dimension (None while nothing is embedded)
+        """
+        if dimension is not None:
+            self.dimension = dimension
+        with self._lock:
+            name = f"seg-{self._next_id:06d}"
+            self._next_id += 1
+        segment = self._write(name, blocks, row_doc_ids, first_doc, documents, metadata)
+        with self._lock:
+            self.segments.append(segment)
+            self._write_manifest()
+        logger.debug(f"[SEGMENTS] Sealed {name}: {segment.rows} rows, {segment.num_docs} documents")
+        self.maybe_merge()
+
+    def update_info(self, info: Dict) -> None:
+        """Persist store-level values with the manifest"""
+        with self._lock:
+            self.info.update(info)
+            self._write_manifest()
+
+    def _write_manifest(self) -> None:
+        """Atomically replace the manifest (caller holds the lock)"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, MANIFEST_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "dimension": self.dimension,
+                "next_id": self._next_id,
+                "segments": [segment.header() for segment in self.segments],
+                "info": self.info
+            }, f)
+        os.replace(path + ".tmp", path)
+
+    # ================================================================
+    # MERGE
+    # ================================================================
+
+    def _tier(self, segment: Segment) -> int:
+        return int(math.log(max(segment.rows, 1), self.merge_factor))
+
+    def _merge_run(self) -> List[Segment]:
+        """Trailing run of same-tier segments, if it is long enough to merge"""
+        with self._lock:
+            segments = list(self.segments)
+        if len(segments) < self.merge_factor:
+            return []
+        tier = self._tier(segments[-1])
+        run = []
+        for segment in reversed(segments):
+            if self._tier(segment) != tier:
+                break
+            run.append(segment)
+        run.reverse()
+        return run if len(run) >= self.merge_factor else []
+
+    def maybe_merge(self) -> None:
+        """Start a background merge if one is due and none is running"""
+        if self._merge_thread is not None and self._merge_thread.is_alive():
+            return
+        if not self._merge_run():
+            return
+        self._merge_thread = threading.Thread(target=self._merge_loop, name="segment-merge", daemon=True)
+        self._merge_thread.start()
+
+    def wait_for_merge(self) -> None:
+        """Block until a running background merge finishes"""
+        if self._merge_thread is not None:
+            self._merge_thread.join()
+
+    def _merge_loop(self) -> None:
+        """Merge runs until none is due (one merge can make the next tier due)"""
+        try:
+            while True:
+                run = self._merge_run()
+                if not run:
+                    return
+                self.merge(run)
+        except Exception as e:
+            logger.error(f"[SEGMENTS] Background merge failed: {str(e)}")
+
+    def merge(self, run: List[Segment]) -> None:
+        """
+        Replace a contiguous run of segments with one merged segment
+
+        Segments appended while the merge runs are kept after it.
+        """
+        with self._lock:
+            name = f"seg-{self._next_id:06d}"
+            self._next_id += 1
+
+        documents: List[str] = []
+        metadata: List[Dict] = []
+        for segment in run:
+            documents.extend(self.read_column(segment, "documents"))
+            metadata.extend(self.read_column(segment, "metadata"))
+        row_doc_ids = np.concatenate([segment.row_doc_ids for segment in run])
+        merged = self._write(name, (segment.vectors for segment in run if segment.rows), row_doc_ids,
+                             run[0].first_doc, documents, metadata)
+
+        with self._lock:
+            start = self.segments.index(run[0])
+            if self.segments[start:start + len(run)] != run:
+                raise RuntimeError("Segment list changed during merge")
+            self.segments[start:start + len(run)] = [merged]
+            self._write_manifest()
+
+        # Readers may still hold the old maps; unlinking is safe on POSIX
+        for segment in run:
+            self._remove_files(segment.name)
+        logger.info(f"[SEGMENTS] Merged {len(run)} segments into {name} ({merged.rows} rows)")
+
+    # ================================================================
+    # CLEANUP
+    # ================================================================
+
+    def _remove_files(self, name: str) -> None:
+        for suffix in SEGMENT_SUFFIXES:
+            try:
+                os.remove(self._path(name, suffix))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"[SEGMENTS] Could not remove {name}{suffix}: {str(e)}")
+
+    def _remove_unlisted(self, live: set) -> None:
+        """Delete segment files left behind by an interrupted write or merge"""
+        for filename in os.listdir(self.directory):
+            name, suffix = os.path.splitext(filename)
+            if name.startswith("seg-") and suffix in SEGMENT_SUFFIXES \
+                    and name not in live:
+                self._remove_files(name)
+
+    def remove_all(self) -> None:
+        """Delete every segment and the manifest"""
+        self.wait_for_merge()
+        with self._lock:
+            names = [segment.name for segment in self.segments]
+            self.segments = []
+            self.dimension = None
+            self.info = {}
+        for name in names:
+            self._remove_files(name)
+        if os.path.isdir(self.directory):
+            self._remove_unlisted(set())
+        manifest_path = os.path.join(self.directory, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
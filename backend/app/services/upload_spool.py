@@ -0,0 +1,89 @@
+"""
+===================================================================
+app/services/upload_spool.py - Streaming upload spooling
+===================================================================
+Uploads used to be read whole (`await file.read()`) and passed through
+extraction as one byte string, so every concurrent 50 MB upload cost a
+worker 50 MB or more. They are now copied from the request's temporary
+file to their destination UPLOAD_SPOOL_CHUNK_SIZE bytes at a time,
+hashed (SHA-256) and size-checked on the way, so an upload holds one
+chunk in memory whatever its size. Extractors then read the file
+through a handle or memory map (see extract_text in
+app/services/ingestion.py).
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from typing import BinaryIO, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLarge(Exception):
+    """The upload went over its size limit"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"File exceeds the maximum size of {limit} bytes")
+        self.limit = limit
+
+
+class SpooledFile(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+def spool_chunk_size() -> int:
+    return int(os.getenv("UPLOAD_SPOOL_CHUNK_SIZE", str(1024 * 1024)))
+
+
+def spool_file(source: BinaryIO, path: str, max_size: Optional[int] = None, chunk_size: int = None) -> SpooledFile:
+    """
+    Copy a file object to `path` chunk by chunk
+
+    The copy is written next to `path` and renamed into place when
+    complete, so `path` never holds a partial upload.
+
+    Args:
+        source: Readable binary file (e.g. UploadFile.file), from its current position
+        path: Destination
+        max_size: Limit in bytes; the copy stops as soon as it is exceeded
+        chunk_size: Bytes per read. Defaults to UPLOAD_SPOOL_CHUNK_SIZE.
+
+    Returns:
+        SpooledFile with the size and SHA-256 hex digest
+
+    Raises:
+        UploadTooLarge: the source is larger than max_size (nothing is left at `path`)
+    """
+    chunk_size = chunk_size or spool_chunk_size()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    partial = path + ".part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(partial, "wb") as out:
+            while True:
+                block = source.read(chunk_size)
+                if not block:
+                    break
+                size += len(block)
+                if max_size is not None and size > max_size:
+                    raise UploadTooLarge(max_size)
+                digest.update(block)
+                out.write(block)
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return SpooledFile(path, size, digest.hexdigest())
+
+
+async def spool_upload(upload, path: str, max_size: Optional[int] = None) -> SpooledFile:
+    """spool_file for a FastAPI UploadFile, off the event loop"""
+    await upload.seek(0)
+    return await asyncio.to_thread(spool_file, upload.file, path, max_size)
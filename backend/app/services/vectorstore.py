@@ -1,34 +1,381 @@
 import os
-from typing import Dict, List, Optional
+import json
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 import logging
 import numpy as np
 import gc  # Garbage collector
 
+from app.services.quantization import STORAGE_DTYPES, ScalarQuantizer
+from app.services.segments import SegmentLog, SidecarList
+
+try:
+    import faiss
+except ImportError:  # faiss-cpu is optional; exact matrix search is used without it
+    faiss = None
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Number of rows allocated for the embedding matrix on first insert;
+# capacity doubles from here whenever it runs out
+INITIAL_MATRIX_CAPACITY = 1024
+
+# Supported FAISS index types (FAISS_INDEX_TYPE)
+FAISS_INDEX_TYPES = ("none", "flat", "ivf", "hnsw")
+
+# FAISS index file kept next to the segments in the persist directory
+INDEX_FILE = "index.faiss"
+
+# Rows scored / decoded per block when walking the whole store
+ROW_BLOCK = 65536
+
+
 class VectorStore:
     """Vector store for document embeddings and similarity search"""
     
-    def __init__(self):
-        """Initialize the vector store"""
+    def __init__(
+        self,
+        index_type: str = None,
+        persist_directory: str = None,
+        storage_dtype: str = None
+    ):
+        """
+        Initialize the vector store
+        
+        Args:
+            index_type: FAISS index type - none, flat (exact inner product),
+                ivf (IVF-Flat) or hnsw. Defaults to FAISS_INDEX_TYPE.
+            persist_directory: Directory of the embedding segments and FAISS
+                index used by load()/save(). Defaults to FAISS_PERSIST_DIR.
+            storage_dtype: How embedding rows are held in memory - float32,
+                float16 or int8 (per-dimension scale). Defaults to
+                VECTOR_STORAGE_DTYPE.
+        """
+        # Plain lists until load() attaches segments, then SidecarLists
+        # that read texts / metadata from disk on first use
         self.documents: List[str] = []
         self.metadata: List[Dict] = []
-        self.embeddings: List[List[float]] = []
+        self.dimension: Optional[int] = None
         self.index = None
+        # True while self.index is an IVF index whose inverted lists are
+        # memory-mapped (read-only) from the saved index file
+        self._index_mapped = False
         self._is_cleared = False
+        
+        self.index_type = (index_type or os.getenv("FAISS_INDEX_TYPE", "flat")).lower()
+        if self.index_type not in FAISS_INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type: {self.index_type}. Use one of {FAISS_INDEX_TYPES}")
+        if faiss is None and self.index_type != "none":
+            logger.warning("[VECTOR_STORE] faiss not installed, falling back to exact search")
+            self.index_type = "none"
+        
+        self.storage_dtype = (storage_dtype or os.getenv("VECTOR_STORAGE_DTYPE", "float32")).lower()
+        if self.storage_dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unknown storage dtype: {self.storage_dtype}. Use one of {STORAGE_DTYPES}")
+        # Quantized storage only: rescore the best top_k * factor candidates
+        # against a float32 copy of the rows (0 disables the copy and rerank)
+        self.rerank_factor = int(os.getenv("VECTOR_RERANK_FACTOR", "0"))
+        
+        # Below this many vectors exact matrix search is as fast as any index
+        self.min_index_vectors = int(os.getenv("FAISS_MIN_VECTORS", "10000"))
+        self.ivf_nlist = int(os.getenv("FAISS_IVF_NLIST", "1024"))
+        self.ivf_nprobe = int(os.getenv("FAISS_IVF_NPROBE", "16"))
+        self.hnsw_m = int(os.getenv("FAISS_HNSW_M", "32"))
+        self.hnsw_ef_construction = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "200"))
+        self.hnsw_ef_search = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+        # Filtered queries with at most this many candidate rows skip the
+        # ANN index and are scored exactly
+        self.filter_exact_max = int(os.getenv("FAISS_FILTER_EXACT_MAX", "20000"))
+        # Filtered ANN search: initial overfetch relative to the expected
+        # hit rate, and how many times to widen (x4) before going exact
+        self.filter_overfetch = float(os.getenv("FAISS_FILTER_OVERFETCH", "2.0"))
+        self.filter_max_rounds = int(os.getenv("FAISS_FILTER_MAX_ROUNDS", "3"))
+        self.persist_directory = persist_directory or os.getenv(
+            "FAISS_PERSIST_DIR",
+            "./data/vectors/faiss"
+        )
+        # Once loaded from disk, single add_document() calls are sealed into
+        # a segment after this many unsealed documents (add_documents()
+        # always seals its batch)
+        self.segment_flush_docs = int(os.getenv("VECTOR_SEGMENT_FLUSH_DOCS", "1024"))
+        
+        # Embeddings are L2-normalised. Rows in the storage dtype live in
+        # `_matrix`, which holds rows [_matrix_start, _num_rows) and has
+        # spare capacity so appends are amortised O(1).
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_start = 0
+        # Created with the first embedding, once the dimension is known
+        self._quantizer: Optional[ScalarQuantizer] = None
+        # Quantized storage: float32 rows not yet sealed into a segment,
+        # kept for re-ranking and for writing the next segment
+        self._exact: Optional[np.ndarray] = None
+        # On-disk, memory-mapped segments (attached by load()). They hold
+        # the float32 rows [0, _sealed_rows); with float32 storage they are
+        # searched in place and `_matrix` only holds the unsealed tail.
+        self._segments: Optional[SegmentLog] = None
+        # Matrix row -> position in self.documents (documents added
+        # without an embedding have no row)
+        self._row_doc_ids: Optional[np.ndarray] = None
+        self._num_rows = 0
+        
+        # Position in self.documents -> matrix row (-1 when no embedding)
+        self._doc_rows = np.empty(0, dtype=np.int64)
+        # Inverted metadata index: key -> value -> ascending document
+        # positions (None after load() until the first filtered query)
+        self._metadata_index: Optional[Dict[str, Dict[Any, array]]] = {}
         logger.info("[VECTOR_STORE] Initialized new VectorStore instance")
     
+    @property
+    def embeddings(self) -> np.ndarray:
+        """Read-only float32 copy of the stored (normalised) embedding rows; n x d x 4 bytes, so count with _num_rows"""
+        if self._num_rows == 0:
+            return np.empty((0, self.dimension or 0), dtype=np.float32)
+        rows = self._float32_rows(np.arange(self._num_rows))
+        rows.flags.writeable = False
+        return rows
+    
     def get_count(self) -> int:
         """Return total number of documents in the vector store"""
         # Always return the actual count, don't rely on _is_cleared flag
         return len(self.documents)
     
+    @property
+    def _sealed_rows(self) -> int:
+        """Rows already written to on-disk segments"""
+        return self._segments.rows if self._segments is not None else 0
+    
+    @property
+    def _keeps_exact_tail(self) -> bool:
+        """Whether quantized storage also keeps the unsealed float32 rows"""
+        return self.storage_dtype != "float32" and (self.rerank_factor > 0 or self._segments is not None)
+    
+    @property
+    def _reranks(self) -> bool:
+        """Whether quantized results are rescored against float32 rows"""
+        return self.storage_dtype != "float32" and self.rerank_factor > 0
+    
+    @staticmethod
+    def _grow(buffer: Optional[np.ndarray], used: int, extra_rows: int, shape: tuple, dtype) -> np.ndarray:
+        """Return `buffer`, or a copy grown by doubling, with room for `extra_rows` more rows"""
+        required = used + extra_rows
+        capacity = len(buffer) if buffer is not None else 0
+        if required <= capacity:
+            return buffer
+        
+        new_capacity = max(capacity, INITIAL_MATRIX_CAPACITY)
+        while new_capacity < required:
+            new_capacity *= 2
+        
+        grown = np.empty((new_capacity,) + shape, dtype=dtype)
+        if buffer is not None:
+            grown[:used] = buffer[:used]
+        logger.debug(f"[VECTOR_STORE] Row buffer capacity: {capacity} -> {new_capacity}")
+        return grown
+    
+    def _ensure_capacity(self, extra_rows: int) -> None:
+        """Grow the row buffers (by doubling) to fit `extra_rows` more rows"""
+        shape = (self.dimension,)
+        self._matrix = self._grow(
+            self._matrix, self._num_rows - self._matrix_start, extra_rows, shape, self._quantizer.dtype
+        )
+        self._row_doc_ids = self._grow(self._row_doc_ids, self._num_rows, extra_rows, (), np.int64)
+        if self._keeps_exact_tail:
+            self._exact = self._grow(
+                self._exact, self._num_rows - self._sealed_rows, extra_rows, shape, np.float32
+            )
+    
+    def _code_blocks(self) -> List[Tuple[int, np.ndarray]]:
+        """(first row, rows) blocks of the searched storage, in row order"""
+        blocks = []
+        if self.storage_dtype == "float32" and self._segments is not None:
+            blocks.extend(self._segments.blocks())
+        if self._matrix is not None and self._num_rows > self._matrix_start:
+            blocks.append((self._matrix_start, self._matrix[:self._num_rows - self._matrix_start]))
+        return blocks
+    
+    def _exact_blocks(self) -> Optional[List[Tuple[int, np.ndarray]]]:
+        """(first row, rows) blocks of float32 rows, or None if only quantized codes exist"""
+        if self.storage_dtype == "float32":
+            return self._code_blocks()
+        if not self._keeps_exact_tail:
+            return None
+        blocks = self._segments.blocks() if self._segments is not None else []
+        sealed = self._sealed_rows
+        if self._exact is not None and self._num_rows > sealed:
+            blocks.append((sealed, self._exact[:self._num_rows - sealed]))
+        return blocks
+    
+    @staticmethod
+    def _gather(blocks: List[Tuple[int, np.ndarray]], rows: np.ndarray) -> np.ndarray:
+        """Rows (any order) from a list of (first row, rows) blocks"""
+        if len(blocks) == 1:
+            offset, block = blocks[0]
+            return np.asarray(block[rows - offset])
+        starts = np.array([offset for offset, _ in blocks], dtype=np.int64)
+        which = np.searchsorted(starts, rows, side="right") - 1
+        out = np.empty((len(rows), blocks[0][1].shape[1]), dtype=blocks[0][1].dtype)
+        for b in np.unique(which).tolist():
+            selected = which == b
+            offset, block = blocks[b]
+            out[selected] = block[rows[selected] - offset]
+        return out
+    
+    def _float32_rows(self, rows: np.ndarray) -> np.ndarray:
+        """Normalised float32 rows (exact when available, else decoded codes)"""
+        blocks = self._exact_blocks()
+        if blocks is None:
+            return self._quantizer.decode(self._matrix[rows])
+        return self._gather(blocks, rows).astype(np.float32, copy=False)
+    
+    def _iter_float32(self) -> Iterator[np.ndarray]:
+        """All float32 rows in order, ROW_BLOCK rows at a time"""
+        for start in range(0, self._num_rows, ROW_BLOCK):
+            yield self._float32_rows(np.arange(start, min(start + ROW_BLOCK, self._num_rows)))
+    
+    def _score(self, query_vec: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Asymmetric scores of a float32 query against stored rows
+        
+        Args:
+            query_vec: Normalised (dimension,) float32 query
+            rows: Optional ascending subset of rows to score
+        """
+        blocks = self._code_blocks()
+        if len(blocks) == 1:
+            offset, block = blocks[0]
+            return self._quantizer.scores(block, query_vec, rows - offset if rows is not None else None)
+        
+        out = np.empty(len(rows) if rows is not None else self._num_rows, dtype=np.float32)
+        if rows is None:
+            for offset, block in blocks:
+                out[offset:offset + len(block)] = self._quantizer.scores(block, query_vec)
+            return out
+        
+        bounds = np.searchsorted(rows, [offset for offset, _ in blocks] + [self._num_rows])
+        for (offset, block), lo, hi in zip(blocks, bounds[:-1], bounds[1:]):
+            if hi > lo:
+                out[lo:hi] = self._quantizer.scores(block, query_vec, rows[lo:hi] - offset)
+        return out
+    
+    def _register_documents(self, metadatas: List[Dict], rows: np.ndarray) -> None:
+        """
+        Record doc -> row mapping and index metadata for newly added documents
+        
+        Must be called before the documents are appended to self.documents.
+        
+        Args:
+            metadatas: Metadata dict of each new document
+            rows: Matrix row of each new document (-1 if it has no embedding)
+        """
+        first_id = len(self.documents)
+        required = first_id + len(metadatas)
+        if required > len(self._doc_rows):
+            doc_rows = np.empty(max(required, 2 * len(self._doc_rows), INITIAL_MATRIX_CAPACITY), dtype=np.int64)
+            doc_rows[:first_id] = self._doc_rows[:first_id]
+            self._doc_rows = doc_rows
+        self._doc_rows[first_id:required] = rows
+        
+        if self._metadata_index is not None:
+            self._index_metadata(metadatas, first_id)
+    
+    def _index_metadata(self, metadatas, first_id: int) -> None:
+        """Add documents at positions first_id, first_id + 1, ... to the inverted metadata index"""
+        for doc_id, meta in enumerate(metadatas, start=first_id):
+            for key, value in (meta or {}).items():
+                values = self._metadata_index.setdefault(key, {})
+                try:
+                    postings = values.get(value)
+                except TypeError:
+                    # Unhashable values (lists, dicts) are matched by scanning
+                    continue
+                if postings is None:
+                    postings = values[value] = array("q")
+                postings.append(doc_id)
+    
+    def _matching_doc_ids(self, filter_dict: Dict) -> np.ndarray:
+        """
+        Ascending positions of documents whose metadata matches every filter item
+        
+        Uses the inverted metadata index, so the cost is proportional to the
+        posting list sizes rather than the number of stored documents. After
+        load() the index is built here, on the first filtered query, which
+        reads the metadata sidecars (not the texts) once.
+        """
+        if self._metadata_index is None:
+            self._metadata_index = {}
+            self._index_metadata(self.metadata, 0)
+            logger.info(f"[VECTOR_STORE] Indexed metadata of {len(self.metadata)} documents")
+        
+        candidates = None
+        for key, value in filter_dict.items():
+            postings = None
+            if value is not None:
+                try:
+                    postings = self._metadata_index.get(key, {}).get(value, array("q"))
+                except TypeError:
+                    pass
+            if postings is None:
+                # None also matches documents without the key; unhashable
+                # values are not indexed. Both need a scan.
+                postings = array("q", (
+                    i for i, meta in enumerate(self.metadata) if meta.get(key) == value
+                ))
+            
+            doc_ids = np.array(postings, dtype=np.int64)
+            if candidates is None:
+                candidates = doc_ids
+            else:
+                candidates = np.intersect1d(candidates, doc_ids, assume_unique=True)
+            if len(candidates) == 0:
+                break
+        
+        return candidates if candidates is not None else np.arange(len(self.documents), dtype=np.int64)
+    
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """L2-normalise rows so that a dot product is a cosine similarity"""
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+    
+    def _append_embeddings(self, embeddings: np.ndarray, doc_ids: np.ndarray) -> np.ndarray:
+        """
+        Normalise and append embedding rows to the matrix
+        
+        Args:
+            embeddings: (n, dimension) array of raw embeddings
+            doc_ids: Positions in self.documents the rows belong to
+            
+        Returns:
+            The normalised float32 rows (before quantization)
+        """
+        if self.dimension is None:
+            self.dimension = int(embeddings.shape[1])
+        elif embeddings.shape[1] != self.dimension:
+            raise ValueError(
+                f"Embedding dimension {embeddings.shape[1]} does not match store dimension {self.dimension}"
+            )
+        if self._quantizer is None:
+            self._quantizer = ScalarQuantizer(self.storage_dtype, self.dimension)
+        
+        self._ensure_capacity(len(embeddings))
+        start, end = self._num_rows, self._num_rows + len(embeddings)
+        normalized = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        local = start - self._matrix_start
+        self._matrix[local:local + len(normalized)] = self._quantizer.encode(normalized, self._matrix[:local])
+        if self._keeps_exact_tail:
+            tail = start - self._sealed_rows
+            self._exact[tail:tail + len(normalized)] = normalized
+        self._row_doc_ids[start:end] = doc_ids
+        self._num_rows = end
+        return normalized
+    
     def add_document(
         self,
         text: str,
         metadata: Dict,
-        embedding: Optional[List[float]] = None
+        embedding: Optional[Union[np.ndarray, List[float]]] = None
     ) -> None:
         """
         Add a single document with its metadata and optional embedding
@@ -42,15 +389,28 @@ class VectorStore:
             # Reset cleared flag when adding new documents
             self._is_cleared = False
             
-            self.documents.append(text)
-            self.metadata.append(metadata)
+            doc_id = len(self.documents)
+            row = -1
             
             if embedding is not None:
-                self.embeddings.append(embedding)
+                row = self._num_rows
+                rows = self._append_embeddings(
+                    np.asarray(embedding, dtype=np.float32).reshape(1, -1),
+                    np.array([doc_id], dtype=np.int64)
+                )
                 
                 # Add to FAISS index if available
                 if self.index is not None:
-                    self.index.add(np.array([embedding], dtype=np.float32))
+                    self._add_to_index(rows)
+            
+            self._register_documents([metadata], np.array([row], dtype=np.int64))
+            self.documents.append(text)
+            self.metadata.append(metadata)
+            
+            if self.index is None:
+                self._maybe_build_index()
+            if self._segments is not None and len(self.documents) - self._segments.docs >= self.segment_flush_docs:
+                self.flush()
             
             logger.debug(f"[VECTOR_STORE] Added document, total count: {len(self.documents)}")
             
@@ -58,6 +418,328 @@ class VectorStore:
             logger.error(f"[VECTOR_STORE] Failed to add document: {str(e)}")
             raise
     
+    def add_documents(
+        self,
+        documents: List[str],
+        embeddings: Union[np.ndarray, List[List[float]]],
+        metadata: Optional[List[Dict]] = None
+    ) -> None:
+        """
+        Add a batch of documents with their embeddings
+        
+        Args:
+            documents: List of document texts
+            embeddings: One embedding per document (2-D float32 array or list of lists)
+            metadata: Optional list of metadata dicts
+        """
+        try:
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            if embeddings.ndim != 2 or len(embeddings) != len(documents):
+                raise ValueError(
+                    f"Expected {len(documents)} embeddings, got array of shape {embeddings.shape}"
+                )
+            if metadata is None:
+                metadata = [{} for _ in documents]
+            
+            self._is_cleared = False
+            
+            first_id = len(self.documents)
+            first_row = self._num_rows
+            rows = self._append_embeddings(
+                embeddings,
+                np.arange(first_id, first_id + len(documents), dtype=np.int64)
+            )
+            if self.index is not None:
+                self._add_to_index(rows)
+            
+            self._register_documents(
+                metadata,
+                np.arange(first_row, first_row + len(documents), dtype=np.int64)
+            )
+            self.documents.extend(documents)
+            self.metadata.extend(metadata)
+            
+            if self.index is None:
+                self._maybe_build_index()
+            # One ingested batch becomes one segment
+            self.flush()
+            
+            logger.debug(f"[VECTOR_STORE] Added {len(documents)} documents, total count: {len(self.documents)}")
+            
+        except Exception as e:
+            logger.error(f"[VECTOR_STORE] Failed to add documents: {str(e)}")
+            raise
+    
+    def _add_to_index(self, rows: np.ndarray) -> None:
+        """Add normalised rows to the FAISS index"""
+        if self._index_mapped:
+            self._unmap_index()
+        self.index.add(rows)
+    
+    def _unmap_index(self) -> None:
+        """
+        Copy memory-mapped IVF inverted lists into memory
+        
+        Lists mapped by load() are read-only (FAISS aborts on an add to
+        them), so this runs before the first add after a load.
+        """
+        ivf = faiss.extract_index_ivf(self.index)
+        mapped = ivf.invlists
+        lists = faiss.ArrayInvertedLists(ivf.nlist, ivf.code_size)
+        for list_no in range(ivf.nlist):
+            size = mapped.list_size(list_no)
+            if size:
+                lists.add_entries(list_no, size, mapped.get_ids(list_no), mapped.get_codes(list_no))
+        # The index takes ownership (and frees the mapped lists)
+        ivf.replace_invlists(lists, True)
+        lists.this.disown()
+        self._index_mapped = False
+    
+    def _maybe_build_index(self) -> None:
+        """Build the FAISS index once the store is large enough to benefit"""
+        if self.index_type == "none" or self._num_rows < self.min_index_vectors:
+            return
+        if self.index_type == "flat" and self._segments is not None:
+            # A flat index is a second full copy of the rows doing the same
+            # exact scan as the matrix search over the mapped segments
+            return
+        try:
+            self.build_index()
+        except Exception as e:
+            # Exact search keeps working without the index
+            logger.error(f"[VECTOR_STORE] FAISS index build failed: {str(e)}")
+            self.index = None
+    
+    def build_index(self) -> None:
+        """
+        (Re)build the FAISS index from the stored embeddings
+        
+        Rows are L2-normalised, so every index type uses inner product
+        and returns cosine similarities directly. With float16/int8
+        storage the matching FAISS scalar-quantizer variant is used so the
+        index stays as compact as the matrix.
+        """
+        if faiss is None:
+            raise RuntimeError("faiss is required for index building. Install with: pip install faiss-cpu")
+        if self._num_rows == 0:
+            self.index = None
+            return
+        
+        sq_type = {
+            "float16": faiss.ScalarQuantizer.QT_fp16,
+            "int8": faiss.ScalarQuantizer.QT_8bit,
+        }.get(self.storage_dtype)
+        
+        if self.index_type == "hnsw":
+            if sq_type is None:
+                index = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            else:
+                index = faiss.IndexHNSWSQ(self.dimension, sq_type, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = self.hnsw_ef_construction
+            index.hnsw.efSearch = self.hnsw_ef_search
+        elif self.index_type == "ivf":
+            # FAISS wants ~39 training points per centroid
+            nlist = max(1, min(self.ivf_nlist, self._num_rows // 39))
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            if sq_type is None:
+                index = faiss.IndexIVFFlat(quantizer, self.dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+            else:
+                index = faiss.IndexIVFScalarQuantizer(
+                    quantizer, self.dimension, nlist, sq_type, faiss.METRIC_INNER_PRODUCT
+                )
+            index.nprobe = min(self.ivf_nprobe, nlist)
+        elif sq_type is None:
+            index = faiss.IndexFlatIP(self.dimension)
+        else:
+            index = faiss.IndexScalarQuantizer(self.dimension, sq_type, faiss.METRIC_INNER_PRODUCT)
+        
+        if not index.is_trained:
+            # IVF trains its centroids; the scalar quantizers only learn value ranges
+            train_size = min(self._num_rows, index.nlist * 256 if self.index_type == "ivf" else 65536)
+            sample = np.random.default_rng(0).choice(self._num_rows, size=train_size, replace=False)
+            index.train(self._float32_rows(np.sort(sample)))
+        
+        # Block by block, so neither segments nor quantized storage need a
+        # full float32 copy in memory
+        for block in self._iter_float32():
+            index.add(np.ascontiguousarray(block))
+        self.index = index
+        self._index_mapped = False
+        logger.info(
+            f"[VECTOR_STORE] Built FAISS {self.index_type} index ({self.storage_dtype}) "
+            f"with {index.ntotal} vectors"
+        )
+    
+    def flush(self) -> None:
+        """
+        Seal documents and rows added since the last flush into a new segment
+        
+        No-op until the store is attached to a directory by load().
+        """
+        if self._segments is None:
+            return
+        first_doc, first_row = self._segments.docs, self._sealed_rows
+        if len(self.documents) == first_doc:
+            return
+        
+        tail_rows = self._num_rows - first_row
+        if tail_rows == 0:
+            tail = np.empty((0, self.dimension or 0), dtype=np.float32)
+        elif self.storage_dtype == "float32":
+            tail = self._matrix[:tail_rows]
+        else:
+            tail = self._exact[:tail_rows]
+        
+        self._segments.append(
+            [tail],
+            self._row_doc_ids[first_row:self._num_rows] if tail_rows else np.empty(0, dtype=np.int64),
+            first_doc,
+            self.documents[first_doc:],
+            self.metadata[first_doc:],
+            self.dimension
+        )
+        self.documents.seal()
+        self.metadata.seal()
+        
+        # The sealed rows are now served from the memory-mapped segment
+        if self.storage_dtype == "float32":
+            self._matrix = None
+            self._matrix_start = self._num_rows
+        else:
+            self._exact = None
+    
+    def save(self, directory: str = None) -> None:
+        """
+        Persist the store: seal pending rows into a segment and write the FAISS index
+        
+        Saving to a directory other than the one the store was loaded from
+        exports a snapshot there as a single segment.
+        
+        Args:
+            directory: Target directory (defaults to persist_directory)
+        """
+        directory = directory or self.persist_directory
+        
+        if self._segments is not None and os.path.abspath(directory) == os.path.abspath(self._segments.directory):
+            self.flush()
+            segments = self._segments
+        else:
+            segments = SegmentLog(directory)
+            if os.path.isdir(directory):
+                segments.remove_all()
+            segments.append(
+                self._iter_float32(),
+                self._row_doc_ids[:self._num_rows] if self._num_rows else np.empty(0, dtype=np.int64),
+                0,
+                list(self.documents),
+                list(self.metadata),
+                self.dimension
+            )
+        
+        index_path = os.path.join(directory, INDEX_FILE)
+        if self._index_mapped and segments is self._segments:
+            # Unchanged since load() mapped it from this very file
+            pass
+        elif self.index is not None:
+            if self._index_mapped:
+                # Writing mapped lists would only store a reference to them
+                self._unmap_index()
+            faiss.write_index(self.index, index_path + ".tmp")
+            os.replace(index_path + ".tmp", index_path)
+        elif os.path.exists(index_path):
+            os.remove(index_path)
+        segments.update_info({
+            "index_type": self.index_type if self.index is not None else "none",
+            "storage_dtype": self.storage_dtype,
+            "index_rows": self.index.ntotal if self.index is not None else 0
+        })
+        
+        logger.info(f"[VECTOR_STORE] Saved {len(self.documents)} documents to {directory}")
+    
+    def load(self, directory: str = None) -> bool:
+        """
+        Attach the store to a segment directory and map its contents
+        
+        Only the manifest and the row ids (8 bytes per row) are read:
+        segment rows are memory-mapped, texts and metadata are read from
+        their sidecars on first use, and the inverted metadata index is
+        built on the first filtered query. Quantized storage still encodes
+        every row once. Later adds are sealed into new segments there.
+        
+        With index type flat no FAISS index is kept; exact search runs over
+        the mapped rows. A saved ivf index is memory-mapped (its lists are
+        copied into memory before the next add); a saved hnsw index is read
+        in full. Either is reused when it matches the configured index type
+        and storage dtype, with rows sealed after the last save() added to
+        it, and rebuilt otherwise.
+        
+        Args:
+            directory: Source directory (defaults to persist_directory)
+            
+        Returns:
+            True if a saved store was found and loaded
+        """
+        directory = directory or self.persist_directory
+        
+        # Detach first so clear() does not delete the segments being loaded
+        self._segments = None
+        self.clear()
+        self._is_cleared = False
+        
+        segments = SegmentLog(directory)
+        row_doc_ids = segments.load()
+        self._segments = segments
+        self.documents = SidecarList(segments, "documents")
+        self.metadata = SidecarList(segments, "metadata")
+        if row_doc_ids is None:
+            return False
+        
+        self.dimension = segments.dimension
+        self._num_rows = len(row_doc_ids)
+        self._row_doc_ids = row_doc_ids
+        if self._num_rows:
+            self._quantizer = ScalarQuantizer(self.storage_dtype, self.dimension)
+            if self.storage_dtype == "float32":
+                self._matrix_start = self._num_rows
+            else:
+                codes = np.empty((self._num_rows, self.dimension), dtype=self._quantizer.dtype)
+                for offset, block in segments.blocks():
+                    for start in range(0, len(block), ROW_BLOCK):
+                        chunk = np.asarray(block[start:start + ROW_BLOCK])
+                        at = offset + start
+                        codes[at:at + len(chunk)] = self._quantizer.encode(chunk, codes[:at])
+                self._matrix = codes
+        
+        doc_rows = np.full(len(self.documents), -1, dtype=np.int64)
+        doc_rows[row_doc_ids] = np.arange(len(row_doc_ids), dtype=np.int64)
+        self._doc_rows = doc_rows
+        self._metadata_index = None
+        
+        index_path = os.path.join(directory, INDEX_FILE)
+        index_rows = segments.info.get("index_rows", 0)
+        if (
+            faiss is not None
+            and self.index_type in ("ivf", "hnsw")
+            and segments.info.get("index_type") == self.index_type
+            and segments.info.get("storage_dtype", "float32") == self.storage_dtype
+            and 0 < index_rows <= self._num_rows
+            and os.path.exists(index_path)
+        ):
+            # IO_FLAG_MMAP maps IVF inverted lists; other index types ignore it
+            self.index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP)
+            self._index_mapped = self.index_type == "ivf"
+            if index_rows < self._num_rows:
+                # Rows sealed after the last save()
+                self._add_to_index(self._float32_rows(np.arange(index_rows, self._num_rows)))
+        if self.index is None:
+            self._maybe_build_index()
+        
+        logger.info(
+            f"[VECTOR_STORE] Loaded {len(self.documents)} documents from {directory} "
+            f"(index: {self.index_type if self.index is not None else 'none'})"
+        )
+        return True
+    
     def get_documents_by_id(self, document_id: str) -> List[Dict]:
         """
         Retrieve all chunks for a specific document ID
@@ -74,14 +756,13 @@ class VectorStore:
             
         try:
             results = []
-            for i, meta in enumerate(self.metadata):
-                if meta.get("document_id") == document_id:
-                    results.append({
-                        "index": i,
-                        "metadata": meta,
-                        "document": self.documents[i],
-                        "content": self.documents[i]
-                    })
+            for i in self._matching_doc_ids({"document_id": document_id}).tolist():
+                results.append({
+                    "index": i,
+                    "metadata": self.metadata[i],
+                    "document": self.documents[i],
+                    "content": self.documents[i]
+                })
             
             logger.debug(f"[VECTOR_STORE] Found {len(results)} chunks for document_id: {document_id}")
             return results
@@ -90,26 +771,9 @@ class VectorStore:
             logger.error(f"[VECTOR_STORE] Failed to get documents by ID: {str(e)}")
             return []
     
-    def _should_filter(self, idx: int, filter_dict: Dict) -> bool:
-        """
-        Check whether a document should be filtered out
-        
-        Args:
-            idx: Document index
-            filter_dict: Filter criteria dictionary
-            
-        Returns:
-            True if document should be filtered out, False otherwise
-        """
-        meta = self.metadata[idx]
-        for key, value in filter_dict.items():
-            if meta.get(key) != value:
-                return True
-        return False
-    
     def search_by_embedding(
         self,
-        query_embedding: List[float],
+        query_embedding: Union[np.ndarray, List[float]],
         top_k: int = 5,
         filter: Optional[Dict] = None
     ) -> List[Dict]:
@@ -134,16 +798,24 @@ class VectorStore:
             if top_k is None:
                 top_k = int(os.getenv("TOP_K_RESULTS", "5"))
             
-            # Simple cosine similarity search (for stores without FAISS)
-            if self.index is None and len(self.embeddings) > 0:
-                return self._cosine_similarity_search(query_embedding, top_k, filter)
+            if self._num_rows == 0:
+                logger.warning("[VECTOR_STORE] No embeddings or index available for search")
+                return []
             
-            # FAISS-based search
-            if self.index is not None:
-                return self._faiss_search(query_embedding, top_k, filter)
+            # Resolve the filter to candidate rows via the metadata index
+            rows = None
+            if filter:
+                rows = self._doc_rows[self._matching_doc_ids(filter)]
+                rows = rows[rows >= 0]
+                if len(rows) == 0:
+                    return []
             
-            logger.warning("[VECTOR_STORE] No embeddings or index available for search")
-            return []
+            # Selective filters (and stores without FAISS) are scored exactly;
+            # broad filters and unfiltered queries go through the ANN index
+            if self.index is None or (rows is not None and len(rows) <= self.filter_exact_max):
+                return self._cosine_similarity_search(query_embedding, top_k, rows)
+            
+            return self._faiss_search(query_embedding, top_k, rows)
             
         except Exception as e:
             logger.error(f"[VECTOR_STORE] Search by embedding failed: {str(e)}")
@@ -151,81 +823,145 @@ class VectorStore:
     
     def _cosine_similarity_search(
         self,
-        query_embedding: List[float],
+        query_embedding: Union[np.ndarray, List[float]],
         top_k: int,
-        filter: Optional[Dict]
+        rows: Optional[np.ndarray] = None
     ) -> List[Dict]:
-        """Perform cosine similarity search without FAISS"""
-        if self._is_cleared:
+        """
+        Exact cosine similarity search without FAISS
+        
+        Rows are stored pre-normalised, so scoring is a single
+        matrix-vector product followed by an argpartition top-k
+        (block-decoded for float16/int8 storage, optionally re-ranked
+        against the float32 rows).
+        
+        Args:
+            query_embedding: Query vector embedding
+            top_k: Number of results to return
+            rows: Optional candidate matrix rows (from a filter); only
+                these are scored
+        """
+        if self._is_cleared or self._num_rows == 0:
             return []
-            
-        query_vec = np.array(query_embedding)
-        similarities = []
         
-        for i, doc_embedding in enumerate(self.embeddings):
-            # Apply filter if specified
-            if filter and self._should_filter(i, filter):
-                continue
-            
-            # Calculate cosine similarity
-            doc_vec = np.array(doc_embedding)
-            similarity = np.dot(query_vec, doc_vec) / (
-                np.linalg.norm(query_vec) * np.linalg.norm(doc_vec)
-            )
-            similarities.append((i, similarity))
+        query_vec = self._normalize(np.asarray(query_embedding, dtype=np.float32).ravel())
+        
+        # Asymmetric scoring: float32 query against the stored rows
+        similarities = self._score(query_vec, rows)
+        
+        top = self._top_k(similarities, self._rerank_fetch(top_k))
+        if rows is not None:
+            top_rows = rows[top]
+        else:
+            top_rows = top
+        top_scores = similarities[top]
+        
+        if self._reranks:
+            top_rows, top_scores = self._rerank(query_vec, top_rows, top_k)
         
-        # Sort by similarity (descending)
-        similarities.sort(key=lambda x: x[1], reverse=True)
+        return self._format_results(self._row_doc_ids[top_rows], top_scores)
+    
+    def _rerank_fetch(self, top_k: int) -> int:
+        """How many candidates to collect before the float32 re-rank"""
+        return top_k * self.rerank_factor if self._reranks else top_k
+    
+    def _rerank(self, query_vec: np.ndarray, rows: np.ndarray, top_k: int):
+        """
+        Rescore candidate rows against their float32 originals
         
-        # Get top_k results
+        Returns:
+            (rows, scores) of the best top_k candidates, best first
+        """
+        exact_scores = self._float32_rows(rows) @ query_vec.ravel()
+        best = self._top_k(exact_scores, top_k)
+        return rows[best], exact_scores[best]
+    
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """Positions of the k highest scores, best first"""
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        if k < len(scores):
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(len(scores))
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+    
+    def _format_results(self, doc_ids: np.ndarray, similarities: np.ndarray) -> List[Dict]:
+        """Build result dicts for the given document positions and scores"""
         results = []
-        for idx, similarity in similarities[:top_k]:
+        for doc_id, similarity in zip(doc_ids.tolist(), similarities.tolist()):
             results.append({
-                "document": self.documents[idx],
-                "content": self.documents[idx],
-                "metadata": self.metadata[idx],
+                "document": self.documents[doc_id],
+                "content": self.documents[doc_id],
+                "metadata": self.metadata[doc_id],
                 "score": float(similarity),
                 "distance": float(1 - similarity)
             })
-        
         return results
     
     def _faiss_search(
         self,
-        query_embedding: List[float],
+        query_embedding: Union[np.ndarray, List[float]],
         top_k: int,
-        filter: Optional[Dict]
+        rows: Optional[np.ndarray] = None
     ) -> List[Dict]:
-        """Perform FAISS-based similarity search"""
+        """
+        Perform FAISS-based similarity search
+        
+        For filtered queries the overfetch starts at what the filter's
+        selectivity predicts and widens until top_k allowed rows are found.
+        If the index still cannot surface enough of them (IVF probes, HNSW
+        ef), the candidate rows are scored exactly so the result set is
+        never short.
+        
+        Args:
+            query_embedding: Query vector embedding
+            top_k: Number of results to return
+            rows: Optional ascending candidate matrix rows (from a filter)
+        """
         if self._is_cleared:
             return []
-            
-        # Perform similarity search on the FAISS index
-        D, I = self.index.search(
-            np.array([query_embedding], dtype=np.float32),
-            k=min(top_k * 2, len(self.documents))  # Get extra for filtering
-        )
         
-        results = []
-        for i, idx in enumerate(I[0]):
-            if idx < len(self.documents):
-                # Apply filter if specified
-                if filter and self._should_filter(idx, filter):
-                    continue
-                
-                results.append({
-                    "document": self.documents[idx],
-                    "content": self.documents[idx],
-                    "metadata": self.metadata[idx],
-                    "score": float(1 - D[0][i]),  # Convert distance to similarity
-                    "distance": float(D[0][i])
-                })
-                
-                # Stop when we have enough results
-                if len(results) >= top_k:
-                    break
+        query_vec = self._normalize(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))
         
-        return results
+        if rows is None:
+            D, I = self.index.search(query_vec, min(self._rerank_fetch(top_k), self._num_rows))
+            # FAISS pads with -1 when it finds fewer than k neighbours
+            hits = I[0] >= 0
+            found, scores = I[0][hits], D[0][hits]
+            if self._reranks:
+                found, scores = self._rerank(query_vec, found, top_k)
+            # Inner product of unit vectors is the cosine similarity
+            return self._format_results(self._row_doc_ids[found], scores)
+        
+        wanted = min(top_k, len(rows))
+        selectivity = len(rows) / self._num_rows
+        fetch = min(self._num_rows, int(np.ceil(top_k / selectivity * self.filter_overfetch)))
+        
+        for _ in range(self.filter_max_rounds + 1):
+            D, I = self.index.search(query_vec, fetch)
+            found = I[0]
+            
+            # Membership test against the (ascending) candidate rows
+            pos = np.minimum(np.searchsorted(rows, found), len(rows) - 1)
+            allowed = np.flatnonzero((found >= 0) & (rows[pos] == found))
+            
+            if len(allowed) >= wanted:
+                allowed = allowed[:self._rerank_fetch(top_k)]
+                hit_rows, scores = found[allowed], D[0][allowed]
+                if self._reranks:
+                    hit_rows, scores = self._rerank(query_vec, hit_rows, top_k)
+                return self._format_results(self._row_doc_ids[hit_rows], scores)
+            if fetch >= self._num_rows:
+                break
+            fetch = min(self._num_rows, fetch * 4)
+        
+        logger.debug(
+            f"[VECTOR_STORE] Filtered ANN search found too few of {len(rows)} candidates, "
+            f"falling back to exact search"
+        )
+        return self._cosine_similarity_search(query_embedding, top_k, rows)
     
     def clear(self) -> None:
         """Clear all documents from the vector store"""
@@ -237,8 +973,22 @@ class VectorStore:
         # Clear all data structures
         self.documents.clear()
         self.metadata.clear()
-        self.embeddings.clear()
+        self._matrix = None
+        self._matrix_start = 0
+        self._quantizer = None
+        self._exact = None
+        self._row_doc_ids = None
+        self._num_rows = 0
+        self._doc_rows = np.empty(0, dtype=np.int64)
+        self._metadata_index = {}
+        self.dimension = None
         self.index = None
+        self._index_mapped = False
+        if self._segments is not None:
+            self._segments.remove_all()
+            index_path = os.path.join(self._segments.directory, INDEX_FILE)
+            if os.path.exists(index_path):
+                os.remove(index_path)
         
         # 🚨 THEN set the cleared flag
         self._is_cleared = True
@@ -253,7 +1003,7 @@ class VectorStore:
         verification_passed = (
             len(self.documents) == 0 and
             len(self.metadata) == 0 and
-            len(self.embeddings) == 0 and
+            self._num_rows == 0 and
             self.index is None
         )
         
@@ -261,7 +1011,7 @@ class VectorStore:
             logger.error(f"[VECTOR_STORE] ERROR: Clear verification failed!")
             logger.error(f"[VECTOR_STORE] documents: {len(self.documents)}, "
                         f"metadata: {len(self.metadata)}, "
-                        f"embeddings: {len(self.embeddings)}, "
+                        f"embeddings: {self._num_rows}, "
                         f"index: {self.index is not None}")
             raise Exception(f"Vector store clear failed: Verification failed")
         
@@ -280,6 +1030,10 @@ def get_vector_store() -> VectorStore:
     global _vector_store_instance
     if _vector_store_instance is None:
         _vector_store_instance = VectorStore()
+        try:
+            _vector_store_instance.load()
+        except Exception as e:
+            logger.error(f"[VECTOR_STORE] Failed to load persisted store: {str(e)}")
         logger.info("[VECTOR_STORE] Created new singleton instance")
     else:
         # Log current state for debugging
@@ -289,6 +1043,11 @@ def get_vector_store() -> VectorStore:
     
     return _vector_store_instance
 
+def save_vector_store() -> None:
+    """Persist the singleton instance, if one was created"""
+    if _vector_store_instance is not None:
+        _vector_store_instance.save()
+
 def reset_vector_store(force_new: bool = False) -> None:
     """Reset the vector store singleton (useful for testing)"""
     global _vector_store_instance
@@ -305,8 +1064,17 @@ def reset_vector_store(force_new: bool = False) -> None:
             # Manually clear all attributes to be sure
             _vector_store_instance.documents.clear()
             _vector_store_instance.metadata.clear()
-            _vector_store_instance.embeddings.clear()
+            _vector_store_instance._matrix = None
+            _vector_store_instance._matrix_start = 0
+            _vector_store_instance._segments = None
+            _vector_store_instance._quantizer = None
+            _vector_store_instance._exact = None
+            _vector_store_instance._row_doc_ids = None
+            _vector_store_instance._num_rows = 0
+            _vector_store_instance._doc_rows = np.empty(0, dtype=np.int64)
+            _vector_store_instance._metadata_index = {}
             _vector_store_instance.index = None
+            _vector_store_instance._index_mapped = False
             _vector_store_instance._is_cleared = True
             
             logger.info("[VECTOR_STORE] Manually cleared all attributes")
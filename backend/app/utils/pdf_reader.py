@@ -1,10 +1,232 @@
+"""
+===================================================================
+app/utils/pdf_reader.py - PDF text extraction
+===================================================================
+PDFs are split into PDF_TASKS_PER_WORKER page ranges per process of a
+pool of PDF_EXTRACT_WORKERS processes (default: one per core), so
+throughput scales with cores instead of running page after page on the
+one core of the API process. Each worker returns its page texts; the
+document is joined once, recording where every page starts and ends so
+chunks can cite their pages.
+
+A page that takes longer than PDF_PAGE_TIMEOUT seconds is skipped (and
+reported in `skipped`) instead of stalling the whole document.
+
+This module only depends on PyPDF2, so pool workers start without
+importing the rest of the app.
+"""
+import io
+import logging
+import math
+import os
+import signal
+import threading
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from multiprocessing import get_context
+from typing import List, NamedTuple, Optional, Tuple
+
 from PyPDF2 import PdfReader
 
+logger = logging.getLogger(__name__)
+
+
+class PageSpan(NamedTuple):
+    page: int   # 1-based page number
+    start: int  # character offsets in the joined text, end exclusive
+    end: int
+
+
+class PdfText(NamedTuple):
+    text: str
+    pages: List[PageSpan]           # pages with text, in order
+    page_count: int
+    skipped: List[Tuple[int, str]]  # (page, reason) of pages that failed or timed out
+
+
+class PageTimeout(Exception):
+    pass
+
+
+class PdfPoolError(RuntimeError):
+    """The extraction pool failed, not the document; extracting again may work"""
+
+
 def extract_text_from_file(file) -> str:
     """Extract text from uploaded PDF file."""
     reader = PdfReader(file)
-    text = ""
-    for page in reader.pages:
-        if page.extract_text():
-            text += page.extract_text()
-    return text
+    return "".join(page.extract_text() or "" for page in reader.pages)
+
+
+# ============================================
+# Workers
+# ============================================
+
+@contextmanager
+def _time_limit(seconds: float):
+    """Interrupt the block after `seconds` (SIGALRM; only in a process's main thread)"""
+    if not seconds or not hasattr(signal, "SIGALRM") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def expired(signum, frame):
+        raise PageTimeout()
+
+    previous = signal.signal(signal.SIGALRM, expired)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _open(source) -> PdfReader:
+    return PdfReader(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+
+
+def extract_page_range(source, first: int, last: int, page_timeout: float = 0) -> List[Tuple[int, str, Optional[str]]]:
+    """
+    Text of pages first..last-1 (0-based) of a PDF
+
+    Runs in pool workers, which parse the file themselves from its path
+    (or bytes) so only page texts cross the process boundary.
+
+    Returns:
+        (page index, text, error) per page; error is None on success
+    """
+    reader = _open(source)
+    results = []
+    for index in range(first, last):
+        try:
+            with _time_limit(page_timeout):
+                results.append((index, reader.pages[index].extract_text() or "", None))
+        except PageTimeout:
+            results.append((index, "", f"timed out after {page_timeout}s"))
+        except Exception as e:
+            results.append((index, "", str(e)))
+    return results
+
+
+# ============================================
+# Process pool
+# ============================================
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+
+
+def extract_workers() -> int:
+    return int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    """Pool shared by all extractions of this process, started on first use"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # spawn: forking an API process that runs torch / Chroma threads is not safe
+            _pdf_pool = ProcessPoolExecutor(max_workers=max(1, extract_workers()), mp_context=get_context("spawn"))
+            logger.info(f"[PDF] Started extraction pool with {max(1, extract_workers())} processes")
+        return _pdf_pool
+
+
+def shutdown_pdf_pool() -> None:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+            _pdf_pool = None
+
+
+def _reset_broken_pool() -> None:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        _pdf_pool = None
+
+
+# ============================================
+# Extraction
+# ============================================
+
+def extract_pdf(source, workers: int = None, tasks_per_worker: int = None, page_timeout: float = None) -> PdfText:
+    """
+    Extract the text of a PDF page by page, in parallel for large documents
+
+    Args:
+        source: File path, bytes or binary file object. A path is best: each
+            worker reads the file itself; bytes are sent to every task and a
+            file object is read into bytes first.
+        workers: Pool processes. Defaults to PDF_EXTRACT_WORKERS; 0 extracts
+            in this process (without page timeouts outside the main thread).
+        tasks_per_worker: Page ranges per pool process. Defaults to
+            PDF_TASKS_PER_WORKER; more evens out slow pages, fewer saves
+            re-opening the file (tens of ms per task for large documents).
+        page_timeout: Seconds per page. Defaults to PDF_PAGE_TIMEOUT; 0 disables it.
+
+    Returns:
+        PdfText with the joined text ("Page N:\\n<text>\\n\\n" per page with
+        text) and the offsets of each page in it
+    """
+    workers = extract_workers() if workers is None else workers
+    tasks_per_worker = tasks_per_worker or int(os.getenv("PDF_TASKS_PER_WORKER", "2"))
+    page_timeout = float(os.getenv("PDF_PAGE_TIMEOUT", "30")) if page_timeout is None else page_timeout
+
+    if not isinstance(source, (str, bytes, bytearray, os.PathLike)):
+        source = source.read()
+    if isinstance(source, os.PathLike):
+        source = os.fspath(source)
+    page_count = len(_open(source).pages)
+
+    if workers <= 0:
+        results = extract_page_range(source, 0, page_count, page_timeout)
+    else:
+        per_task = max(1, math.ceil(page_count / (workers * tasks_per_worker)))
+        pool = get_pdf_pool()
+        try:
+            futures = [
+                pool.submit(extract_page_range, source, first, min(first + per_task, page_count), page_timeout)
+                for first in range(0, page_count, per_task)
+            ]
+            results = [page for future in futures for page in future.result()]
+        except BrokenProcessPool as e:
+            # A worker died (e.g. out of memory on one page); the next extraction starts a new pool
+            _reset_broken_pool()
+            raise PdfPoolError("PDF extraction worker crashed") from e
+
+    parts: List[str] = []
+    pages: List[PageSpan] = []
+    skipped: List[Tuple[int, str]] = []
+    offset = 0
+    for index, page_text, error in results:
+        if error:
+            logger.warning(f"[PDF] Failed to extract text from page {index + 1}: {error}")
+            skipped.append((index + 1, error))
+            continue
+        if not page_text.strip():
+            logger.debug(f"[PDF] No text extracted from page {index + 1}")
+            continue
+        part = f"Page {index + 1}:\n{page_text}\n\n"
+        parts.append(part)
+        pages.append(PageSpan(index + 1, offset, offset + len(part)))
+        offset += len(part)
+
+    return PdfText("".join(parts), pages, page_count, skipped)
+
+
+def pages_for_span(pages: List[PageSpan], start: int, end: int, starts: List[int] = None) -> Optional[Tuple[int, int]]:
+    """
+    First and last page overlapping text[start:end], or None outside every page
+
+    Pass `starts` ([span.start for span in pages]) when looking up many spans.
+    """
+    if not pages or end <= start:
+        return None
+    starts = starts or [span.start for span in pages]
+    first = max(bisect_right(starts, start) - 1, 0)
+    last = max(bisect_right(starts, end - 1) - 1, 0)
+    if pages[last].end <= start:
+        return None
+    return pages[first].page, pages[last].page
@@ -0,0 +1,8 @@
+"""
+===================================================================
+benchmarks/ - Offline performance benchmarks for the RAG backend
+===================================================================
+Run from the backend directory, e.g.:
+    python -m benchmarks.bench_vectorstore_search
+    python -m benchmarks.vectorstore_harness
+"""
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Benchmark: chunking a large text
+
+Generates --mb MB of text (words and sentences) in a file and chunks it
+with each of the chunkers the app used to have and with
+app.services.chunking.iter_chunks:
+
+    old-chars         app/services/chunking.py chunk_text (500 / 50 chars)
+    old-words         app/core/dependencies.py chunk_text (800 / 100 words)
+    old-orchestrator  RAGOrchestrator._chunk_text (800 / 100 words)
+    old-rag-service   RAGService.chunk_text (500 / 50 words)
+    new-chars         iter_chunks, 500 / 50 chars, fixed
+    new-words         iter_chunks, 800 / 100 words, fixed
+    new-sentence      iter_chunks, 200 / 30 words, sentence
+    new-tokens        iter_chunks, 256 / 32 tokens (active embedding model tokenizer)
+    stream-chars      iter_chunks over the open file, 500 / 50 chars
+    stream-words      iter_chunks over the open file, 800 / 100 words
+    stream-sentence   iter_chunks over the open file, 200 / 30 words, sentence
+
+Each runs in its own process; the old and new-* ones read the whole file
+into a string first, as their callers do, the stream-* ones read it in
+CHUNK_STREAM_BLOCK_SIZE blocks and only count the chunks. Reports the
+time, the chunks produced and the growth of the process's peak resident
+set over its size before reading the file.
+
+Usage:
+    python -m benchmarks.bench_chunking
+    python -m benchmarks.bench_chunking --mb 100 --only old-words new-words stream-words
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Allow running as a plain script from the backend directory
+sys.path.append(BACKEND_DIR)
+
+IMPLEMENTATIONS = [
+    "old-chars", "old-words", "old-orchestrator", "old-rag-service",
+    "new-chars", "new-words", "new-sentence", "new-tokens",
+    "stream-chars", "stream-words", "stream-sentence",
+]
+
+
+# ============================================
+# The chunkers before app/services/chunking.iter_chunks
+# ============================================
+
+def old_chars(text, chunk_size=500, overlap=50):
+    chunks = []
+    start = 0
+    text_length = len(text)
+    while start < text_length:
+        end = start + chunk_size
+        chunk = text[start:end]
+        if chunk.strip():
+            chunks.append(chunk)
+        start += (chunk_size - overlap)
+    return chunks
+
+
+def old_words(text, chunk_size=800, chunk_overlap=100):
+    clean_text = text.strip()
+    words = clean_text.split()
+    if len(words) <= chunk_size:
+        return [{"content": clean_text, "word_count": len(words), "char_count": len(clean_text)}]
+    chunks = []
+    start = 0
+    while start < len(words):
+        end = start + chunk_size
+        chunk_words = words[start:end]
+        chunk_text = " ".join(chunk_words)
+        chunks.append({"content": chunk_text, "word_count": len(chunk_words), "char_count": len(chunk_text),
+                       "start_word": start, "end_word": min(end, len(words))})
+        if end >= len(words):
+            break
+        start = max(end - chunk_overlap, 0)
+    return chunks
+
+
+def old_orchestrator(text, chunk_size=800, chunk_overlap=100):
+    words = text.split()
+    if len(words) <= chunk_size:
+        return [" ".join(words)]
+    chunks = []
+    start = 0
+    while start < len(words):
+        end = start + chunk_size
+        chunks.append(" ".join(words[start:end]))
+        if end >= len(words):
+            break
+        start = end - chunk_overlap
+    return chunks
+
+
+def old_rag_service(text, chunk_size=500, overlap=50):
+    words = text.split()
+    chunks = []
+    for i in range(0, len(words), chunk_size - overlap):
+        chunk = " ".join(words[i:i + chunk_size])
+        if chunk.strip():
+            chunks.append(chunk.strip())
+    return chunks if chunks else [text]
+
+
+# ============================================
+# Measurement
+# ============================================
+
+def memory_mb(field: str) -> float:
+    """VmRSS / VmHWM of this process (Linux /proc)"""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def measure(name: str, path: str) -> dict:
+    """Run one chunker in this process"""
+    from app.services.chunking import get_tokenizer, iter_chunks
+
+    if name == "new-tokens":
+        # Loaded before measuring: a process loads it once
+        get_tokenizer()
+    new = {
+        "chars": dict(size=500, overlap=50),
+        "words": dict(size=800, overlap=100, unit="words"),
+        "sentence": dict(size=200, overlap=30, unit="words", strategy="sentence"),
+        "tokens": dict(size=256, overlap=32, unit="tokens"),
+    }
+    before = memory_mb("VmRSS")
+    start = time.perf_counter()
+    if name.startswith("stream-"):
+        with open(path, encoding="utf-8") as f:
+            count = sum(1 for _ in iter_chunks(f, **new[name.split("-", 1)[1]]))
+    else:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        if name.startswith("new-"):
+            count = len(list(iter_chunks(text, **new[name.split("-", 1)[1]])))
+        else:
+            chunker = {"old-chars": old_chars, "old-words": old_words,
+                       "old-orchestrator": old_orchestrator, "old-rag-service": old_rag_service}[name]
+            count = len(chunker(text))
+    return {"seconds": time.perf_counter() - start, "chunks": count, "peak_growth_mb": memory_mb("VmHWM") - before}
+
+
+def write_text(path: str, mb: float, seed: int) -> None:
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(20000)] + ["the", "of", "revenue", "contract", "policy", "clause"]
+    target = int(mb * 1024 * 1024)
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target:
+            paragraph = " ".join(
+                " ".join(rng.choices(vocabulary, k=rng.randint(5, 30))).capitalize() + rng.choice(".?!")
+                for _ in range(rng.randint(2, 8))
+            ) + "\n\n"
+            f.write(paragraph)
+            written += len(paragraph)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=20.0, help="size of the text")
+    parser.add_argument("--only", nargs="+", choices=IMPLEMENTATIONS, default=IMPLEMENTATIONS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--run", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--path", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        import logging
+        logging.disable(logging.CRITICAL)
+        print(json.dumps(measure(args.run, args.path)))
+        return
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "text.txt")
+        write_text(path, args.mb, args.seed)
+        print(f"{os.path.getsize(path) / 1024 / 1024:.0f} MB of text")
+        print(f"{'chunker':<18} {'seconds':>8} {'chunks':>9} {'peak RSS growth':>16}")
+        for name in args.only:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_chunking", "--run", name, "--path", path],
+                cwd=BACKEND_DIR, capture_output=True, text=True
+            )
+            if output.returncode != 0:
+                print(f"{name:<18} failed: {output.stderr.strip().splitlines()[-1] if output.stderr.strip() else output.returncode}")
+                continue
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            print(f"{name:<18} {result['seconds']:8.2f} {result['chunks']:9d} {result['peak_growth_mb']:14.0f}MB")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold start of the in-memory VectorStore from its segments
+
+Writes stores of increasing size to a temporary directory, then times a
+fresh VectorStore.load(), the first query and the first filtered query
+against it. load() reads only the manifest and the row ids, so it should
+stay nearly flat as the vector count grows; the first filtered query
+pays for building the metadata index from the sidecars.
+
+The store uses the configured index type (FAISS_INDEX_TYPE, flat by
+default) unless --index-type is given, so saved-index I/O is included.
+
+Usage:
+    python -m benchmarks.bench_cold_start
+    python -m benchmarks.bench_cold_start --sizes 100000 1000000 --dim 384
+    python -m benchmarks.bench_cold_start --index-type ivf
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Allow running as a plain script from the backend directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.vectorstore import VectorStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--batch", type=int, default=50_000, help="rows per ingested batch (one segment each)")
+    parser.add_argument("--index-type", default=None, help="FAISS index type (default: FAISS_INDEX_TYPE)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+
+    print(f"{'vectors':>10} {'segments':>9} {'disk MB':>9} {'load ms':>9} {'1st query ms':>13} {'1st filter ms':>14}")
+    for size in args.sizes:
+        directory = tempfile.mkdtemp(prefix="vector-segments-")
+        try:
+            store = VectorStore(index_type=args.index_type, persist_directory=directory)
+            store.load()
+            for start in range(0, size, args.batch):
+                count = min(args.batch, size - start)
+                store.add_documents(
+                    [f"chunk {start + i} " + "lorem ipsum dolor sit amet " * 20 for i in range(count)],
+                    rng.standard_normal((count, args.dim), dtype=np.float32),
+                    [{"document_id": f"doc-{(start + i) // 100}"} for i in range(count)]
+                )
+            store.save()
+            store._segments.wait_for_merge()
+            segments = len(store._segments.segments)
+            del store
+
+            disk = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+            start = time.perf_counter()
+            restored = VectorStore(index_type=args.index_type, persist_directory=directory)
+            restored.load()
+            load_ms = (time.perf_counter() - start) * 1000
+
+            query = rng.standard_normal(args.dim, dtype=np.float32)
+            start = time.perf_counter()
+            restored.search_by_embedding(query, top_k=5)
+            query_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            restored.search_by_embedding(query, top_k=5, filter={"document_id": "doc-0"})
+            filter_ms = (time.perf_counter() - start) * 1000
+
+            print(
+                f"{size:>10} {segments:>9} {disk / 1e6:>9.1f} {load_ms:>9.1f} "
+                f"{query_ms:>13.1f} {filter_ms:>14.1f}"
+            )
+            del restored
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
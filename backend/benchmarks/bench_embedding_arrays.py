@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark: handing upload embeddings to the vector stores as lists vs arrays
+
+Simulates the storage half of a large upload: --chunks embeddings of
+--dim floats, as they come out of EmbeddingService, are added to
+
+    memory   the in-memory VectorStore (app/services/vectorstore.py)
+    chroma   the Chroma VectorStore (app/core/dependencies.py), persisted
+             to a temporary directory
+
+two ways:
+
+    lists    embed_texts() returned .tolist() output and the store turned
+             it back into an array (memory) or passed the whole list to one
+             collection.add (chroma) - the previous behaviour
+    arrays   the float32 array is passed through; the Chroma store makes
+             lists per CHROMA_ADD_BATCH_SIZE batch at its client boundary
+
+Reports wall time (including the list conversion for "lists") and peak
+Python heap (tracemalloc, which also sees numpy buffers). Random vectors
+stand in for the model so only the hand-off is measured.
+
+Usage:
+    python -m benchmarks.bench_embedding_arrays
+    python -m benchmarks.bench_embedding_arrays --chunks 5000 --dim 768
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+# Allow running as a plain script from the backend directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.dependencies import VectorStore as ChromaVectorStore
+from app.services.vectorstore import VectorStore as MemoryVectorStore
+
+
+def measure(add):
+    """(seconds, peak MB above the starting heap) of one add"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    add()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)  # also chroma telemetry noise
+
+    rng = np.random.default_rng(args.seed)
+    documents = [f"chunk {i} " + "lorem ipsum " * 40 for i in range(args.chunks)]
+    metadatas = [{"document_id": "bench", "chunk_index": i} for i in range(args.chunks)]
+    ids = [f"bench_chunk_{i}" for i in range(args.chunks)]
+
+    def embeddings():
+        return rng.standard_normal((args.chunks, args.dim), dtype=np.float32)
+
+    print(f"{args.chunks} chunks x {args.dim} dimensions "
+          f"({args.chunks * args.dim * 4 / 1e6:.1f} MB of float32)")
+    print(f"{'store':<8} {'mode':<8} {'seconds':>8} {'peak MB':>8}")
+
+    for mode in ("lists", "arrays"):
+        vectors = embeddings()
+        store = MemoryVectorStore(index_type="none", persist_directory=tempfile.mkdtemp())
+        elapsed, peak = measure(
+            lambda: store.add_documents(documents, vectors.tolist() if mode == "lists" else vectors, metadatas)
+        )
+        print(f"{'memory':<8} {mode:<8} {elapsed:>8.3f} {peak:>8.1f}")
+
+    for mode in ("lists", "arrays"):
+        vectors = embeddings()
+        directory = tempfile.mkdtemp()
+        try:
+            store = ChromaVectorStore(persist_directory=directory, collection_name=f"bench_{mode}")
+            if mode == "lists":
+                add = lambda: store.collection.add(
+                    documents=documents, embeddings=vectors.tolist(), metadatas=metadatas, ids=ids
+                )
+            else:
+                add = lambda: store.add_documents(documents, vectors, metadatas, ids)
+            elapsed, peak = measure(add)
+            print(f"{'chroma':<8} {mode:<8} {elapsed:>8.3f} {peak:>8.1f}")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
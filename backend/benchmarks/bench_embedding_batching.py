@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark: concurrent single-text embedding with and without micro-batching
+
+Fires --concurrency asyncio tasks that each embed --requests short query
+strings through EmbeddingService.aembed_text, first with the batcher
+disabled (one forward pass per text, run in a thread) and then with it
+enabled. Reports texts/s, p50/p99 latency and the mean batch size.
+
+The embedding cache is disabled so every text reaches the model.
+
+Usage:
+    python -m benchmarks.bench_embedding_batching
+    python -m benchmarks.bench_embedding_batching --model ./models/all-MiniLM-L6-v2 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+# Allow running as a plain script from the backend directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+
+from app.core.dependencies import EmbeddingService
+
+
+async def run(service: EmbeddingService, texts, concurrency: int):
+    latencies = []
+    queue = asyncio.Queue()
+    for text in texts:
+        queue.put_nowait(text)
+
+    async def client():
+        while not queue.empty():
+            text = queue.get_nowait()
+            start = time.perf_counter()
+            await service.aembed_text(text)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - start, np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=None, help="sentence-transformers model (default: EMBEDDING_MODEL)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20, help="texts per concurrent client")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    words = ["admission", "deadline", "fee", "refund", "policy", "semester", "campus", "hostel",
+             "scholarship", "exam", "schedule", "library", "course", "transfer", "credit", "grade"]
+    texts = [" ".join(rng.choice(words, size=rng.integers(4, 16))) + f" #{i}"
+             for i in range(args.concurrency * args.requests)]
+
+    service = EmbeddingService(args.model)
+    batcher = service.batcher
+    service.embed_texts(texts[:8])  # warm up
+
+    print(f"{service.model_name}: {len(texts)} texts from {args.concurrency} concurrent clients")
+    print(f"{'mode':<12} {'texts/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'batch':>6}")
+    for mode in ("per-text", "micro-batch"):
+        service.batcher = batcher if mode == "micro-batch" else None
+        batches_before, texts_before = batcher.batches, batcher.texts
+        elapsed, latencies = asyncio.run(run(service, texts, args.concurrency))
+        batches = batcher.batches - batches_before
+        mean_batch = (batcher.texts - texts_before) / batches if batches else 1.0
+        print(f"{mode:<12} {len(texts) / elapsed:>9.1f} {np.percentile(latencies, 50):>8.2f} "
+              f"{np.percentile(latencies, 99):>8.2f} {mean_batch:>6.1f}")
+    batcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-worker embedding models vs the shared embedding sidecar
+
+Starts --workers worker processes, each with --concurrency coroutines
+awaiting aembed_text on distinct query strings (so the embedding cache
+does not help), in two deployments:
+
+    in-process   every worker builds its own EmbeddingService (the model
+                 is loaded once per worker)
+    sidecar      one app.services.embedding_server process holds the model;
+                 the workers use RemoteEmbeddingService over a Unix socket
+
+All workers load first and then start together. Reports total queries per
+second, per-query p50/p99 latency and memory: the resident set of every
+process involved (VmRSS, summed) and the per-worker share.
+
+Usage:
+    python -m benchmarks.bench_embedding_server
+    python -m benchmarks.bench_embedding_server --workers 4 --queries 200 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Allow running as a plain script from the backend directory
+sys.path.append(BACKEND_DIR)
+
+
+def rss_mb(pid: int) -> float:
+    """Resident set size of a process (Linux /proc)"""
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def worker(args) -> None:
+    """One API worker: load the service, wait for "go", run the queries"""
+    import logging
+    logging.disable(logging.WARNING)
+    from app.core.dependencies import get_embedding_service
+
+    service = get_embedding_service()
+    service.embed_text("warm up")
+    print("ready", flush=True)
+    sys.stdin.readline()
+
+    queries = [f"worker {args.worker_id} question {i} about the quarterly report" for i in range(args.queries)]
+    latencies = []
+
+    async def client(part):
+        for query in part:
+            start = time.perf_counter()
+            await service.aembed_text(query)
+            latencies.append(time.perf_counter() - start)
+
+    async def run():
+        await asyncio.gather(*(client(queries[i::args.concurrency]) for i in range(args.concurrency)))
+
+    asyncio.run(run())
+    print(json.dumps({"latencies": latencies, "rss_mb": rss_mb(os.getpid())}), flush=True)
+
+
+def run_deployment(args, sidecar: bool) -> dict:
+    env = dict(os.environ, EMBEDDING_CACHE_PERSIST="false")
+    env.pop("EMBEDDING_SERVER_SOCKET", None)
+    server = None
+    directory = tempfile.mkdtemp()
+    try:
+        if sidecar:
+            socket_path = os.path.join(directory, "embedding.sock")
+            server = subprocess.Popen(
+                [sys.executable, "-m", "app.services.embedding_server", "--socket", socket_path],
+                cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            deadline = time.perf_counter() + args.timeout
+            while not os.path.exists(socket_path):
+                if server.poll() is not None or time.perf_counter() > deadline:
+                    raise RuntimeError("embedding server did not start")
+                time.sleep(0.1)
+            env["EMBEDDING_SERVER_SOCKET"] = socket_path
+
+        workers = [
+            subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.bench_embedding_server", "--child",
+                 "--worker-id", str(i), "--queries", str(args.queries), "--concurrency", str(args.concurrency)],
+                cwd=BACKEND_DIR, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+            )
+            for i in range(args.workers)
+        ]
+        for process in workers:
+            if process.stdout.readline().strip() != "ready":
+                raise RuntimeError("worker failed to start")
+
+        start = time.perf_counter()
+        for process in workers:
+            process.stdin.write("go\n")
+            process.stdin.flush()
+        results = [json.loads(process.stdout.readline()) for process in workers]
+        elapsed = time.perf_counter() - start
+        server_mb = rss_mb(server.pid) if server else 0.0
+        for process in workers:
+            process.wait()
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+        for name in os.listdir(directory):
+            os.unlink(os.path.join(directory, name))
+        os.rmdir(directory)
+
+    latencies = np.array([latency for result in results for latency in result["latencies"]]) * 1000
+    worker_mb = [result["rss_mb"] for result in results]
+    return {
+        "qps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "worker_mb": float(np.mean(worker_mb)),
+        "total_mb": sum(worker_mb) + server_mb
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queries", type=int, default=100, help="queries per worker")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent queries per worker")
+    parser.add_argument("--timeout", type=float, default=120.0, help="sidecar start timeout (seconds)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-id", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        worker(args)
+        return
+
+    print(f"{args.workers} workers x {args.queries} queries, {args.concurrency} concurrent per worker")
+    print(f"{'deployment':<12} {'qps':>8} {'p50 ms':>8} {'p99 ms':>8} {'MB/worker':>10} {'total MB':>9}")
+    for sidecar in (False, True):
+        result = run_deployment(args, sidecar)
+        print(f"{'sidecar' if sidecar else 'in-process':<12} {result['qps']:>8.1f} {result['p50_ms']:>8.1f} "
+              f"{result['p99_ms']:>8.1f} {result['worker_mb']:>10.0f} {result['total_mb']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark: is the event loop still serving requests during a large upload?
+
+Embeds --chunks upload-sized texts two ways while, on the same event loop,
+a probe task wakes every 10 ms (standing in for other HTTP requests) and
+a client embeds a query every 50 ms:
+
+    blocking   embed_texts() called directly in the coroutine (the old
+               upload path)
+    executor   await aembed_texts() on the embedding pool
+
+Reports the worst and p99 event-loop lag and the query latency seen while
+the upload runs. With the executor the lag should stay near zero: the
+script exits with status 1 if the executor's worst lag exceeds
+--max-lag-ms.
+
+The embedding cache is disabled so every text reaches the model.
+
+Usage:
+    python -m benchmarks.bench_event_loop_latency
+    python -m benchmarks.bench_event_loop_latency --model ./models/all-MiniLM-L6-v2 --chunks 2000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+# Allow running as a plain script from the backend directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+
+from app.core.dependencies import EmbeddingService
+
+PROBE_INTERVAL = 0.010
+QUERY_INTERVAL = 0.050
+
+
+async def measure(service: EmbeddingService, texts, mode: str):
+    lags, query_latencies = [], []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(PROBE_INTERVAL)
+            lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+    async def queries():
+        i = 0
+        while not done.is_set():
+            start = time.perf_counter()
+            await service.aembed_text(f"what is the refund deadline {i}")
+            query_latencies.append(time.perf_counter() - start)
+            i += 1
+            await asyncio.sleep(QUERY_INTERVAL)
+
+    async def upload():
+        await asyncio.sleep(0.05)  # let the probes start
+        if mode == "blocking":
+            service.embed_texts(texts)
+        else:
+            await service.aembed_texts(texts)
+        done.set()
+
+    start = time.perf_counter()
+    await asyncio.gather(probe(), queries(), upload())
+    return time.perf_counter() - start, np.array(lags) * 1000, np.array(query_latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=None, help="sentence-transformers model (default: EMBEDDING_MODEL)")
+    parser.add_argument("--chunks", type=int, default=1000, help="texts in the simulated upload")
+    parser.add_argument("--words", type=int, default=150, help="words per text")
+    parser.add_argument("--max-lag-ms", type=float, default=50.0,
+                        help="fail if the executor mode's worst event-loop lag exceeds this")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    words = ["admission", "deadline", "fee", "refund", "policy", "semester", "campus", "hostel",
+             "scholarship", "exam", "schedule", "library", "course", "transfer", "credit", "grade"]
+    texts = [" ".join(rng.choice(words, size=args.words)) + f" #{i}" for i in range(args.chunks)]
+
+    service = EmbeddingService(args.model)
+    service.embed_texts(texts[:8])  # warm up
+
+    print(f"{service.model_name}: {args.chunks} x {args.words}-word upload, "
+          f"{service.num_workers} embedding worker(s)")
+    print(f"{'mode':<10} {'upload s':>9} {'max lag ms':>11} {'p99 lag ms':>11} {'queries':>8} {'query p50 ms':>13}")
+    failed = False
+    for mode in ("blocking", "executor"):
+        elapsed, lags, query_ms = asyncio.run(measure(service, texts, mode))
+        print(f"{mode:<10} {elapsed:>9.2f} {lags.max():>11.1f} {np.percentile(lags, 99):>11.1f} "
+              f"{len(query_ms):>8} {np.percentile(query_ms, 50):>13.1f}")
+        if mode == "executor" and lags.max() > args.max_lag_ms:
+            print(f"  FAIL: executor stalled the event loop for {lags.max():.1f} ms (limit {args.max_lag_ms:g} ms)")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
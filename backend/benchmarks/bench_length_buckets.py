@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark: length-bucketed batching in EmbeddingService
+
+Embeds a mixed-length corpus (log-normal word counts, like chunks of a
+PDF with headings, tables and body text) four ways:
+
+    upload order   slices of 64 texts in upload order, encoded with the
+                   default batch size (the previous aembed_texts path)
+    one call       a single model.encode over everything
+    bucketed       EmbeddingService._encode: tokenized once, sorted by
+                   token length, token-budgeted batches, scattered back
+    aembed_texts   the upload path: character-length ordered slices of
+                   EMBEDDING_EXECUTOR_BATCH_SIZE, each bucketed as above
+
+and reports wall time, texts/s and how many of the tokens fed to the
+model were padding. Results are checked to be the same embeddings.
+
+The embedding cache is disabled so every text reaches the model.
+
+Usage:
+    python -m benchmarks.bench_length_buckets
+    python -m benchmarks.bench_length_buckets --model ./models/all-MiniLM-L6-v2 --texts 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+# Allow running as a plain script from the backend directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+
+from app.core.dependencies import EmbeddingService
+
+
+def padded_tokens(lengths: np.ndarray, batches) -> int:
+    """Tokens the model processes when each batch is padded to its longest text"""
+    return int(sum(len(batch) * lengths[batch].max() for batch in batches if len(batch)))
+
+
+def encode_batches(lengths: np.ndarray, texts, batch_size: int = 32):
+    """Batches sentence-transformers forms for one encode call (sorted by character length)"""
+    order = np.argsort([-len(text) for text in texts], kind="stable")
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=None, help="sentence-transformers model (default: EMBEDDING_MODEL)")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--median-words", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    words = ["admission", "deadline", "fee", "refund", "policy", "semester", "campus", "hostel",
+             "scholarship", "exam", "schedule", "library", "course", "transfer", "credit", "grade"]
+    counts = np.clip(rng.lognormal(np.log(args.median_words), 0.9, args.texts).astype(int), 1, 400)
+    texts = [" ".join(rng.choice(words, size=count)) for count in counts]
+
+    service = EmbeddingService(args.model)
+    service.embed_texts(texts[:8])  # warm up
+    lengths = np.array([len(ids) for ids in service._tokenize(texts)["input_ids"]])
+    useful = int(lengths.sum())
+
+    modes = {}
+
+    start = time.perf_counter()
+    upload_order = np.concatenate([service._model_encode(texts[i:i + 64]) for i in range(0, len(texts), 64)])
+    batches = [
+        slice_start + batch
+        for slice_start in range(0, len(texts), 64)
+        for batch in encode_batches(lengths[slice_start:slice_start + 64], texts[slice_start:slice_start + 64])
+    ]
+    modes["upload order"] = (time.perf_counter() - start, padded_tokens(lengths, batches), upload_order)
+
+    start = time.perf_counter()
+    one_call = service._model_encode(texts)
+    modes["one call"] = (time.perf_counter() - start, padded_tokens(lengths, encode_batches(lengths, texts)), one_call)
+
+    start = time.perf_counter()
+    bucketed = service._encode(texts)
+    modes["bucketed"] = (time.perf_counter() - start, padded_tokens(lengths, service._length_buckets(lengths)), bucketed)
+
+    start = time.perf_counter()
+    upload = np.array(asyncio.run(service.aembed_texts(texts)), dtype=np.float32)
+    modes["aembed_texts"] = (time.perf_counter() - start, None, upload)
+
+    print(f"{service.model_name}: {args.texts} texts, {useful} tokens "
+          f"(median {int(np.median(lengths))}, max {lengths.max()})")
+    print(f"{'mode':<14} {'seconds':>8} {'texts/s':>9} {'padding':>8} {'max |diff|':>11}")
+    for name, (elapsed, padded, embeddings) in modes.items():
+        diff = float(np.abs(embeddings - upload_order).max())
+        padding = f"{1 - useful / padded:.1%}" if padded else "-"
+        print(f"{name:<14} {elapsed:>8.2f} {args.texts / elapsed:>9.1f} {padding:>8} {diff:>11.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark: BM25 lexical index build, keyword query latency and deletes
+
+Synthetic chunks of random words, each carrying a unique invoice-style
+identifier ("INV-1234") - the kind of exact token dense retrieval misses.
+Reports indexing throughput, posting-array memory, p50/p99 latency of the
+keyword fast path, and the cost of deleting documents.
+
+Usage:
+    python -m benchmarks.bench_lexical_search
+    python -m benchmarks.bench_lexical_search --chunks 200000 --words 120
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Allow running as a plain script from the backend directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.lexical_index import LexicalIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--words", type=int, default=80, help="words per chunk")
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--chunks-per-doc", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vocab = np.array([f"term{i}" for i in range(args.vocab)])
+    # Zipf-like word frequencies, as in real text
+    weights = 1.0 / np.arange(1, args.vocab + 1)
+    weights /= weights.sum()
+
+    index = LexicalIndex()
+    batch = 1000
+    build_s = 0.0
+    for start in range(0, args.chunks, batch):
+        count = min(batch, args.chunks - start)
+        words = rng.choice(vocab, size=(count, args.words), p=weights)
+        texts = [" ".join(row) + f" INV-{start + i}" for i, row in enumerate(words)]
+        ids = [f"chunk-{start + i}" for i in range(count)]
+        metadata = [{"document_id": f"doc-{(start + i) // args.chunks_per_doc}"} for i in range(count)]
+
+        t0 = time.perf_counter()
+        index.add_many(ids, texts, metadata)
+        build_s += time.perf_counter() - t0
+
+    postings = sum(len(slots) for slots, _ in index._postings.values())
+    print(f"Indexed {args.chunks} chunks in {build_s:.1f}s ({args.chunks / build_s:,.0f} chunks/s), "
+          f"{len(index._postings):,} terms, {postings:,} postings ({postings * 8 / 1e6:.0f} MB of arrays)")
+
+    query_sets = {
+        "identifier": [f"INV-{i}" for i in rng.integers(0, args.chunks, args.queries)],
+        "2 rare words": [f"{a} {b}" for a, b in rng.choice(vocab[args.vocab // 2:], size=(args.queries, 2))],
+        "2 common words": [f"{a} {b}" for a, b in rng.choice(vocab[:100], size=(args.queries, 2))],
+    }
+    print(f"{'query':<16} {'p50 ms':>8} {'p99 ms':>8} {'hit@1':>6}")
+    for name, queries in query_sets.items():
+        latencies, hits = [], 0
+        for query in queries:
+            t0 = time.perf_counter()
+            results = index.search(query, top_k=5)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if name == "identifier" and results and results[0]["id"] == f"chunk-{query[4:]}":
+                hits += 1
+        hit_rate = f"{hits / len(queries):.2f}" if name == "identifier" else "-"
+        print(f"{name:<16} {np.percentile(latencies, 50):>8.3f} {np.percentile(latencies, 99):>8.3f} {hit_rate:>6}")
+
+    num_docs = args.chunks // args.chunks_per_doc
+    t0 = time.perf_counter()
+    for doc in range(num_docs // 2):
+        index.delete_document(f"doc-{doc}")
+    delete_s = time.perf_counter() - t0
+    print(f"Deleted {num_docs // 2} documents in {delete_s:.2f}s (includes compaction), {len(index)} chunks left")
+
+
+if __name__ == "__main__":
+    main()
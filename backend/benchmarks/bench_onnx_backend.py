@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark: EmbeddingService backends (torch vs ONNX Runtime vs ONNX int8)
+
+Embeds the same mixed-length corpus and a set of short queries with each
+backend and reports:
+
+    texts/s       corpus throughput through embed_texts (length bucketed)
+    query p50 ms  single-query latency
+    min / mean    cosine similarity of each text's (and query's) embedding
+    cosine        to the torch embedding of the same text
+    max drift     1 - min cosine, the value checked against the bound
+    top-10        overlap of each query's top 10 corpus neighbours with
+                  the torch top 10
+
+It doubles as the equivalence check: it exits with status 1 if the
+cosine drift (1 - cosine to torch) of any corpus text or query exceeds
+--max-drift-fp32 for the float32 graph or --max-drift-int8 for the int8
+graph, or if a backend did not load the graph it was asked for.
+
+The ONNX model is exported (with an int8 copy) into --onnx-dir first if
+that directory holds no export yet. The embedding cache is disabled so
+every text reaches the model.
+
+Usage:
+    python -m benchmarks.bench_onnx_backend
+    python -m benchmarks.bench_onnx_backend --model ./models/all-MiniLM-L6-v2 --onnx-dir ./models/all-MiniLM-L6-v2-onnx --texts 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Allow running as a plain script from the backend directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+os.environ["EMBEDDING_MICROBATCH_ENABLED"] = "false"
+
+from app.core.dependencies import EmbeddingService
+from app.services.onnx_embedder import CONFIG_FILE, QUANTIZED_MODEL_FILE, export_model
+
+
+def make_service(model_name: str, backend: str, onnx_dir: str, quantized: bool = False) -> EmbeddingService:
+    os.environ["EMBEDDING_BACKEND"] = backend
+    os.environ["EMBEDDING_ONNX_DIR"] = onnx_dir
+    os.environ["EMBEDDING_ONNX_QUANTIZED"] = "true" if quantized else "false"
+    return EmbeddingService(model_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
+    parser.add_argument("--onnx-dir", default=os.getenv("EMBEDDING_ONNX_DIR", "./models/onnx"))
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--median-words", type=int, default=60)
+    parser.add_argument("--max-drift-fp32", "--max-drift", dest="max_drift_fp32", type=float, default=1e-4,
+                        help="max 1 - cosine for the float32 ONNX graph")
+    parser.add_argument("--max-drift-int8", type=float, default=0.02, help="max 1 - cosine for int8 ONNX")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config_path = os.path.join(args.onnx_dir, CONFIG_FILE)
+    if not os.path.exists(config_path) or not os.path.exists(os.path.join(args.onnx_dir, QUANTIZED_MODEL_FILE)):
+        print(f"Exporting {args.model} to {args.onnx_dir} ...")
+        export_model(args.model, args.onnx_dir, quantize=True)
+
+    rng = np.random.default_rng(args.seed)
+    words = ["admission", "deadline", "fee", "refund", "policy", "semester", "campus", "hostel",
+             "scholarship", "exam", "schedule", "library", "course", "transfer", "credit", "grade"]
+    counts = np.clip(rng.lognormal(np.log(args.median_words), 0.9, args.texts).astype(int), 1, 400)
+    texts = [" ".join(rng.choice(words, size=count)) for count in counts]
+    queries = [" ".join(rng.choice(words, size=rng.integers(3, 9))) for _ in range(args.queries)]
+
+    backends = {
+        "torch": ("torch", False, None),
+        "onnx": ("onnx", False, args.max_drift_fp32),
+        "onnx-int8": ("onnx", True, args.max_drift_int8)
+    }
+    reference = None
+    failed = False
+    print(f"{args.model}: {args.texts} texts (median {args.median_words} words), {args.queries} queries")
+    print(f"{'backend':<10} {'texts/s':>9} {'query p50 ms':>13} {'min cosine':>11} {'mean cosine':>12} "
+          f"{'max drift':>10} {'top-10':>7}")
+    for name, (backend, quantized, max_drift) in backends.items():
+        service = make_service(args.model, backend, args.onnx_dir, quantized)
+        if service.backend != backend or getattr(service.model, "quantized", False) != quantized:
+            print(f"  FAIL: {name} did not load the {'int8' if quantized else 'float32'} {backend} model")
+            failed = True
+            continue
+        service.embed_texts(texts[:8])  # warm up
+
+        start = time.perf_counter()
+        corpus = np.array(service.embed_texts(texts), dtype=np.float32)
+        throughput = len(texts) / (time.perf_counter() - start)
+
+        latencies, query_vectors = [], []
+        for query in queries:
+            start = time.perf_counter()
+            query_vectors.append(service.embed_text(query))
+            latencies.append((time.perf_counter() - start) * 1000)
+        query_vectors = np.array(query_vectors, dtype=np.float32)
+        neighbours = np.argsort(-(query_vectors @ corpus.T), axis=1)[:, :10]
+        service.executor.shutdown()
+
+        # Batched corpus and single-query vectors go through different paths; check both
+        vectors = np.concatenate([corpus, query_vectors])
+        if reference is None:
+            reference = (vectors, neighbours)
+        ref_vectors, ref_neighbours = reference
+        cosine = (vectors * ref_vectors).sum(axis=1) / (
+            np.linalg.norm(vectors, axis=1) * np.linalg.norm(ref_vectors, axis=1)
+        )
+        drift = 1 - cosine.min()
+        overlap = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(neighbours, ref_neighbours)])
+        print(f"{name:<10} {throughput:>9.1f} {np.percentile(latencies, 50):>13.2f} "
+              f"{cosine.min():>11.6f} {cosine.mean():>12.6f} {drift:>10.2e} {overlap:>7.2f}")
+        if max_drift is not None and drift > max_drift:
+            print(f"  FAIL: {name} drift {drift:.2e} exceeds {max_drift:.0e}")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark: PDF text extraction, sequential vs process pool
+
+Writes a --pages page PDF of generated text (no PDF library needed) and
+extracts it with:
+
+    sequential   the previous loop: PdfReader page by page on one core,
+                 text += "Page N:..." per page
+    pool N       app.utils.pdf_reader.extract_pdf with N worker processes
+                 (the pool is started and warmed up before timing)
+
+Reports the time of each, the speed-up over sequential, and whether the
+texts match. Throughput grows with --workers up to the number of cores.
+
+Usage:
+    python -m benchmarks.bench_pdf_extraction
+    python -m benchmarks.bench_pdf_extraction --pages 2000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# Allow running as a plain script from the backend directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def write_pdf(path: str, pages: int, lines: int, seed: int) -> None:
+    """A PDF with `lines` lines of random words per page, in Helvetica"""
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(3000)] + ["revenue", "quarter", "contract", "clause", "policy"]
+    offsets = []
+    out = bytearray(b"%PDF-1.4\n")
+
+    def add(body: bytes) -> None:
+        offsets.append(len(out))
+        out.extend(f"{len(offsets)} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    # 1 catalog, 2 page tree, 3 font, then a page and its content stream per page
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(pages))
+    add(b"<< /Type /Catalog /Pages 2 0 R >>")
+    add(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+    add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i in range(pages):
+        text = [f"BT /F1 9 Tf 40 800 Td 11 TL (Page {i + 1} heading) Tj"]
+        for _ in range(lines):
+            text.append(f"T* ({' '.join(rng.choices(vocabulary, k=12))}) Tj")
+        stream = ("\n".join(text) + " ET").encode()
+        add(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode())
+        add(f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+
+    xref = len(out)
+    out.extend(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode())
+    out.extend("".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode())
+    out.extend(f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def sequential(path: str) -> str:
+    """The extraction loop before the process pool"""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(path)
+    text = ""
+    for page_num, page in enumerate(reader.pages):
+        page_text = page.extract_text() or ""
+        if page_text.strip():
+            text += f"Page {page_num + 1}:\n{page_text}\n\n"
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--lines", type=int, default=60, help="lines of text per page")
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="pool sizes to time (default: 1 and the number of cores)")
+    parser.add_argument("--tasks-per-worker", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.WARNING)
+    from app.utils import pdf_reader
+
+    workers = args.workers or sorted({1, os.cpu_count() or 1})
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "bench.pdf")
+        write_pdf(path, args.pages, args.lines, args.seed)
+        print(f"{args.pages} pages, {os.path.getsize(path) / 1e6:.1f} MB, {os.cpu_count()} cores")
+
+        start = time.perf_counter()
+        expected = sequential(path)
+        baseline = time.perf_counter() - start
+        print(f"{'sequential':<12} {baseline:8.2f}s  {args.pages / baseline:7.0f} pages/s")
+
+        for count in workers:
+            os.environ["PDF_EXTRACT_WORKERS"] = str(count)
+            pdf_reader.shutdown_pdf_pool()
+            # Start the processes (and their imports) before timing
+            pool = pdf_reader.get_pdf_pool()
+            list(pool.map(pdf_reader.extract_page_range, [path] * count * 2, [0] * count * 2, [1] * count * 2))
+            start = time.perf_counter()
+            result = pdf_reader.extract_pdf(path, workers=count, tasks_per_worker=args.tasks_per_worker)
+            elapsed = time.perf_counter() - start
+            print(f"{'pool ' + str(count):<12} {elapsed:8.2f}s  {args.pages / elapsed:7.0f} pages/s  "
+                  f"x{baseline / elapsed:4.1f}  text matches: {result.text == expected}  "
+                  f"page spans: {len(result.pages)}")
+        pdf_reader.shutdown_pdf_pool()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
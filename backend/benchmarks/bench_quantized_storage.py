@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory and recall of the VectorStore storage dtypes
+
+Loads the same corpus into in-memory VectorStores with float32, float16
+and int8 storage (each with and without the float32 re-rank) and reports
+matrix memory, recall@k against exact float32 search, and query latency.
+
+Exact search is used (no FAISS index) so the numbers isolate the cost of
+quantization itself.
+
+Usage:
+    python -m benchmarks.bench_quantized_storage
+    python -m benchmarks.bench_quantized_storage --vectors 500000 --rerank-factor 4
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Allow running as a plain script from the backend directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.vectorstore import VectorStore
+
+
+def build_store(vectors: np.ndarray, storage_dtype: str, rerank_factor: int) -> VectorStore:
+    """Load vectors into a fresh exact-search VectorStore"""
+    os.environ["VECTOR_RERANK_FACTOR"] = str(rerank_factor)
+    store = VectorStore(index_type="none", storage_dtype=storage_dtype)
+    batch = 50_000
+    for start in range(0, len(vectors), batch):
+        chunk = vectors[start:start + batch]
+        store.add_documents([""] * len(chunk), chunk, [{"row": start + i} for i in range(len(chunk))])
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = rng.standard_normal((args.vectors, args.dim), dtype=np.float32)
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+    baseline = build_store(vectors, "float32", 0)
+    truth = [
+        {r["metadata"]["row"] for r in baseline.search_by_embedding(q, top_k=args.top_k)}
+        for q in queries
+    ]
+    del baseline
+
+    # What the old List[List[float]] storage cost: one list plus one float object per value
+    list_bytes = args.vectors * (sys.getsizeof([0.0] * args.dim) + args.dim * sys.getsizeof(1.0))
+    print(f"{args.vectors} x {args.dim} vectors, List[List[float]] ~ {list_bytes / 1e6:.0f} MB")
+    print(f"{'storage':<10} {'rerank':>7} {'matrix MB':>10} {'total MB':>9} {'recall@k':>9} {'ms/query':>9}")
+
+    for storage_dtype in ("float32", "float16", "int8"):
+        for rerank_factor in ((0,) if storage_dtype == "float32" else (0, args.rerank_factor)):
+            store = build_store(vectors, storage_dtype, rerank_factor)
+            matrix_bytes = store._matrix[:store._num_rows].nbytes
+            total_bytes = matrix_bytes + (store._exact[:store._num_rows].nbytes if store._exact is not None else 0)
+
+            start = time.perf_counter()
+            results = [store.search_by_embedding(q, top_k=args.top_k) for q in queries]
+            ms = (time.perf_counter() - start) / len(queries) * 1000
+
+            recall = np.mean([
+                len({r["metadata"]["row"] for r in found} & expected) / args.top_k
+                for found, expected in zip(results, truth)
+            ])
+            print(
+                f"{storage_dtype:<10} {rerank_factor or '-':>7} {matrix_bytes / 1e6:>10.1f} "
+                f"{total_bytes / 1e6:>9.1f} {recall:>9.3f} {ms:>9.2f}"
+            )
+            del store
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark: query availability while re-embedding with a new model
+
+Fills a throwaway SQLite database and Chroma directory with --chunks
+chunks embedded by --old-model, then starts a re-embedding job
+(app.services.embedding_registry) to --new-model while --concurrency
+coroutines keep querying the way the coordinator does (embed the query,
+search the active collection, both under the switch gate). Reports:
+
+    re-embedding throughput and how long the switch held queries
+    query latency p50/p99/max before, during and after the job
+    failed queries, and queries whose vector did not match the collection
+    the vectors in the new collection vs the chunks in the table
+
+Usage:
+    python -m benchmarks.bench_reembedding --new-model BAAI/bge-small-en-v1.5
+    python -m benchmarks.bench_reembedding --new-model ./models/e5-small --chunks 5000
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Allow running as a plain script from the backend directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentiles(latencies) -> str:
+    if not latencies:
+        return "no queries"
+    values = np.array(latencies) * 1000
+    return (f"{len(values):>6} queries  p50 {np.percentile(values, 50):7.1f} ms  "
+            f"p99 {np.percentile(values, 99):7.1f} ms  max {values.max():7.1f} ms")
+
+
+async def run(args) -> None:
+    from app.core.config import SessionLocal, engine
+    from app.core.dependencies import get_embedding_service, get_vectorstore
+    from app.models.rag_model import Document, DocumentChunk
+    from app.services.embedding_registry import get_switch_gate, start_reembedding
+
+    Document.metadata.create_all(engine, tables=[Document.__table__, DocumentChunk.__table__])
+    rng = random.Random(args.seed)
+    vocabulary = [f"term{i}" for i in range(5000)]
+    texts = [" ".join(rng.choices(vocabulary, k=args.words)) for _ in range(args.chunks)]
+    ids = [f"chunk-{i:07d}" for i in range(args.chunks)]
+
+    db = SessionLocal()
+    db.add(Document(id="doc-0", filename="bench.txt", status="completed", chunks_count=args.chunks))
+    db.add_all(DocumentChunk(id=chunk_id, document_id="doc-0", content=text, chunk_index=i, meta_data={})
+               for i, (chunk_id, text) in enumerate(zip(ids, texts)))
+    db.commit()
+    db.close()
+
+    service = get_embedding_service()
+    vector_store = get_vectorstore()
+    start = time.perf_counter()
+    vector_store.add_documents(
+        documents=texts, embeddings=await service.aembed_texts(texts),
+        metadata=[{"document_id": "doc-0", "chunk_index": i} for i in range(args.chunks)], ids=ids
+    )
+    print(f"{args.chunks} chunks embedded with {service.model_name} in {time.perf_counter() - start:.1f}s")
+
+    phases = {"before": [], "during": [], "after": []}
+    phase = "before"
+    failures = mismatched = 0
+    stop = False
+
+    async def querier(worker: int) -> None:
+        nonlocal failures, mismatched
+        count = 0
+        while not stop:
+            query = f"{rng.choice(vocabulary)} {rng.choice(vocabulary)} question {worker}-{count}"
+            count += 1
+            started = time.perf_counter()
+            try:
+                async with get_switch_gate().using():
+                    vector = await service.aembed_text(query)
+                    if len(vector) != vector_store.collection.metadata.get("embedding_dimension", len(vector)):
+                        mismatched += 1
+                    vector_store.search_by_embedding(query_embedding=vector, top_k=5)
+            except Exception:
+                failures += 1
+            phases[phase].append(time.perf_counter() - started)
+            await asyncio.sleep(args.think_ms / 1000)
+
+    queriers = [asyncio.create_task(querier(i)) for i in range(args.concurrency)]
+    await asyncio.sleep(args.baseline_seconds)
+
+    phase = "during"
+    job = start_reembedding(args.new_model)
+    switch_started = None
+    while not job.task.done():
+        if job.state == "switching" and switch_started is None:
+            switch_started = time.perf_counter()
+        await asyncio.sleep(0.01)
+    switch_seconds = time.perf_counter() - switch_started if switch_started else 0.0
+    phase = "after"
+    await asyncio.sleep(args.baseline_seconds)
+    stop = True
+    await asyncio.gather(*queriers)
+
+    status = job.status()
+    print(f"re-embedding with {args.new_model}: {status['state']}"
+          + (f" ({status['error']})" if "error" in status else ""))
+    print(f"  {status['done']} chunks in {status['elapsed_seconds']}s ({status['chunks_per_second']} chunks/s), "
+          f"switch held queries for at most {switch_seconds * 1000:.0f} ms")
+    for name, latencies in phases.items():
+        print(f"  {name:<7} {percentiles(latencies)}")
+    print(f"  failed queries {failures}, dimension mismatches {mismatched}")
+    print(f"  serving '{vector_store.collection_name}' with {get_embedding_service().model_name}: "
+          f"{vector_store.get_count()} vectors for {args.chunks} chunks")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--new-model", required=True, help="model to re-embed with")
+    parser.add_argument("--old-model", default=None, help="default: EMBEDDING_MODEL")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=120, help="words per chunk")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent query loops")
+    parser.add_argument("--think-ms", type=float, default=20.0, help="pause between a loop's queries")
+    parser.add_argument("--baseline-seconds", type=float, default=5.0, help="query time before and after the job")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    # Before the app modules read their configuration
+    os.environ.update({
+        "SQLALCHEMY_DATABASE_URL": f"sqlite:///{os.path.join(directory, 'bench.db')}",
+        "CHROMA_PERSIST_DIR": os.path.join(directory, "vectors"),
+        "EMBEDDING_CACHE_PERSIST": "false",
+        "EMBEDDING_CACHE_ENABLED": "false"
+    })
+    os.environ.pop("EMBEDDING_SERVER_SOCKET", None)
+    if args.old_model:
+        os.environ["EMBEDDING_MODEL"] = args.old_model
+    import logging
+    logging.disable(logging.CRITICAL)
+    try:
+        asyncio.run(run(args))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
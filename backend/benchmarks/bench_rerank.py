@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cross-encoder rerank latency, batched vs per pair, and cache hits
+
+Scores N synthetic (query, chunk) pairs with the configured cross-encoder
+(RERANKER_MODEL or --model, a hub name or local directory) three ways:
+one forward pass per pair, one batched pass, and a repeat of the batched
+call answered from the LRU score cache.
+
+Usage:
+    python -m benchmarks.bench_rerank
+    python -m benchmarks.bench_rerank --model ./models/ms-marco-MiniLM-L-6-v2 --candidates 50
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Allow running as a plain script from the backend directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.reranker import CrossEncoderReranker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=None, help="cross-encoder name or path (default: RERANKER_MODEL)")
+    parser.add_argument("--candidates", type=int, default=20, help="chunks reranked per query")
+    parser.add_argument("--words", type=int, default=150, help="words per chunk")
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vocab = ["retrieval", "invoice", "admission", "policy", "deadline", "tuition", "campus", "report",
+             "semester", "refund", "student", "finance", "exam", "library", "course", "office"]
+
+    def text(length):
+        return " ".join(rng.choice(vocab, size=length))
+
+    reranker = CrossEncoderReranker(model_name=args.model)
+    reranker.model  # load outside the timings
+    queries = [text(8) for _ in range(args.queries)]
+    candidate_sets = [
+        [{"id": f"q{q}-c{i}", "document": text(args.words)} for i in range(args.candidates)]
+        for q in range(args.queries)
+    ]
+
+    # One forward pass per pair
+    start = time.perf_counter()
+    for query, chunks in zip(queries, candidate_sets):
+        for chunk in chunks:
+            reranker.model.predict([(query, chunk["document"])], show_progress_bar=False)
+    per_pair_ms = (time.perf_counter() - start) / args.queries * 1000
+
+    reranker.clear_cache()
+    start = time.perf_counter()
+    for query, chunks in zip(queries, candidate_sets):
+        reranker.rerank(query, chunks)
+    batched_ms = (time.perf_counter() - start) / args.queries * 1000
+
+    start = time.perf_counter()
+    for query, chunks in zip(queries, candidate_sets):
+        reranker.rerank(query, chunks)
+    cached_ms = (time.perf_counter() - start) / args.queries * 1000
+
+    print(f"{reranker.model_name}: {args.candidates} candidates x {args.words} words per query")
+    print(f"{'mode':<10} {'ms/query':>9}")
+    print(f"{'per pair':<10} {per_pair_ms:>9.1f}")
+    print(f"{'batched':<10} {batched_ms:>9.1f}")
+    print(f"{'cached':<10} {cached_ms:>9.3f}")
+    print(reranker.stats())
+
+
+if __name__ == "__main__":
+    main()
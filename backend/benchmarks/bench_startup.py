@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark: application cold start
+
+Every measurement runs in a fresh Python process, so imports and model
+loads are really cold:
+
+    imports   import time of app.core.dependencies (heavy libraries are
+              now imported lazily) and of the libraries it defers
+    warm-up   the startup components loaded one after another (the old
+              lifespan) vs concurrently by app.core.startup.Warmup
+    server    uvicorn app.main:app with blocking vs background warm-up:
+              seconds until /ping (liveness) and /ready (readiness) first
+              answer 200
+
+Components that cannot start here (e.g. no database) are reported as
+failed; /ready then only passes if STARTUP_REQUIRED leaves them out.
+
+Usage:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --components embedding_service vector_store memory_vector_store
+    STARTUP_REQUIRED=embedding_service,vector_store python -m benchmarks.bench_startup --server
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Allow running as a plain script from the backend directory
+sys.path.append(BACKEND_DIR)
+
+
+def run_child(*args) -> dict:
+    """Run this script's --child mode in a fresh interpreter and return its JSON line"""
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", *args],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def child(args) -> None:
+    """Measurements that must start from a cold interpreter"""
+    import logging
+    logging.disable(logging.ERROR)
+
+    if args.child == "import":
+        start = time.perf_counter()
+        for module in args.modules:
+            __import__(module)
+        print(json.dumps({"seconds": time.perf_counter() - start}))
+        return
+
+    from app.core.startup import Component, Warmup, default_components
+    components = [component for component in default_components() if component.name in args.components]
+    names = [component.name for component in components]
+    for i, component in enumerate(components):
+        if args.child == "sequential":
+            component.after = (names[i - 1],) if i else ()
+        else:
+            component.after = tuple(name for name in component.after if name in names)
+    warmup = Warmup(components, required=names)
+    start = time.perf_counter()
+    asyncio.run(warmup.run())
+    status = warmup.status()
+    print(json.dumps({
+        "seconds": time.perf_counter() - start,
+        "components": {name: (c["status"], c["seconds"]) for name, c in status["components"].items()}
+    }))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_server(background: bool, timeout: float) -> dict:
+    """Seconds from process start until /ping and /ready first return 200"""
+    port = free_port()
+    env = dict(os.environ, STARTUP_BACKGROUND_WARMUP="true" if background else "false")
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    times = {"ping": None, "ready": None}
+    try:
+        while time.perf_counter() - start < timeout and None in times.values():
+            for probe in [name for name, seconds in times.items() if seconds is None]:
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/{probe}", timeout=1) as response:
+                        if response.status == 200:
+                            times[probe] = time.perf_counter() - start
+                except (urllib.error.URLError, ConnectionError, OSError):
+                    pass
+            time.sleep(0.05)
+    finally:
+        process.terminate()
+        process.wait()
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--components", nargs="+",
+                        default=["llm_service", "embedding_service", "vector_store", "memory_vector_store"],
+                        help="startup components to warm up (see app.core.startup.default_components)")
+    parser.add_argument("--server", action="store_true", help="also time a real uvicorn start")
+    parser.add_argument("--timeout", type=float, default=120.0, help="server probe timeout (seconds)")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--modules", nargs="*", default=[], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    print("imports (fresh interpreter)")
+    for label, modules in (
+        ("app.core.dependencies", ["app.core.dependencies"]),
+        ("sentence_transformers + chromadb (now deferred)", ["sentence_transformers", "chromadb"])
+    ):
+        print(f"  {label:<48} {run_child('import', '--modules', *modules)['seconds']:>7.2f} s")
+
+    print(f"\nwarm-up of {', '.join(args.components)}")
+    for mode in ("sequential", "concurrent"):
+        result = run_child(mode, "--components", *args.components)
+        failed = [name for name, (status, _) in result["components"].items() if status != "ready"]
+        print(f"  {mode:<12} {result['seconds']:>7.2f} s" + (f"   (failed: {', '.join(failed)})" if failed else ""))
+        for name, (status, seconds) in result["components"].items():
+            print(f"      {name:<22} {status:<8} {seconds:>7.2f} s")
+
+    if args.server:
+        print("\nuvicorn app.main:app")
+        print(f"  {'warm-up':<12} {'/ping s':>8} {'/ready s':>9}")
+        for background in (False, True):
+            times = time_server(background, args.timeout)
+            fmt = lambda seconds: f"{seconds:.2f}" if seconds is not None else "-"
+            print(f"  {'background' if background else 'blocking':<12} {fmt(times['ping']):>8} {fmt(times['ready']):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark: server memory under concurrent large uploads
+
+Starts a uvicorn server in a subprocess and sends --uploads concurrent
+multipart uploads of a --size-mb text file to it, streamed from disk by
+the client. Two servers are compared:
+
+    buffered   the previous handling: await file.read(), hash and write
+               the byte string
+    spooled    POST /api/rag/upload: app.services.upload_spool copies the
+               request's temporary file in UPLOAD_SPOOL_CHUNK_SIZE chunks
+               (ingestion workers are not started, so only the upload is
+               measured)
+
+Reports the server's resident set before the uploads and its peak
+(VmHWM) after them, and the wall time for all uploads.
+
+Usage:
+    python -m benchmarks.bench_upload_spooling
+    python -m benchmarks.bench_upload_spooling --uploads 8 --size-mb 50
+"""
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Allow running as a plain script from the backend directory
+sys.path.append(BACKEND_DIR)
+
+
+def memory_mb(pid: int, field: str) -> float:
+    """VmRSS / VmHWM of a process (Linux /proc)"""
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def serve(args) -> None:
+    """Server subprocess"""
+    import hashlib
+    import logging
+
+    import uvicorn
+    from fastapi import FastAPI, File, UploadFile
+
+    logging.disable(logging.CRITICAL)
+    app = FastAPI()
+
+    if args.mode == "buffered":
+        @app.post("/api/rag/upload")
+        async def upload(file: UploadFile = File(...)):
+            content = await file.read()
+            digest = hashlib.sha256(content).hexdigest()
+            with open(os.path.join(os.environ["INGEST_UPLOAD_DIR"], f"{time.time_ns()}.txt"), "wb") as f:
+                f.write(content)
+            return {"size": len(content), "sha256": digest}
+    else:
+        from app.core.config import engine
+        from app.models.rag_model import Document, DocumentChunk
+        from app.routers.rag_router import router
+
+        Document.metadata.create_all(engine, tables=[Document.__table__, DocumentChunk.__table__])
+        app.include_router(router, prefix="/api/rag")
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="error")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_mode(args, mode: str, sample: str, directory: str) -> dict:
+    import httpx
+
+    port = free_port()
+    env = dict(
+        os.environ,
+        SQLALCHEMY_DATABASE_URL=f"sqlite:///{os.path.join(directory, mode + '.db')}",
+        INGEST_UPLOAD_DIR=os.path.join(directory, mode),
+        MAX_DOCUMENT_SIZE=str(int(args.size_mb * 2 * 1024 * 1024))
+    )
+    os.makedirs(env["INGEST_UPLOAD_DIR"], exist_ok=True)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_upload_spooling", "--server", "--mode", mode, "--port", str(port)],
+        cwd=BACKEND_DIR, env=env
+    )
+    try:
+        deadline = time.perf_counter() + 120
+        while True:
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/docs", timeout=1)
+                break
+            except httpx.HTTPError:
+                if server.poll() is not None or time.perf_counter() > deadline:
+                    raise RuntimeError("server did not start")
+                time.sleep(0.2)
+        baseline = memory_mb(server.pid, "VmRSS")
+
+        def upload(_):
+            with open(sample, "rb") as f, httpx.Client(timeout=600) as client:
+                response = client.post(
+                    f"http://127.0.0.1:{port}/api/rag/upload",
+                    files={"file": ("sample.txt", f, "text/plain")}
+                )
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.uploads) as pool:
+            list(pool.map(upload, range(args.uploads)))
+        elapsed = time.perf_counter() - start
+        peak = memory_mb(server.pid, "VmHWM")
+    finally:
+        server.terminate()
+        server.wait()
+    return {"baseline_mb": baseline, "peak_mb": peak, "seconds": elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=8, help="concurrent uploads")
+    parser.add_argument("--size-mb", type=float, default=50.0, help="size of each upload")
+    parser.add_argument("--server", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", default="spooled", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.server:
+        serve(args)
+        return
+
+    directory = tempfile.mkdtemp()
+    try:
+        sample = os.path.join(directory, "sample.txt")
+        line = b"quarterly revenue grew in every region while operating costs stayed flat\n"
+        with open(sample, "wb") as f:
+            for _ in range(int(args.size_mb * 1024 * 1024) // len(line)):
+                f.write(line)
+
+        print(f"{args.uploads} concurrent uploads of {args.size_mb:.0f} MB")
+        print(f"{'server':<10} {'RSS before':>11} {'peak RSS':>9} {'growth':>8} {'seconds':>8}")
+        for mode in ("buffered", "spooled"):
+            result = run_mode(args, mode, sample, directory)
+            print(f"{mode:<10} {result['baseline_mb']:>9.0f}MB {result['peak_mb']:>7.0f}MB "
+                  f"{result['peak_mb'] - result['baseline_mb']:>6.0f}MB {result['seconds']:>8.1f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark: in-memory VectorStore search, per-row loop vs. matrix engine
+
+Compares the original per-embedding Python loop (np.array per row, both
+norms recomputed, full sort) with the matrix-vector product + argpartition
+path of app.services.vectorstore.VectorStore (index_type="none"), and,
+when faiss is installed, with the store's default FAISS Flat index.
+
+The legacy loop is fed float32 row views instead of Python lists so that
+1M vectors fit in memory; with real List[List[float]] storage it is slower
+still, so its numbers are a lower bound.
+
+Usage:
+    python -m benchmarks.bench_vectorstore_search
+    python -m benchmarks.bench_vectorstore_search --sizes 10000 100000 --dim 384 --queries 20
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Allow running as a plain script from the backend directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.vectorstore import VectorStore, faiss
+
+
+def legacy_search(embeddings, query_embedding, top_k):
+    """The pre-matrix implementation of VectorStore._cosine_similarity_search"""
+    query_vec = np.array(query_embedding)
+    similarities = []
+
+    for i, doc_embedding in enumerate(embeddings):
+        doc_vec = np.array(doc_embedding)
+        similarity = np.dot(query_vec, doc_vec) / (
+            np.linalg.norm(query_vec) * np.linalg.norm(doc_vec)
+        )
+        similarities.append((i, similarity))
+
+    similarities.sort(key=lambda x: x[1], reverse=True)
+    return similarities[:top_k]
+
+
+def build_store(vectors: np.ndarray, index_type: str) -> VectorStore:
+    """Load vectors into a fresh VectorStore in batches"""
+    store = VectorStore(index_type=index_type)
+    # FAISS_MIN_VECTORS would leave small stores on the matrix path: index them at every size
+    store.min_index_vectors = 0
+    batch = 50_000
+    for start in range(0, len(vectors), batch):
+        chunk = vectors[start:start + batch]
+        store.add_documents(
+            documents=[""] * len(chunk),
+            embeddings=chunk,
+            metadata=[{} for _ in range(len(chunk))]
+        )
+    return store
+
+
+def time_queries(fn, queries) -> float:
+    """Mean seconds per query"""
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=20, help="queries per size for the matrix path")
+    parser.add_argument("--legacy-queries", type=int, default=3, help="queries per size for the legacy loop")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+
+    print(f"{'vectors':>10} {'legacy ms/q':>14} {'matrix ms/q':>14} {'speedup':>10} {'top-k match':>12}"
+          f"{'faiss ms/q' if faiss is not None else '':>14}")
+    for size in args.sizes:
+        vectors = rng.standard_normal((size, args.dim), dtype=np.float32)
+        queries = rng.standard_normal((max(args.queries, args.legacy_queries), args.dim), dtype=np.float32)
+
+        store = build_store(vectors, "none")
+        store.search_by_embedding(queries[0], top_k=args.top_k)  # warm-up
+
+        matrix_s = time_queries(
+            lambda q: store.search_by_embedding(q, top_k=args.top_k),
+            queries[:args.queries]
+        )
+
+        rows = list(vectors)
+        legacy_s = time_queries(
+            lambda q: legacy_search(rows, q, args.top_k),
+            queries[:args.legacy_queries]
+        )
+
+        # Both paths must agree on the neighbours (compare by score, ids are not stored)
+        legacy_scores = [float(s) for _, s in legacy_search(rows, queries[0], args.top_k)]
+        matrix_scores = [r["score"] for r in store.search_by_embedding(queries[0], top_k=args.top_k)]
+        match = np.allclose(legacy_scores, matrix_scores, atol=1e-5)
+
+        faiss_column = ""
+        if faiss is not None:
+            del store
+            store = build_store(vectors, "flat")
+            assert store.index is not None, "FAISS index was not built"
+            store.search_by_embedding(queries[0], top_k=args.top_k)  # warm-up
+            faiss_s = time_queries(
+                lambda q: store.search_by_embedding(q, top_k=args.top_k),
+                queries[:args.queries]
+            )
+            faiss_column = f"{faiss_s * 1000:>14.2f}"
+
+        print(
+            f"{size:>10} {legacy_s * 1000:>14.2f} {matrix_s * 1000:>14.2f} "
+            f"{legacy_s / matrix_s:>9.1f}x {str(match):>12}{faiss_column}"
+        )
+
+        del store, rows, vectors
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""
+===================================================================
+benchmarks/vectorstore_harness/ - Speed and recall of the VectorStores
+===================================================================
+Runs the same corpus through every configured backend - the in-memory
+VectorStore (app/services/vectorstore.py) in each index type / storage
+dtype, and the ChromaDB VectorStore (app/core/dependencies.py) - and
+measures build time, memory, QPS, p50/p99 latency and recall@k against
+exact ground-truth neighbours. Results are written as JSON so they can be
+compared across releases.
+
+Fully offline: corpora are synthetic (or loaded from an .npz file) and no
+embedding model or LLM is involved.
+
+Usage:
+    python -m benchmarks.vectorstore_harness
+    python -m benchmarks.vectorstore_harness --vectors 200000 --dim 384 \\
+        --backends memory:none:float32 memory:hnsw:int8 chroma --output results.json
+    python -m benchmarks.vectorstore_harness --dataset corpus.npz
+"""
@@ -0,0 +1,184 @@
+"""
+Backend adapters: one configured VectorStore behind build / search / close
+
+Backend specs on the command line:
+    memory:<index_type>:<storage_dtype>[:<rerank_factor>]   in-memory VectorStore
+    chroma                                                   ChromaDB VectorStore
+"""
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Corpus rows handed to the store per add_documents() call
+ADD_BATCH = 5000
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size of this process (Linux), None elsewhere"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def directory_bytes(directory: str) -> int:
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+class Backend:
+    """Common interface of the benchmarked stores"""
+
+    name = "backend"
+
+    def config(self) -> Dict:
+        return {}
+
+    def prepare(self) -> None:
+        """Import the store implementation, so imports count toward neither build time nor memory"""
+
+    def build(self, vectors: np.ndarray) -> Dict:
+        """Load the corpus (row i gets metadata {"row": i}); returns timing and memory details"""
+        raise NotImplementedError
+
+    def search(self, query: np.ndarray, k: int) -> List[int]:
+        """Corpus row ids of the top-k results"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class InMemoryBackend(Backend):
+    """app.services.vectorstore.VectorStore in one index / storage configuration"""
+
+    def __init__(self, index_type: str, storage_dtype: str, rerank_factor: int = 0):
+        self.index_type = index_type
+        self.storage_dtype = storage_dtype
+        self.rerank_factor = rerank_factor
+        self.name = f"memory:{index_type}:{storage_dtype}" + (f":{rerank_factor}" if rerank_factor else "")
+        self.store = None
+
+    def config(self) -> Dict:
+        config = {
+            "implementation": "app.services.vectorstore.VectorStore",
+            "index_type": self.index_type,
+            "storage_dtype": self.storage_dtype,
+            "rerank_factor": self.rerank_factor
+        }
+        if self.store is not None:
+            # FAISS falls back to "none" when it is not installed
+            config["index_type"] = self.store.index_type
+            if self.store.index_type == "ivf":
+                config.update(nlist=getattr(self.store.index, "nlist", None), nprobe=self.store.ivf_nprobe)
+            elif self.store.index_type == "hnsw":
+                config.update(m=self.store.hnsw_m, ef_construction=self.store.hnsw_ef_construction,
+                              ef_search=self.store.hnsw_ef_search)
+        return config
+
+    def prepare(self) -> None:
+        import app.services.vectorstore  # noqa: F401
+
+    def build(self, vectors: np.ndarray) -> Dict:
+        from app.services.vectorstore import VectorStore
+
+        os.environ["VECTOR_RERANK_FACTOR"] = str(self.rerank_factor)
+        self.store = VectorStore(index_type=self.index_type, storage_dtype=self.storage_dtype)
+        # Ingest everything first, then build the index once, so build time
+        # is not spread over incremental adds
+        self.store.min_index_vectors = float("inf")
+
+        start = time.perf_counter()
+        for first in range(0, len(vectors), ADD_BATCH):
+            batch = vectors[first:first + ADD_BATCH]
+            self.store.add_documents([""] * len(batch), batch, [{"row": first + i} for i in range(len(batch))])
+        ingest_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if self.store.index_type != "none":
+            self.store.build_index()
+        index_s = time.perf_counter() - start
+
+        store = self.store
+        matrix_bytes = store._matrix[:store._num_rows - store._matrix_start].nbytes
+        exact_bytes = store._exact[:store._num_rows].nbytes if store._exact is not None else 0
+        index_bytes = 0
+        if store.index is not None:
+            import faiss
+            index_bytes = int(faiss.serialize_index(store.index).nbytes)
+        return {
+            "ingest_s": ingest_s,
+            "index_build_s": index_s,
+            "vector_bytes": int(matrix_bytes + exact_bytes),
+            "index_bytes": index_bytes
+        }
+
+    def search(self, query: np.ndarray, k: int) -> List[int]:
+        return [result["metadata"]["row"] for result in self.store.search_by_embedding(query, top_k=k)]
+
+    def close(self) -> None:
+        self.store = None
+
+
+class ChromaBackend(Backend):
+    """app.core.dependencies.VectorStore (ChromaDB, HNSW cosine) in a temporary directory"""
+
+    name = "chroma"
+
+    def __init__(self):
+        self.directory = None
+        self.store = None
+
+    def config(self) -> Dict:
+        return {"implementation": "app.core.dependencies.VectorStore", "space": "cosine"}
+
+    def prepare(self) -> None:
+        import app.core.dependencies  # noqa: F401
+
+    def build(self, vectors: np.ndarray) -> Dict:
+        from app.core.dependencies import VectorStore
+
+        self.directory = tempfile.mkdtemp(prefix="bench-chroma-")
+        self.store = VectorStore(persist_directory=self.directory, collection_name="benchmark")
+        batch_size = min(ADD_BATCH, self.store.client.get_max_batch_size())
+
+        start = time.perf_counter()
+        for first in range(0, len(vectors), batch_size):
+            batch = vectors[first:first + batch_size]
+            rows = range(first, first + len(batch))
+            self.store.add_documents(
+                [""] * len(batch), batch.tolist(), [{"row": row} for row in rows], ids=[f"row-{row}" for row in rows]
+            )
+        ingest_s = time.perf_counter() - start
+        return {
+            "ingest_s": ingest_s,
+            "index_build_s": 0.0,  # HNSW is built incrementally during add
+            "disk_bytes": directory_bytes(self.directory)
+        }
+
+    def search(self, query: np.ndarray, k: int) -> List[int]:
+        return [result["metadata"]["row"] for result in self.store.search_by_embedding(query.tolist(), top_k=k)]
+
+    def close(self) -> None:
+        self.store = None
+        if self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def make_backend(spec: str) -> Backend:
+    """Backend for a command-line spec (see module docstring)"""
+    parts = spec.split(":")
+    if parts[0] == "chroma" and len(parts) == 1:
+        return ChromaBackend()
+    if parts[0] == "memory" and len(parts) in (3, 4):
+        rerank_factor = int(parts[3]) if len(parts) == 4 else 0
+        return InMemoryBackend(parts[1], parts[2], rerank_factor)
+    raise ValueError(f"Unknown backend spec: {spec}. Use memory:<index>:<dtype>[:<rerank>] or chroma")
@@ -0,0 +1,142 @@
+"""
+Benchmark corpora: vectors, queries and exact ground-truth neighbours
+"""
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+# Rows of the corpus scored per block when computing ground truth
+GROUND_TRUTH_BLOCK = 65536
+
+
+class Dataset:
+    """A corpus with held-out queries and their exact top-k neighbours"""
+
+    def __init__(self, name: str, vectors: np.ndarray, queries: np.ndarray, neighbors: np.ndarray, info: Dict = None):
+        """
+        Args:
+            name: Label written to the results
+            vectors: (n, dim) float32 corpus rows
+            queries: (q, dim) float32 query vectors
+            neighbors: (q, k) corpus row ids of each query's exact top-k
+            info: Generation parameters, written to the results
+        """
+        self.name = name
+        self.vectors = vectors
+        self.queries = queries
+        self.neighbors = neighbors
+        self.info = info or {}
+
+    @property
+    def k(self) -> int:
+        return self.neighbors.shape[1]
+
+    def describe(self) -> Dict:
+        return {
+            "name": self.name,
+            "vectors": int(len(self.vectors)),
+            "dimension": int(self.vectors.shape[1]),
+            "queries": int(len(self.queries)),
+            "k": self.k,
+            **self.info
+        }
+
+    def save(self, path: str) -> None:
+        """Write the dataset as .npz (reload with load_dataset)"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        np.savez(path, vectors=self.vectors, queries=self.queries, neighbors=self.neighbors)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def exact_neighbors(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """
+    Exact top-k by cosine similarity (what every backend should return)
+
+    Scores the corpus block by block so the (queries x n) score matrix is
+    never materialised.
+    """
+    vectors = _normalize(vectors)
+    queries = _normalize(queries)
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_ids = np.empty((len(queries), 0), dtype=np.int64)
+    for start in range(0, len(vectors), GROUND_TRUTH_BLOCK):
+        block = vectors[start:start + GROUND_TRUTH_BLOCK]
+        scores = np.concatenate([best_scores, queries @ block.T], axis=1)
+        ids = np.concatenate([best_ids, np.broadcast_to(
+            np.arange(start, start + len(block), dtype=np.int64), (len(queries), len(block))
+        )], axis=1)
+        keep = min(k, scores.shape[1])
+        top = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_ids = np.take_along_axis(ids, top, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return np.take_along_axis(best_ids, order, axis=1)
+
+
+def synthetic_dataset(
+    num_vectors: int,
+    dimension: int,
+    num_queries: int,
+    k: int,
+    clusters: int = 100,
+    spread: float = 0.5,
+    seed: int = 0
+) -> Dataset:
+    """
+    Clustered Gaussian corpus
+
+    Sentence embeddings are far from uniform on the sphere: documents on
+    the same topic sit close together. Points are drawn around `clusters`
+    random centres (noise scaled by `spread`), which gives ANN indexes a
+    realistic, harder-than-uniform neighbourhood structure. Queries come
+    from the same distribution but are not corpus rows.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dimension), dtype=np.float32)
+
+    def sample(count: int) -> np.ndarray:
+        assignment = rng.integers(0, clusters, count)
+        noise = rng.standard_normal((count, dimension), dtype=np.float32) * spread
+        return _normalize(centres[assignment] + noise)
+
+    vectors = sample(num_vectors)
+    queries = sample(num_queries)
+    return Dataset(
+        name="synthetic-clustered",
+        vectors=vectors,
+        queries=queries,
+        neighbors=exact_neighbors(vectors, queries, k),
+        info={"clusters": clusters, "spread": spread, "seed": seed}
+    )
+
+
+def load_dataset(path: str, k: int, num_queries: Optional[int] = None) -> Dataset:
+    """
+    Load vectors and queries from an .npz file
+
+    The file needs `vectors` and `queries` arrays; `neighbors` is used
+    when present with at least k columns and recomputed otherwise.
+    """
+    with np.load(path) as data:
+        vectors = np.ascontiguousarray(data["vectors"], dtype=np.float32)
+        queries = np.ascontiguousarray(data["queries"], dtype=np.float32)
+        neighbors = data["neighbors"] if "neighbors" in data.files else None
+    if num_queries is not None:
+        queries = queries[:num_queries]
+        neighbors = neighbors[:num_queries] if neighbors is not None else None
+    if neighbors is None or neighbors.shape[1] < k:
+        neighbors = exact_neighbors(vectors, queries, k)
+    return Dataset(
+        name=os.path.splitext(os.path.basename(path))[0],
+        vectors=vectors,
+        queries=queries,
+        neighbors=np.asarray(neighbors[:, :k], dtype=np.int64),
+        info={"path": os.path.abspath(path)}
+    )
@@ -0,0 +1,169 @@
+"""
+Run every backend over one dataset and write the results as JSON
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+
+# Allow running from the backend directory without installing anything
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from benchmarks.vectorstore_harness.backends import Backend, make_backend, rss_bytes
+from benchmarks.vectorstore_harness.datasets import Dataset, load_dataset, synthetic_dataset
+
+DEFAULT_BACKENDS = [
+    "memory:none:float32",
+    "memory:flat:float32",
+    "memory:ivf:float32",
+    "memory:hnsw:float32",
+    "memory:none:int8:4",
+    "memory:hnsw:int8",
+    "chroma",
+]
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "results")
+
+
+def recall_at_k(found: List[List[int]], expected: np.ndarray) -> float:
+    """Mean fraction of the exact top-k each query's results contain"""
+    k = expected.shape[1]
+    return float(np.mean([
+        len(set(rows[:k]) & set(truth.tolist())) / k
+        for rows, truth in zip(found, expected)
+    ]))
+
+
+def run_backend(backend: Backend, dataset: Dataset, warmup: int) -> Dict:
+    """Build one backend, query it and return its result record"""
+    backend.prepare()
+    gc.collect()
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    details = backend.build(dataset.vectors)
+    build_s = time.perf_counter() - start
+    gc.collect()
+    rss_after = rss_bytes()
+
+    for query in dataset.queries[:warmup]:
+        backend.search(query, dataset.k)
+
+    found, latencies = [], []
+    total_start = time.perf_counter()
+    for query in dataset.queries:
+        start = time.perf_counter()
+        found.append(backend.search(query, dataset.k))
+        latencies.append(time.perf_counter() - start)
+    total_s = time.perf_counter() - total_start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "backend": backend.name,
+        "config": backend.config(),
+        "build_s": round(build_s, 4),
+        **{key: round(value, 4) if isinstance(value, float) else value for key, value in details.items()},
+        "rss_delta_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        "qps": round(len(dataset.queries) / total_s, 2),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 4),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 4),
+        "mean_ms": round(float(latencies_ms.mean()), 4),
+        f"recall_at_{dataset.k}": round(recall_at_k(found, dataset.neighbors), 4)
+    }
+
+
+def environment() -> Dict:
+    """Versions and hardware the numbers were measured on"""
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__
+    }
+    for module in ("faiss", "chromadb"):
+        try:
+            info[module] = __import__(module).__version__
+        except Exception:
+            info[module] = None
+    try:
+        info["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except Exception:
+        info["git_commit"] = None
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="VectorStore speed / recall harness (see benchmarks/vectorstore_harness/__init__.py)"
+    )
+    parser.add_argument("--backends", nargs="+", default=DEFAULT_BACKENDS,
+                        help="memory:<index>:<dtype>[:<rerank>] or chroma")
+    parser.add_argument("--dataset", default=None, help=".npz with vectors/queries[/neighbors] (default: synthetic)")
+    parser.add_argument("--save-dataset", default=None, help="write the generated dataset to this .npz")
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="results JSON (default: benchmarks/results/vectorstore-<time>.json)")
+    parser.add_argument("--verbose", action="store_true", help="keep the stores' INFO logging")
+    args = parser.parse_args()
+
+    backends = [make_backend(spec) for spec in args.backends]
+
+    start = time.perf_counter()
+    if args.dataset:
+        dataset = load_dataset(args.dataset, args.k, args.queries)
+    else:
+        dataset = synthetic_dataset(args.vectors, args.dim, args.queries, args.k, args.clusters, seed=args.seed)
+    print(f"Dataset {dataset.name}: {len(dataset.vectors)} x {dataset.vectors.shape[1]}, "
+          f"{len(dataset.queries)} queries, ground truth in {time.perf_counter() - start:.1f}s")
+    if args.save_dataset:
+        dataset.save(args.save_dataset)
+
+    recall_key = f"recall_at_{dataset.k}"
+    results = []
+    print(f"{'backend':<24} {'build s':>8} {'MB':>8} {'QPS':>9} {'p50 ms':>8} {'p99 ms':>8} {recall_key:>12}")
+    if not args.verbose:
+        # The stores log every add/search at INFO
+        logging.disable(logging.INFO)
+    for backend in backends:
+        try:
+            result = run_backend(backend, dataset, args.warmup)
+        except Exception as e:
+            result = {"backend": backend.name, "config": backend.config(), "error": str(e)}
+            print(f"{backend.name:<24} failed: {e}")
+        else:
+            memory = result.get("vector_bytes", 0) + result.get("index_bytes", 0) or result.get("rss_delta_bytes") or 0
+            print(f"{backend.name:<24} {result['build_s']:>8.2f} {memory / 1e6:>8.1f} {result['qps']:>9.1f} "
+                  f"{result['p50_ms']:>8.3f} {result['p99_ms']:>8.3f} {result[recall_key]:>12.4f}")
+        finally:
+            backend.close()
+        results.append(result)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"vectorstore-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "timestamp": datetime.now().isoformat(),
+            "environment": environment(),
+            "dataset": dataset.describe(),
+            "results": results
+        }, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()